@@ -1,14 +1,60 @@
-from flask import Flask, render_template, request, redirect, session, jsonify, url_for
+from flask import Flask, render_template, request, redirect, session, jsonify, url_for, Response, g
 from authlib.integrations.flask_client import OAuth
 from dotenv import load_dotenv
+import logging
 import os
+import secrets
+import threading
+import time
 from functools import wraps
-from services.kis_api_service import get_domestic_stocks, get_overseas_stocks, get_all_market_indices, init_kis_api
+from services import kis_api_service
+from services.kis_api_service import (
+    get_domestic_stocks, get_guard_stats, get_overseas_stocks, get_quote_cache_stats, init_kis_api_background,
+    kis_init_state
+)
+from services.kis_async_service import (
+    call_market_api, get_domestic_stocks_async, get_overseas_stocks_async, get_market_indices
+)
+from services.market_poller import get_market_snapshot, get_market_json, board_symbols, get_watched_quote, current_snapshots
+from services.symbol_registry import get_symbol_registry
+from services.instrument_master import search_symbols, lookup_symbol, start_instrument_index
+from services.quote_stream import stream_events
+from services.dashboard_snapshot import DASHBOARD_MARKETS, build_dashboard_payload, dashboard_snapshots
+from services.history_store import MAX_QUERY_BARS, query_history
+from services.indicators import attach_indicators
+from services.alert_engine import get_alert_engine
+from services.portfolio import get_portfolio_engine
+from services.log_config import setup_logging
+from services.metrics import http_request_seconds, render_metrics
+from services.warm_start import start_warm_start
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
+setup_logging()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY")
+STARTED_AT = time.time()
+
+# ✅ 백그라운드 서비스 - 임포트만으로는 시작하지 않음 (테스트/도구 임포트, 리로더 부모 프로세스)
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_services():
+    """웜 스타트(이전 실행의 스냅샷을 stale로 제공), KIS와 종목 색인 백그라운드 초기화 - 프로세스당 한 번
+
+    __main__에서 바로 부르고, 다른 WSGI 서버(gunicorn 등)에서는 첫 요청 때 시작됩니다.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return False
+        _background_started = True
+    start_warm_start()
+    init_kis_api_background()
+    start_instrument_index()
+    return True
 
 # ✅ login_required 직접 정의 (DB 없이도 동작)
 def login_required(f):
@@ -30,6 +76,21 @@ oauth.register(
     client_kwargs={'scope': 'openid email profile'}
 )
 
+# ✅ 요청 처리 시간 지표 (라우트 규칙 단위)
+@app.before_request
+def start_request_timer():
+    if not _background_started:
+        start_background_services()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_request_seconds.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+    return response
+
 # ✅ 기본 페이지 라우팅
 @app.route("/")
 def home():
@@ -56,33 +117,57 @@ def dashboard():
 @app.route("/logout")
 @login_required
 def logout():
+    if "lease_id" in session:
+        get_symbol_registry().release_session(session["lease_id"])
     session.clear()
     return redirect("/")
 
+@app.route("/api/market/stream")
+@login_required
+def market_stream():
+    """시세/지수 변경분 푸시 스트림 (Server-Sent Events) - 접속 중에는 세션 구독 유지"""
+    lease_id = lease_session_id()
+    registry = get_symbol_registry()
+    registry.touch(lease_id)
+    return Response(
+        stream_events(keepalive=lambda: registry.touch(lease_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/api/market/<market_type>")
 @login_required
 def get_market_stocks(market_type):
-    """시장별 주식 데이터 조회 - 국내, 미국만 지원"""
+    """시장별 주식 데이터 조회 - 국내, 미국만 지원 (종목마다 기술적 지표 indicators 포함)"""
     try:
-        print(f"[DEBUG] 마켓 타입: {market_type} 데이터 요청")
+        logger.debug("마켓 타입: %s 데이터 요청", market_type)
+        
+        if market_type in ("domestic", "us"):
+            # 이 세션이 시세판을 보는 동안만 주요 종목을 갱신 대상으로 유지
+            get_symbol_registry().lease((lease_session_id(), f"board:{market_type}"), board_symbols(market_type))
+            
+            # 백그라운드 스냅샷이 있으면 컬럼 저장소에서 바로 직렬화한 바이트 응답
+            body = get_market_json(market_type)
+            if body is not None:
+                return Response(body, mimetype="application/json")
         
         if market_type == "domestic":
-            # 국내 주식 - 한국투자증권 API 사용
-            result = get_domestic_stocks()
-            print(f"[DEBUG] 국내 주식 응답: {len(result.get('stocks', []))}개 종목")
+            # 국내 주식 - 스냅샷이 아직 없으면 한국투자증권 API 직접 조회
+            result = attach_indicators("domestic", call_market_api(get_domestic_stocks, get_domestic_stocks_async))
+            logger.debug("국내 주식 응답: %d개 종목", len(result.get('stocks', [])))
             return jsonify(result)
         
         elif market_type == "us":
-            # 미국 주식 - 한국투자증권 API 사용
-            result = get_overseas_stocks(market_type)
-            print(f"[DEBUG] 미국 주식 응답: {len(result.get('stocks', []))}개 종목")
+            # 미국 주식 - 스냅샷이 아직 없으면 한국투자증권 API 직접 조회
+            result = attach_indicators("us", call_market_api(get_overseas_stocks, get_overseas_stocks_async, market_type))
+            logger.debug("미국 주식 응답: %d개 종목", len(result.get('stocks', [])))
             return jsonify(result)
         
         else:
             return jsonify({"success": False, "message": "국내와 미국 시장만 지원됩니다"}), 400
 
     except Exception as e:
-        print(f"[ERROR] 시장 데이터 조회 실패 ({market_type}): {e}")
+        logger.error(f"시장 데이터 조회 실패 ({market_type}): {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
 @app.route("/api/market/indices")
@@ -90,33 +175,267 @@ def get_market_stocks(market_type):
 def get_market_indices_api():
     """시장 지수 데이터 조회 - 모든 지수에 KIS API 사용"""
     try:
-        print("[DEBUG] === 지수 데이터 수신 시작 (KIS API) ===")
+        logger.debug("=== 지수 데이터 수신 시작 (KIS API) ===")
+        get_symbol_registry().lease((lease_session_id(), "indices"), [])
         
-        # 모든 지수를 한국투자증권 API로 조회
-        result = get_all_market_indices()
+        # 백그라운드 스냅샷 우선, 없으면 마지막 지수 값을 바로 반환하고 오래됐으면 백그라운드에서 재조회
+        result = get_market_snapshot("indices") or get_market_indices()
         
         if result.get("success"):
-            print(f"[DEBUG] KIS API 지수 데이터: {list(result['indices'].keys())}")
-            for name, data in result['indices'].items():
-                print(f"[DEBUG] {name.upper()}: {data.get('value', 0)}, 변화: {data.get('change', 0)} ({data.get('changePercent', 0)}%)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("KIS API 지수 데이터: %s", list(result['indices'].keys()))
+                for name, data in result['indices'].items():
+                    logger.debug("%s: %s, 변화: %s (%s%%)", name.upper(), data.get('value', 0), data.get('change', 0), data.get('changePercent', 0))
         else:
-            print(f"[ERROR] 지수 조회 실패: {result.get('message', '알 수 없는 오류')}")
+            logger.error(f"지수 조회 실패: {result.get('message', '알 수 없는 오류')}")
         
-        print("[DEBUG] === 지수 데이터 수신 완료 ===")
+        logger.debug("=== 지수 데이터 수신 완료 ===")
         return jsonify(result)
         
     except Exception as e:
-        print(f"[ERROR] 지수 데이터 조회 실패: {e}")
+        logger.error(f"지수 데이터 조회 실패: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route("/api/dashboard/snapshot")
+@login_required
+def dashboard_snapshot_api():
+    """대시보드 한 번 갱신분 (지수 + 시세판 + 관심종목) - ?market=domestic|us
+
+    스냅샷 버전 기반 ETag로 If-None-Match가 같으면 304, 본문은 버전마다 한 번 만든 gzip/br 바이트를 공유합니다.
+    ETag는 보내는 인코딩별로 다르고(-gz/-br), If-None-Match도 그 인코딩의 ETag와 비교합니다.
+    """
+    market = request.args.get("market", "domestic")
+    if market not in DASHBOARD_MARKETS:
+        return jsonify({"success": False, "message": "국내와 미국 시장만 지원됩니다"}), 400
+
+    registry = get_symbol_registry()
+    registry.lease((lease_session_id(), f"board:{market}"), board_symbols(market))
+    registry.lease((lease_session_id(), "indices"), [])
+    interests = get_alert_engine().list_interests(current_user_id())
+    lease_watch(interests)
+
+    body = dashboard_snapshots.body(market, interests, lambda: build_dashboard_payload(market, interests))
+    encoding = body.negotiate(request.accept_encodings)
+    etag = body.etag_for(encoding)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(body.encoded(encoding), mimetype="application/json", headers=headers)
+
+@app.route("/api/history/<ticker>")
+@login_required
+def get_history_api(ticker):
+    """종목 OHLCV 이력 조회 - ?market=domestic|us&interval=1m|1d&start=&end= (epoch 초)"""
+    try:
+        result = query_history(
+            ticker,
+            market=request.args.get("market", "domestic"),
+            interval=request.args.get("interval", "1m"),
+            start=request.args.get("start", type=int),
+            end=request.args.get("end", type=int),
+            limit=request.args.get("limit", MAX_QUERY_BARS, type=int)
+        )
+        return jsonify(result), (200 if result.get("success") else 400)
+    except Exception as e:
+        logger.error(f"이력 조회 실패 ({ticker}): {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def current_user_id():
+    return session["user"].get("email") or session["user"].get("sub")
+
+def lease_session_id():
+    """구독 레지스트리에서 이 브라우저 세션을 나타내는 ID"""
+    if "lease_id" not in session:
+        session["lease_id"] = secrets.token_hex(8)
+    return session["lease_id"]
+
+def lease_watch(interests):
+    """관심종목을 이 세션의 구독 종목으로 등록"""
+    get_symbol_registry().lease(
+        (lease_session_id(), "watch"), [(item["market"], item["ticker"]) for item in interests]
+    )
+
+def lease_interests(interests):
+    """관심종목을 이 세션의 구독 종목으로 등록 - 시세와 함께 반환"""
+    lease_watch(interests)
+    return [dict(item, quote=get_watched_quote(item["market"], item["ticker"])) for item in interests]
+
+@app.route("/api/interests", methods=["GET", "POST"])
+@login_required
+def interests_api():
+    """관심종목 조회/추가"""
+    engine = get_alert_engine()
+    user = current_user_id()
+    if request.method == "GET":
+        return jsonify({"success": True, "interests": lease_interests(engine.list_interests(user))})
+
+    data = request.get_json(silent=True) or {}
+    ticker = str(data.get("ticker", "")).strip().upper()
+    if not ticker:
+        return jsonify({"success": False, "message": "종목 코드를 입력해주세요"}), 400
+    # 종목명/시장은 마스터에서 보강 (국내: KOSPI/KOSDAQ, 미국: NAS/NYS/AMS)
+    entry = lookup_symbol(ticker)
+    name = data.get("name") or (entry["name"] if entry else None)
+    market = data.get("market") or (entry and ("domestic" if entry["market"] in ("KOSPI", "KOSDAQ") else "us"))
+    if not engine.add_interest(user, ticker, name, market):
+        return jsonify({"success": False, "message": "이미 관심종목에 추가된 종목입니다"}), 409
+    return jsonify({"success": True, "interests": lease_interests(engine.list_interests(user))})
+
+@app.route("/api/interests/<ticker>", methods=["DELETE"])
+@login_required
+def delete_interest_api(ticker):
+    """관심종목 삭제"""
+    engine = get_alert_engine()
+    if not engine.remove_interest(current_user_id(), ticker):
+        return jsonify({"success": False, "message": "관심종목에 없는 종목입니다"}), 404
+    lease_interests(engine.list_interests(current_user_id()))
+    return jsonify({"success": True})
+
+@app.route("/api/alerts", methods=["GET", "POST"])
+@login_required
+def alerts_api():
+    """가격 알림 조회/등록 - 알림은 서버에서 시세 갱신마다 평가"""
+    engine = get_alert_engine()
+    user = current_user_id()
+    if request.method == "GET":
+        return jsonify({"success": True, "alerts": engine.list_alerts(user)})
+
+    data = request.get_json(silent=True) or {}
+    try:
+        alert = engine.add_alert(
+            user,
+            str(data.get("ticker", "")).strip().upper(),
+            data.get("type"),
+            data.get("condition"),
+            float(data.get("value")),
+            data.get("method"),
+            stock_name=data.get("stockName")
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "alert": alert})
+
+@app.route("/api/alerts/<int:alert_id>", methods=["DELETE"])
+@login_required
+def delete_alert_api(alert_id):
+    """알림 삭제"""
+    if not get_alert_engine().remove_alert(current_user_id(), alert_id):
+        return jsonify({"success": False, "message": "알림을 찾을 수 없습니다"}), 404
+    return jsonify({"success": True})
+
+@app.route("/api/alerts/fired")
+@login_required
+def fired_alerts_api():
+    """since(epoch 초) 이후 발동한 알림"""
+    since = request.args.get("since", 0, type=float)
+    return jsonify({"success": True, "fired": get_alert_engine().fired_since(current_user_id(), since)})
+
+def portfolio_response(user):
+    """보유 종목을 이 세션의 구독 종목으로 등록하고 최신 시세로 평가한 포트폴리오"""
+    engine = get_portfolio_engine()
+    holdings = engine.list_holdings(user)
+    get_symbol_registry().lease(
+        (lease_session_id(), "portfolio"), [(item["market"], item["ticker"]) for item in holdings if item["quantity"] > 0]
+    )
+    for market in ("domestic", "us"):
+        engine.update_prices(market, [get_watched_quote(market, item["ticker"]) for item in holdings if item["market"] == market])
+    return {"success": True, "portfolio": engine.summary(user)}
+
+@app.route("/api/portfolio")
+@login_required
+def portfolio_api():
+    """보유 종목 평가 - 원화 환산 평가금액, 평가/실현손익, 일간 변동, 종목별 비중"""
+    return jsonify(portfolio_response(current_user_id()))
+
+@app.route("/api/portfolio/trades", methods=["POST"])
+@login_required
+def portfolio_trade_api():
+    """매수/매도 기록 - 평균단가법으로 보유 수량/단가와 실현손익 반영"""
+    data = request.get_json(silent=True) or {}
+    ticker = str(data.get("ticker", "")).strip().upper()
+    if not ticker:
+        return jsonify({"success": False, "message": "종목 코드를 입력해주세요"}), 400
+    entry = lookup_symbol(ticker)
+    name = data.get("name") or (entry["name"] if entry else None)
+    market = data.get("market") or (entry and ("domestic" if entry["market"] in ("KOSPI", "KOSDAQ") else "us"))
+    try:
+        get_portfolio_engine().record_trade(
+            current_user_id(), ticker, data.get("side"), data.get("quantity"), data.get("price"), name, market
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify(portfolio_response(current_user_id()))
+
+@app.route("/api/portfolio/<ticker>", methods=["DELETE"])
+@login_required
+def delete_holding_api(ticker):
+    """보유 종목 삭제 (거래 기록과 실현손익 포함)"""
+    if not get_portfolio_engine().remove_holding(current_user_id(), ticker):
+        return jsonify({"success": False, "message": "보유하지 않은 종목입니다"}), 404
+    return jsonify(portfolio_response(current_user_id()))
+
+@app.route("/api/cache/stats")
+@login_required
+def get_cache_stats_api():
+    """시세 캐시 적중/미스/합류 카운터 조회"""
+    return jsonify(get_quote_cache_stats())
+
+@app.route("/metrics")
+def metrics_api():
+    """Prometheus 수집용 지표 - METRICS_TOKEN이 설정되어 있으면 Bearer 토큰 필요"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/healthz")
+def healthz():
+    """liveness - 프로세스가 요청을 처리할 수 있으면 항상 200"""
+    return jsonify({"status": "ok", "uptime": round(time.time() - STARTED_AT, 1)})
+
+@app.route("/readyz")
+def readyz():
+    """readiness - KIS 클라이언트 준비(유효 토큰) 또는 복원된 스냅샷이 있어야 200, 아니면 503
+
+    호출 종류별 회로 상태(upstream)는 참고용 - 회로가 열려 있어도 마지막 값을 제공하므로 준비 상태는 유지
+    """
+    api = kis_api_service.kis_api
+    token_valid = api is not None and api.token_manager.is_valid()
+    snapshots = {
+        name: {"asOf": snapshot.get("asOf"), "stale": bool(snapshot.get("stale"))}
+        for name, snapshot in current_snapshots().items()
+    }
+    ready = token_valid or bool(snapshots)
+    body = {
+        "ready": ready,
+        "kis": dict(kis_init_state, tokenValid=token_valid),
+        "upstream": {name: guard["state"] for name, guard in get_guard_stats().items()},
+        "snapshots": snapshots
+    }
+    return jsonify(body), (200 if ready else 503)
+
+@app.route("/api/symbols/search")
+@login_required
+def search_symbols_api():
+    """종목 검색 - 코드/한글명/영문명 (?q=삼성&limit=20)"""
+    query = request.args.get("q", "")
+    limit = min(request.args.get("limit", 20, type=int), 50)
+    result = search_symbols(query, limit)
+    return jsonify(result), (200 if result.get("success") else 503)
+
+@app.route("/api/symbols/subscriptions")
+@login_required
+def get_subscriptions_api():
+    """종목 구독 현황 - 임대 수, 구독 종목별 참조 수"""
+    return jsonify({"success": True, **get_symbol_registry().stats()})
+
 if __name__ == "__main__":
-    # Flask 2.0+에서는 before_first_request가 deprecated되었으므로 직접 호출
-    with app.app_context():
-        if not init_kis_api():
-            print("⚠️  KIS API 초기화 실패 - .env 파일에 KIS_APP_KEY, KIS_APP_SECRET 설정 필요")
-            print("📋 필요한 환경변수:")
-            print("   KIS_APP_KEY=your_app_key")
-            print("   KIS_APP_SECRET=your_app_secret")
-    
+    # debug 리로더는 감시용 부모와 실제 서버 자식(WERKZEUG_RUN_MAIN=true)을 띄우므로 자식에서만 시작
+    # KIS 초기화 실패 내용은 /readyz와 로그로 확인
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     # 호스트와 포트 명시적 설정
-    app.run(debug=True, host='127.0.0.1', port=5000, threaded=True)
\ No newline at end of file
+    app.run(debug=True, host='127.0.0.1', port=5000, threaded=True)
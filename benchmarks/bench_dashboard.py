@@ -0,0 +1,202 @@
+"""대시보드 부하 벤치마크 - 로컬 KIS 스텁 서버 앞에서 시세 API를 동시 대시보드 N개로 호출
+
+    python -m benchmarks.bench_dashboard --dashboards 50 --duration 30 --latency 40 --jitter 20
+    python -m benchmarks.bench_dashboard --dashboards 200 --error-rate 0.02 --rate-limit 20 --json result.json
+    python -m benchmarks.bench_dashboard --dashboards 200 --snapshot
+
+대시보드 하나는 로그인 세션을 가진 클라이언트로, interval초마다 /api/market/domestic,
+/api/market/us, /api/market/indices를 차례로 요청합니다 (화면의 주기 갱신과 같은 순서).
+--snapshot이면 대신 /api/dashboard/snapshot 하나를 ETag(If-None-Match)와 gzip으로 요청하고
+304 비율과 전송 바이트를 함께 출력합니다.
+엔드포인트별 p50/p99 지연, 처리량, 오류 수와 스텁 서버가 받은 업스트림 호출 수를 출력합니다.
+--json으로 결과를 저장해 두면 이전 결과와 비교해 회귀를 확인할 수 있습니다.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from services.kis_stub_server import start_stub_server
+
+ENDPOINTS = ("/api/market/domestic", "/api/market/us", "/api/market/indices")
+SNAPSHOT_ENDPOINTS = ("/api/dashboard/snapshot?market=domestic",)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def configure_env(stub_url, workdir, poll_sec):
+    """앱이 스텁 서버와 임시 디렉터리만 쓰도록 환경 변수 설정 (app 임포트 전에 호출)"""
+    os.environ.update({
+        "KIS_BASE_URL": stub_url,
+        "KIS_APP_KEY": "stub",
+        "KIS_APP_SECRET": "stub",
+        "SECRET_KEY": "bench",
+        "KIS_REALTIME_ENABLED": "0",
+        "SHARED_STATE_URL": "",
+        "KIS_TOKEN_CACHE_FILE": os.path.join(workdir, "token.json"),
+        "HISTORY_DIR": os.path.join(workdir, "history"),
+        "ALERTS_FILE": os.path.join(workdir, "alerts.json"),
+        "EXCHANGE_CACHE_FILE": os.path.join(workdir, "exchanges.json"),
+        "INSTRUMENT_INDEX": os.path.join(workdir, "instruments.idx"),
+        "KIS_MASTER_DIR": os.path.join(workdir, "master"),
+        "WARM_START_FILE": os.path.join(workdir, "snapshot.bin"),
+        "MARKET_POLL_OPEN_SEC": str(poll_sec),
+        "MARKET_POLL_CLOSED_SEC": str(poll_sec),
+    })
+
+
+def run_dashboard(app, index, deadline, interval, samples, errors, lock, endpoints=ENDPOINTS, transfer=None):
+    """대시보드 하나 - 로그인 세션으로 deadline까지 interval초마다 엔드포인트 호출
+
+    ETag를 받은 엔드포인트는 다음 요청에 If-None-Match로 보내고 304도 정상으로 셉니다.
+    transfer를 주면 엔드포인트별 [응답 수, 304 수, 본문 바이트]를 누적합니다.
+    """
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"email": f"bench{index}@example.com", "sub": f"bench{index}"}
+    etags = {}
+
+    while time.monotonic() < deadline:
+        cycle_started = time.monotonic()
+        for endpoint in endpoints:
+            headers = {"Accept-Encoding": "gzip"}
+            if endpoint in etags:
+                headers["If-None-Match"] = etags[endpoint]
+            started = time.perf_counter()
+            response = client.get(endpoint, headers=headers)
+            body = response.get_data()
+            elapsed = time.perf_counter() - started
+            if response.headers.get("ETag"):
+                etags[endpoint] = response.headers["ETag"]
+            ok = response.status_code == 304 or (response.status_code == 200 and body)
+            with lock:
+                samples[endpoint].append(elapsed)
+                if not ok:
+                    errors[endpoint] += 1
+                if transfer is not None:
+                    stats = transfer.setdefault(endpoint, [0, 0, 0])
+                    stats[0] += 1
+                    stats[1] += response.status_code == 304
+                    stats[2] += len(body)
+        remaining = interval - (time.monotonic() - cycle_started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def run(args):
+    stub = start_stub_server(latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+                             rate_limit=args.rate_limit, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="stock-bench-")
+    configure_env(stub.url, workdir, args.poll_sec)
+
+    # 앱 로그(print)는 벤치마크 출력과 섞이지 않게 버림 (--verbose면 그대로 출력)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        from app import app
+        from services.kis_api_service import init_kis_api
+        init_kis_api()
+
+        # 워밍업 - 갱신기 시작과 첫 스냅샷까지 (측정에서 제외, 스냅샷 모드도 시세판 경로로 갱신기를 깨움)
+        run_dashboard(app, -1, time.monotonic() + args.warmup, args.interval, {e: [] for e in ENDPOINTS},
+                      {e: 0 for e in ENDPOINTS}, threading.Lock())
+        stub.reset()
+
+        endpoints = SNAPSHOT_ENDPOINTS if args.snapshot else ENDPOINTS
+        samples = {endpoint: [] for endpoint in endpoints}
+        errors = {endpoint: 0 for endpoint in endpoints}
+        transfer = {}
+        lock = threading.Lock()
+        started = time.monotonic()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=run_dashboard,
+                             args=(app, i, deadline, args.interval, samples, errors, lock, endpoints, transfer),
+                             daemon=True)
+            for i in range(args.dashboards)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+    upstream = stub.stats()
+    total_requests = sum(len(values) for values in samples.values())
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "seconds": round(elapsed, 3),
+        "requests": total_requests,
+        "throughput": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "endpoints": {},
+        "upstream": upstream,
+        "upstreamPerRequest": round(upstream["upstream"] / total_requests, 4) if total_requests else 0.0
+    }
+    for endpoint in endpoints:
+        values = sorted(samples[endpoint])
+        responses, not_modified, body_bytes = transfer.get(endpoint, (0, 0, 0))
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "notModified": not_modified,
+            "bytes": body_bytes,
+            "p50Ms": round(percentile(values, 50) * 1000, 2),
+            "p99Ms": round(percentile(values, 99) * 1000, 2),
+            "maxMs": round(values[-1] * 1000, 2) if values else 0.0
+        }
+    stub.shutdown()
+    return report
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"대시보드 {config['dashboards']}개 × {report['seconds']}초 (갱신 {config['interval']}초, "
+          f"스텁 지연 {config['latency']}±{config['jitter']}ms, 오류율 {config['error_rate']}, "
+          f"호출 한도 {config['rate_limit'] or '없음'})")
+    print(f"{'엔드포인트':<24}{'요청':>8}{'오류':>6}{'304':>8}{'KB':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<24}{stats['requests']:>8}{stats['errors']:>6}{stats['notModified']:>8}"
+              f"{stats['bytes'] / 1024:>10.1f}{stats['p50Ms']:>10}{stats['p99Ms']:>10}{stats['maxMs']:>10}")
+    upstream = report["upstream"]
+    print(f"처리량 {report['throughput']} req/s, 요청 {report['requests']}건")
+    print(f"업스트림 호출 {upstream['upstream']}건 ({upstream['perSecond']}/s, 요청당 {report['upstreamPerRequest']})")
+    for path, count in sorted(upstream["calls"].items()):
+        print(f"  {path}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="대시보드 부하 벤치마크 (로컬 KIS 스텁 서버 사용)")
+    parser.add_argument("--dashboards", type=int, default=20, help="동시 대시보드 수")
+    parser.add_argument("--duration", type=float, default=30.0, help="측정 시간(초)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="측정 전 워밍업 시간(초)")
+    parser.add_argument("--interval", type=float, default=1.0, help="대시보드 갱신 주기(초)")
+    parser.add_argument("--poll-sec", type=float, default=2.0, help="백그라운드 갱신 주기(초)")
+    parser.add_argument("--latency", type=float, default=30.0, help="스텁 평균 응답 지연(ms)")
+    parser.add_argument("--jitter", type=float, default=10.0, help="스텁 지연 ±폭(ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="스텁 503 응답 비율")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="스텁 초당 호출 한도 (0이면 무제한)")
+    parser.add_argument("--snapshot", action="store_true", help="통합 스냅샷 엔드포인트(/api/dashboard/snapshot)로 측정")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일")
+    parser.add_argument("--verbose", action="store_true", help="앱 로그 출력")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if not any(stats["errors"] for stats in report["endpoints"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 알림 유형 → 시세 필드 / 지표 필드 (services.indicators) - 서버가 값을 받아 평가하는 유형만 등록 가능
+QUOTE_FIELDS = {"price": "price", "volume": "volume"}
+INDICATOR_FIELDS = {"rsi": "rsi14"}
+ALERT_TYPES = tuple(QUOTE_FIELDS) + tuple(INDICATOR_FIELDS)
+ALERT_CONDITIONS = ("above", "below", "equal")
+# 알림 방법 - app: 화면 알림함만, slack: 알림함 + 슬랙 웹훅 (전송 수단이 있는 방법만 등록 가능, 이메일 전송은 없음)
+NOTIFY_METHODS = ("app", "slack")
+# 이전에 저장된 방법 → 현재 방법 (이메일은 전송하지 않으므로 제외)
+LEGACY_NOTIFY_METHODS = {"email": "app", "both": "slack"}
+
+
+class ThresholdIndex:
+    """(종목, 유형)별 조건 임계값 정렬 목록 - 틱마다 이분 탐색으로 발동 대상만 찾음
+
+    above: 값 >= 임계값, below: 값 <= 임계값, equal: 직전 값과 현재 값 사이를 지나간 임계값
+    """
+    __slots__ = ("levels", "last")
+
+    def __init__(self):
+        self.levels = {condition: [] for condition in ALERT_CONDITIONS}  # [(임계값, alert id)]
+        self.last = None
+
+    def add(self, condition, value, alert_id):
+        insort(self.levels[condition], (value, alert_id))
+
+    def remove(self, condition, value, alert_id):
+        levels = self.levels[condition]
+        i = bisect_left(levels, (value, alert_id))
+        if i < len(levels) and levels[i] == (value, alert_id):
+            del levels[i]
+
+    def __bool__(self):
+        return any(self.levels.values())
+
+    def pop_fired(self, value):
+        """value로 발동한 alert id 목록 - 발동한 항목은 목록에서 제거 (1회성 알림)"""
+        fired = []
+
+        above = self.levels["above"]
+        k = bisect_right(above, (value, float("inf")))
+        if k:
+            fired += [alert_id for _, alert_id in above[:k]]
+            del above[:k]
+
+        below = self.levels["below"]
+        k = bisect_left(below, (value, -1))
+        if k < len(below):
+            fired += [alert_id for _, alert_id in below[k:]]
+            del below[k:]
+
+        equal = self.levels["equal"]
+        if equal:
+            low, high = (value, value) if self.last is None else (min(self.last, value), max(self.last, value))
+            lo = bisect_left(equal, (low, -1))
+            hi = bisect_right(equal, (high, float("inf")))
+            if lo < hi:
+                fired += [alert_id for _, alert_id in equal[lo:hi]]
+                del equal[lo:hi]
+
+        self.last = value
+        return fired
+
+
+class AlertEngine:
+    """사용자별 관심종목/가격 알림 저장소와 서버측 알림 평가기
+
+    알림은 JSON 파일에 저장되고, 종목/유형별 ThresholdIndex로 색인되어 시세 갱신 한 건당
+    O(log n + 발동 건수)로 평가됩니다. 발동한 알림은 큐에 넣고 별도 스레드가 전달합니다.
+    """
+
+    def __init__(self, path, inbox_size=100):
+        self.path = path
+        self.interests = {}   # user -> [{"ticker", "name", "market"}]
+        self.alerts = {}      # id -> alert dict
+        self.next_id = 1
+        self._index = {}      # ticker -> {type: ThresholdIndex}
+        self._lock = threading.RLock()
+        self.inbox_size = inbox_size
+        self._inbox = {}      # user -> deque(발동 이벤트)
+        self.handlers = [self._deliver_inbox]
+        self.events = queue.Queue()
+        self._dispatcher = None
+        self._load()
+
+    # 저장/로드
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"알림 저장 파일 로드 실패: {e}")
+            return
+
+        self.interests = data.get("interests", {})
+        self.alerts = {int(alert_id): alert for alert_id, alert in data.get("alerts", {}).items()}
+        self.next_id = data.get("nextId", max(self.alerts, default=0) + 1)
+        for alert in self.alerts.values():
+            if alert.get("method") in LEGACY_NOTIFY_METHODS:
+                alert["method"] = LEGACY_NOTIFY_METHODS[alert["method"]]
+            if not alert.get("active"):
+                continue
+            if alert["type"] not in ALERT_TYPES:
+                # 평가하지 않는 유형은 발동할 수 없으므로 활성으로 두지 않음
+                logger.warning(f"지원하지 않는 유형의 알림을 비활성화합니다: {alert['id']} ({alert['type']})")
+                alert["active"] = False
+                continue
+            self._index_alert(alert)
+
+    def _save(self):
+        """임시 파일에 쓰고 교체 (호출 측에서 잠금 보유)"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"interests": self.interests, "alerts": self.alerts, "nextId": self.next_id},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # 관심종목
+
+    def list_interests(self, user):
+        return list(self.interests.get(user, []))
+
+    def add_interest(self, user, ticker, name=None, market=None):
+        """관심종목 추가 - 이미 있으면 False"""
+        with self._lock:
+            items = self.interests.setdefault(user, [])
+            if any(item["ticker"] == ticker for item in items):
+                return False
+            items.append({"ticker": ticker, "name": name or ticker,
+                          "market": market or ("domestic" if ticker.isdigit() else "us")})
+            self._save()
+            return True
+
+    def remove_interest(self, user, ticker):
+        with self._lock:
+            items = self.interests.get(user, [])
+            remaining = [item for item in items if item["ticker"] != ticker]
+            if len(remaining) == len(items):
+                return False
+            self.interests[user] = remaining
+            self._save()
+            return True
+
+    # 알림
+
+    def list_alerts(self, user):
+        return [dict(alert) for alert in self.alerts.values() if alert["user"] == user]
+
+    def add_alert(self, user, ticker, alert_type, condition, value, method, stock_name=None):
+        """알림 등록 - 잘못된 입력이면 ValueError"""
+        if alert_type not in ALERT_TYPES:
+            raise ValueError(f"지원하지 않는 알림 유형입니다: {alert_type}")
+        if condition not in ALERT_CONDITIONS:
+            raise ValueError(f"지원하지 않는 조건입니다: {condition}")
+        if method not in NOTIFY_METHODS:
+            raise ValueError(f"지원하지 않는 알림 방법입니다: {method}")
+
+        with self._lock:
+            alert = {
+                "id": self.next_id,
+                "user": user,
+                "ticker": ticker,
+                "stockName": stock_name or ticker,
+                "type": alert_type,
+                "condition": condition,
+                "value": float(value),
+                "method": method,
+                "active": True,
+                "createdAt": time.time()
+            }
+            self.alerts[alert["id"]] = alert
+            self.next_id += 1
+            self._index_alert(alert)
+            self._save()
+            return dict(alert)
+
+    def remove_alert(self, user, alert_id):
+        with self._lock:
+            alert = self.alerts.get(alert_id)
+            if alert is None or alert["user"] != user:
+                return False
+            if alert["active"]:
+                self._unindex_alert(alert)
+            del self.alerts[alert_id]
+            self._save()
+            return True
+
+    def _index_alert(self, alert):
+        by_type = self._index.setdefault(alert["ticker"], {})
+        index = by_type.get(alert["type"])
+        if index is None:
+            index = by_type[alert["type"]] = ThresholdIndex()
+        index.add(alert["condition"], alert["value"], alert["id"])
+
+    def _unindex_alert(self, alert):
+        by_type = self._index.get(alert["ticker"], {})
+        index = by_type.get(alert["type"])
+        if index is None:
+            return
+        index.remove(alert["condition"], alert["value"], alert["id"])
+        if not index:
+            del by_type[alert["type"]]
+            if not by_type:
+                del self._index[alert["ticker"]]
+
+    # 평가
+
+    def evaluate(self, ticker, values):
+        """종목 값 갱신 평가 - values는 {유형: 값}, 발동한 알림 목록 반환"""
+        if ticker not in self._index:
+            return []
+
+        fired = []
+        with self._lock:
+            by_type = self._index.get(ticker)
+            if not by_type:
+                return []
+            for alert_type, value in values.items():
+                index = by_type.get(alert_type)
+                if index is None or value is None:
+                    continue
+                for alert_id in index.pop_fired(float(value)):
+                    alert = self.alerts.get(alert_id)
+                    if alert is None:
+                        continue
+                    alert.update(active=False, firedAt=time.time(), firedValue=float(value))
+                    fired.append(dict(alert))
+            if fired:
+                self._save()
+
+        for alert in fired:
+            self.events.put(alert)
+        return fired
+
+    def evaluate_quote(self, quote, indicators=None):
+        """시세 dict 한 건 평가 (price/volume 유형) - indicators(종목 → 지표 dict)가 있으면 RSI 유형도"""
+        ticker = quote.get("ticker")
+        if ticker not in self._index:
+            return []
+        values = {alert_type: quote.get(field) for alert_type, field in QUOTE_FIELDS.items()}
+        current = indicators(ticker) if indicators is not None else None
+        if current:
+            values.update((alert_type, current.get(field)) for alert_type, field in INDICATOR_FIELDS.items())
+        return self.evaluate(ticker, values)
+
+    # 전달
+
+    def start(self):
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        self._dispatcher = threading.Thread(target=self._dispatch, name="alert-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            alert = self.events.get()
+            for handler in self.handlers:
+                try:
+                    handler(alert)
+                except Exception as e:
+                    logger.error(f"알림 전달 실패 ({alert['id']}, {handler.__name__}): {e}")
+
+    def _deliver_inbox(self, alert):
+        """사용자 수신함에 보관 - 화면은 /api/alerts/fired로 가져감"""
+        logger.info(f"알림 발동: {alert['user']} {alert['ticker']} {alert['type']} "
+                    f"{alert['condition']} {alert['value']} (현재 {alert['firedValue']})")
+        with self._lock:
+            inbox = self._inbox.get(alert["user"])
+            if inbox is None:
+                inbox = self._inbox[alert["user"]] = deque(maxlen=self.inbox_size)
+            inbox.append(alert)
+
+    def fired_since(self, user, since=0.0):
+        """since(epoch 초) 이후 발동한 알림"""
+        with self._lock:
+            return [dict(alert) for alert in self._inbox.get(user, ()) if alert["firedAt"] > since]
+
+
+def _slack_handler(webhook_url):
+    """SLACK_WEBHOOK_URL이 있으면 slack 알림을 웹훅으로 전송"""
+    import requests
+
+    def deliver_slack(alert):
+        if alert["method"] != "slack":
+            return
+        text = (f"[{alert['stockName']}({alert['ticker']})] {alert['type']} {alert['value']} "
+                f"{alert['condition']} 조건 충족 - 현재 {alert['firedValue']}")
+        requests.post(webhook_url, json={"text": text}, timeout=5)
+
+    return deliver_slack
+
+
+alert_engine = None
+_engine_lock = threading.Lock()
+
+def get_alert_engine():
+    """프로세스 공용 알림 엔진 (ALERTS_FILE, 기본 data/alerts.json) - 첫 호출 시 전달 스레드 시작"""
+    global alert_engine
+    with _engine_lock:
+        if alert_engine is None:
+            alert_engine = AlertEngine(os.getenv("ALERTS_FILE", os.path.join("data", "alerts.json")))
+            webhook_url = os.getenv("SLACK_WEBHOOK_URL")
+            if webhook_url:
+                alert_engine.handlers.append(_slack_handler(webhook_url))
+            alert_engine.start()
+    return alert_engine
+
+def evaluate_quotes(quotes, indicators=None):
+    """시세 갱신 평가 - 알림이 걸린 종목만 처리 (indicators: 종목 → 지표 dict 조회 함수)"""
+    engine = alert_engine or get_alert_engine()
+    for quote in quotes:
+        engine.evaluate_quote(quote, indicators)
@@ -0,0 +1,131 @@
+"""대시보드 통합 스냅샷 - 지수 + 시세판 + 관심종목을 한 번에, 버전 ETag와 사전 압축 바이트로 응답
+
+버전은 백그라운드 갱신기의 스냅샷 내용(가격 등 화면에 보이는 필드)이 실제로 바뀔 때만 올라가므로
+장 마감 후처럼 값이 그대로면 ETag가 유지되어 If-None-Match 요청은 304로 끝납니다.
+응답 바이트는 (버전, 시장, 관심종목 구성)마다 한 번만 직렬화/압축해 여러 요청이 공유합니다.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli가 없으면 gzip만 사용
+    brotli = None
+
+from services.indicators import get_indicator_engine
+from services.market_poller import add_snapshot_listener, get_market_snapshot, get_watched_quote
+from services.quote_stream import compact_indices, compact_quotes
+
+DASHBOARD_MARKETS = ("domestic", "us")
+
+
+def _compact(name, result):
+    """버전 비교용 - 화면에 보이는 필드만 (asOf 등 매 갱신마다 바뀌는 값 제외)"""
+    if name == "indices":
+        return compact_indices(result)
+    return compact_quotes(result)
+
+
+ETAG_SUFFIXES = {"gzip": "gz", "br": "br"}
+
+
+class SnapshotBody:
+    """직렬화된 응답 한 벌 - 인코딩별 압축본은 처음 요청될 때 한 번만 만듦"""
+
+    def __init__(self, etag, raw):
+        self.etag = etag
+        self._encoded = {"identity": raw}
+        self._lock = threading.Lock()
+
+    def etag_for(self, encoding):
+        """인코딩별 강한 ETag - 압축본은 바이트가 다르므로 <버전>-gz, <버전>-br"""
+        return self.etag if encoding == "identity" else f"{self.etag}-{ETAG_SUFFIXES[encoding]}"
+
+    def negotiate(self, accept_encodings):
+        """Accept-Encoding에 맞는 인코딩 - br(설치된 경우) > gzip > identity"""
+        if brotli is not None and accept_encodings["br"]:
+            return "br"
+        if accept_encodings["gzip"]:
+            return "gzip"
+        return "identity"
+
+    def encoded(self, encoding):
+        body = self._encoded.get(encoding)
+        if body is not None:
+            return body
+        with self._lock:
+            body = self._encoded.get(encoding)
+            if body is None:
+                raw = self._encoded["identity"]
+                body = brotli.compress(raw, quality=5) if encoding == "br" else gzip.compress(raw, compresslevel=6)
+                self._encoded[encoding] = body
+            return body
+
+
+class DashboardSnapshots:
+    """스냅샷 버전 관리와 응답 바이트 캐시 - 갱신기 스냅샷 리스너로 등록해 사용"""
+
+    WATCHED_JOBS = ("indices",) + DASHBOARD_MARKETS + tuple(f"watch:{market}" for market in DASHBOARD_MARKETS)
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.version = 0
+        # 워커마다 버전 카운터가 따로라 ETag에 프로세스 구분값을 넣어 다른 워커 응답과 섞이지 않게 함
+        self.boot_id = os.urandom(4).hex()
+        self._bodies = OrderedDict()  # (버전, 시장, 관심종목 digest) -> SnapshotBody
+        self._lock = threading.Lock()
+
+    def on_snapshot(self, name, previous, current):
+        """갱신기 리스너 - 보이는 값이 바뀐 경우에만 버전 증가"""
+        if name not in self.WATCHED_JOBS or _compact(name, previous) == _compact(name, current):
+            return
+        with self._lock:
+            self.version += 1
+            self._bodies.clear()
+
+    def body(self, market, interests, build):
+        """(현재 버전, 시장, 관심종목 구성)의 응답 바이트 - 없으면 build()로 payload를 만들어 직렬화"""
+        digest = hashlib.blake2b(
+            json.dumps(interests, sort_keys=True, ensure_ascii=False).encode("utf-8"), digest_size=6
+        ).hexdigest()
+        with self._lock:
+            version = self.version
+            key = (version, market, digest)
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+
+        payload = build()
+        payload["v"] = version
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        body = SnapshotBody(f"{self.boot_id}-{version}-{market}-{digest}", raw)
+        with self._lock:
+            if self.version == version:
+                self._bodies[key] = body
+                while len(self._bodies) > self.max_entries:
+                    self._bodies.popitem(last=False)
+        return body
+
+
+def build_dashboard_payload(market, interests):
+    """통합 응답 내용 - 갱신기 스냅샷 기준 (아직 없는 부분은 비워 두고 ready=false)"""
+    indices = get_market_snapshot("indices")
+    board = get_market_snapshot(market)
+    return {
+        "success": True,
+        "ready": bool(indices and board),
+        "market": market,
+        "indices": (indices or {}).get("indices", {}),
+        "stocks": get_indicator_engine().attach(market, (board or {}).get("stocks", [])),
+        "interests": [dict(item, quote=get_watched_quote(item["market"], item["ticker"])) for item in interests],
+        "asOf": (board or indices or {}).get("asOf")
+    }
+
+
+dashboard_snapshots = DashboardSnapshots()
+add_snapshot_listener(dashboard_snapshots.on_snapshot)
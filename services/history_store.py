@@ -0,0 +1,381 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from services.market_hours import KST, NEW_YORK
+
+# 고정 폭 봉 레코드: 시작시각(epoch 초), 시가, 고가, 저가, 종가, 거래량
+BAR_RECORD = struct.Struct("<qddddq")
+# 세그먼트 인덱스: INDEX_STRIDE 건마다 해당 레코드의 시작시각
+INDEX_RECORD = struct.Struct("<q")
+INDEX_STRIDE = 64
+
+INTERVALS = ("1m", "1d")
+# 종목코드/심볼 (BRK.B 등) - 경로에 그대로 쓰이므로 이 형식만 허용, "."/".."가 되지 않게 점으로 시작 불가
+TICKER_PATTERN = re.compile(r"^(?!\.)[A-Za-z0-9.]{1,12}$")
+MAX_QUERY_BARS = 5000
+
+_MARKET_TZ = {"domestic": KST, "us": NEW_YORK}
+
+
+def market_date(market, ts):
+    """시장 현지 날짜 (YYYYMMDD)"""
+    return datetime.fromtimestamp(ts, _MARKET_TZ.get(market, KST)).strftime("%Y%m%d")
+
+
+def _day_start(market, ts):
+    local = datetime.fromtimestamp(ts, _MARKET_TZ.get(market, KST))
+    return int(local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+class SegmentWriter:
+    """세그먼트 파일 하나에 봉을 시간순으로 추가 (마지막 시각 이하인 봉은 무시)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.count = 0
+        self.last_ts = None
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            self.count = size // BAR_RECORD.size
+            if size % BAR_RECORD.size:
+                # 중간에 끊긴 마지막 레코드 정리
+                with open(path, "r+b") as f:
+                    f.truncate(self.count * BAR_RECORD.size)
+            if self.count:
+                with open(path, "rb") as f:
+                    f.seek((self.count - 1) * BAR_RECORD.size)
+                    self.last_ts = BAR_RECORD.unpack(f.read(BAR_RECORD.size))[0]
+
+    def append(self, bars):
+        """[(ts, o, h, l, c, v)] 추가 - 추가된 건수 반환"""
+        records = []
+        index = []
+        for bar in bars:
+            if self.last_ts is not None and bar[0] <= self.last_ts:
+                continue
+            if self.count % INDEX_STRIDE == 0:
+                index.append(INDEX_RECORD.pack(bar[0]))
+            records.append(BAR_RECORD.pack(*bar))
+            self.last_ts = bar[0]
+            self.count += 1
+
+        if records:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(b"".join(records))
+            if index:
+                with open(self.index_path, "ab") as f:
+                    f.write(b"".join(index))
+        return len(records)
+
+    def merge(self, bars):
+        """시간순이 아니거나 기존 봉보다 이른 봉도 반영 - 반영 건수 반환
+
+        모두 마지막 시각 이후면 append와 같고, 아니면 기존 봉과 합쳐(같은 시각은 새 봉으로 교체)
+        세그먼트를 다시 씁니다. 교체 중에는 인덱스를 먼저 지워 읽는 쪽이 전체 이분 탐색을 하게 합니다.
+        """
+        merged = {bar[0]: tuple(bar) for bar in bars}
+        if not merged:
+            return 0
+        if self.last_ts is None or min(merged) > self.last_ts:
+            return self.append(sorted(merged.values()))
+
+        existing = {bar[0]: bar for bar in read_segment(self.path, -2 ** 63, 2 ** 63 - 1)}
+        existing.update(merged)
+        records = sorted(existing.values())
+
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(BAR_RECORD.pack(*bar) for bar in records))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.remove(self.index_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, self.path)
+
+        index_tmp = f"{self.index_path}.tmp"
+        with open(index_tmp, "wb") as f:
+            f.write(b"".join(INDEX_RECORD.pack(bar[0]) for bar in records[::INDEX_STRIDE]))
+        os.replace(index_tmp, self.index_path)
+
+        self.count = len(records)
+        self.last_ts = records[-1][0]
+        return len(merged)
+
+
+def read_segment(path, start, end, limit=None):
+    """세그먼트에서 [start, end) 구간 봉 읽기 - 인덱스로 블록을 찾고 mmap 안에서 이분 탐색"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return []
+    count = size // BAR_RECORD.size
+    if count == 0:
+        return []
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        first = _seek(mm, path + ".idx", count, start)
+        bars = []
+        offset = first * BAR_RECORD.size
+        limit_offset = count * BAR_RECORD.size
+        while offset < limit_offset:
+            bar = BAR_RECORD.unpack_from(mm, offset)
+            if bar[0] >= end:
+                break
+            bars.append(bar)
+            if limit is not None and len(bars) >= limit:
+                break
+            offset += BAR_RECORD.size
+        return bars
+
+
+def _seek(mm, index_path, count, start):
+    """start 이상인 첫 레코드 번호"""
+    lo, hi = 0, count
+    try:
+        with open(index_path, "rb") as f:
+            data = f.read()
+        marks = [ts for (ts,) in INDEX_RECORD.iter_unpack(data[:len(data) - len(data) % INDEX_RECORD.size])]
+        block = bisect_right(marks, start) - 1
+        if block >= 0:
+            lo = block * INDEX_STRIDE
+            hi = min(count, lo + INDEX_STRIDE + 1)
+    except OSError:
+        pass
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if struct.unpack_from("<q", mm, mid * BAR_RECORD.size)[0] < start:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class BarBuilder:
+    """틱(가격, 누적거래량)을 분봉/일봉으로 집계"""
+    __slots__ = ("minute", "day", "last_volume", "last_tick")
+
+    def __init__(self):
+        self.minute = None       # [ts, o, h, l, c, v]
+        self.day = None
+        self.last_volume = None
+        self.last_tick = None    # 마지막으로 반영한 틱 시각
+
+    @staticmethod
+    def _merge(bar, ts, price, volume):
+        if bar is None or bar[0] != ts:
+            return [ts, price, price, price, price, volume], bar
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        bar[5] += volume
+        return bar, None
+
+
+class HistoryStore:
+    """종목별/일별 추가 전용 세그먼트 파일에 OHLCV 봉을 저장하는 시계열 저장소
+
+    <root>/<market>/<ticker>/1m-YYYYMMDD.bin  분봉 (시장 현지 날짜 기준)
+    <root>/<market>/<ticker>/1d-YYYY.bin      일봉
+    각 세그먼트 옆 .idx 파일에 INDEX_STRIDE 건마다 시각을 적어 두어 구간 조회 시
+    파일 전체를 읽지 않고 해당 블록으로 바로 이동합니다. 실시간 기록은 추가만 하고,
+    과거 봉을 채우는 백필(merge_bars)은 필요한 세그먼트만 합쳐서 다시 씁니다.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._builders = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def _segment_path(self, market, ticker, interval, ts):
+        local_date = market_date(market, ts)
+        name = f"1m-{local_date}.bin" if interval == "1m" else f"1d-{local_date[:4]}.bin"
+        return os.path.join(self.root, market, ticker, name)
+
+    def _writer(self, path):
+        writer = self._writers.get(path)
+        if writer is None:
+            writer = self._writers[path] = SegmentWriter(path)
+        return writer
+
+    def _close_writers(self, market, ticker, ts):
+        """종목의 날이 바뀌면 지난 세그먼트 기록기를 닫음 - 실시간 기록기는 ts가 속한 세그먼트만 유지"""
+        keep = {self._segment_path(market, ticker, interval, ts) for interval in INTERVALS}
+        directory = os.path.join(self.root, market, ticker) + os.sep
+        with self._lock:
+            for path in [p for p in self._writers if p.startswith(directory) and p not in keep]:
+                del self._writers[path]
+
+    def _segments(self, market, ticker, interval, bars):
+        """봉들을 세그먼트별 [(경로, 봉 목록)]으로 나눔 (입력 순서 유지)"""
+        batches, batch, batch_path = [], [], None
+        for bar in bars:
+            path = self._segment_path(market, ticker, interval, bar[0])
+            if path != batch_path and batch:
+                batches.append((batch_path, batch))
+                batch = []
+            batch_path = path
+            batch.append(tuple(bar))
+        if batch:
+            batches.append((batch_path, batch))
+        return batches
+
+    def append_bars(self, market, ticker, interval, bars):
+        """완성된 봉들을 세그먼트별로 나눠 추가 (시간순 정렬 가정, 마지막 시각 이하는 무시) - 추가 건수 반환"""
+        with self._lock:
+            return sum(self._writer(path).append(batch) for path, batch in self._segments(market, ticker, interval, bars))
+
+    def merge_bars(self, market, ticker, interval, bars):
+        """과거 봉 반영 (백필) - 이미 더 늦은 봉이 기록된 세그먼트는 합쳐서 다시 씀, 반영 건수 반환
+
+        실시간 기록 중인 세그먼트가 아니면 기록기를 남겨 두지 않습니다 (백필 기간만큼 쌓이지 않게).
+        """
+        with self._lock:
+            return sum(
+                (self._writers.get(path) or SegmentWriter(path)).merge(batch)
+                for path, batch in self._segments(market, ticker, interval, sorted(bars))
+            )
+
+    def record_tick(self, market, ticker, price, cumulative_volume, ts=None):
+        """현재가 틱 반영 - 분이 바뀌면 직전 분봉을, 날이 바뀌면 직전 일봉을 파일에 기록
+
+        시각이 직전 틱 이하인 시세(업스트림 실패 중 다시 내보낸 마지막 시세 등)는 새 틱이 아니므로 무시합니다.
+        """
+        if not price:
+            return
+        ts = ts or time.time()
+        minute_ts = int(ts) - int(ts) % 60
+        day_ts = _day_start(market, ts)
+
+        with self._lock:
+            builder = self._builders.get((market, ticker))
+            if builder is None:
+                builder = self._builders[(market, ticker)] = BarBuilder()
+            if builder.last_tick is not None and ts <= builder.last_tick:
+                return
+            builder.last_tick = ts
+
+            volume = 0
+            if builder.last_volume is not None and cumulative_volume >= builder.last_volume:
+                volume = cumulative_volume - builder.last_volume
+            builder.last_volume = cumulative_volume
+
+            builder.minute, done_minute = BarBuilder._merge(builder.minute, minute_ts, price, volume)
+            builder.day, done_day = BarBuilder._merge(builder.day, day_ts, price, volume)
+            # 일봉 거래량은 당일 누적거래량 그대로 사용
+            builder.day[5] = max(builder.day[5], cumulative_volume)
+
+        if done_minute is not None:
+            self.append_bars(market, ticker, "1m", [done_minute])
+        if done_day is not None:
+            self.append_bars(market, ticker, "1d", [done_day])
+            self._close_writers(market, ticker, ts)
+
+    def flush(self):
+        """진행 중인 봉을 모두 기록 (종료 시 - 이후 같은 시각 봉은 추가되지 않음)"""
+        with self._lock:
+            pending = [(key, b.minute, b.day) for key, b in self._builders.items()]
+        for (market, ticker), minute, day in pending:
+            if minute:
+                self.append_bars(market, ticker, "1m", [minute])
+            if day:
+                self.append_bars(market, ticker, "1d", [day])
+
+    def query(self, market, ticker, interval, start, end, limit=MAX_QUERY_BARS):
+        """[start, end) 구간 봉 조회 - 겹치는 세그먼트만 열고 진행 중인 봉도 포함"""
+        if not TICKER_PATTERN.match(ticker):
+            raise ValueError(f"잘못된 종목코드입니다: {ticker}")
+        limit = max(1, min(int(limit), MAX_QUERY_BARS))
+        directory = os.path.join(self.root, market, ticker)
+        prefix = f"{interval}-"
+        try:
+            names = sorted(n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith(".bin"))
+        except OSError:
+            names = []
+
+        # 세그먼트 이름(날짜/연도)으로 구간 밖 파일은 열지 않음
+        key_len = 8 if interval == "1m" else 4
+        first_key = market_date(market, start)[:key_len]
+        last_key = market_date(market, max(start, end - 1))[:key_len]
+
+        bars = []
+        for name in names:
+            key = name[len(prefix):-4]
+            if key < first_key or key > last_key:
+                continue
+            bars.extend(read_segment(os.path.join(directory, name), start, end, limit - len(bars)))
+            if len(bars) >= limit:
+                return bars[:limit]
+
+        with self._lock:
+            builder = self._builders.get((market, ticker))
+            live = None
+            if builder is not None:
+                live = builder.minute if interval == "1m" else builder.day
+            if live and start <= live[0] < end and (not bars or live[0] > bars[-1][0]):
+                bars.append(tuple(live))
+        return bars[:limit]
+
+
+history_store = None
+_store_lock = threading.Lock()
+
+def get_history_store():
+    """프로세스 공용 시계열 저장소 (HISTORY_DIR, 기본 data/history)"""
+    global history_store
+    with _store_lock:
+        if history_store is None:
+            history_store = HistoryStore(os.getenv("HISTORY_DIR", os.path.join("data", "history")))
+    return history_store
+
+def history_market(market):
+    """시장 키 정규화 - 해외 거래소 코드(NAS/NYS/AMS)는 us"""
+    return "domestic" if market == "domestic" else "us"
+
+def record_quotes(market, stocks, ts=None):
+    """시세 목록(get_stock_price 형태)을 틱으로 기록"""
+    if os.getenv("HISTORY_ENABLED", "1") == "0":
+        return
+    store = get_history_store()
+    market = history_market(market)
+    for stock in stocks:
+        if stock.get("stale"):  # 조회 실패로 대신 내보낸 마지막 시세 - 새 틱이 아님
+            continue
+        store.record_tick(market, stock["ticker"], stock.get("price"), stock.get("volume") or 0,
+                          stock.get("updatedAt") or ts)
+
+def query_history(ticker, market="domestic", interval="1m", start=None, end=None, limit=MAX_QUERY_BARS):
+    """/api/history 응답 생성 - start/end는 epoch 초 (기본: 최근 하루 / 분봉, 최근 1년 / 일봉)
+
+    limit은 1~MAX_QUERY_BARS로 제한합니다.
+    """
+    if not TICKER_PATTERN.match(ticker):
+        return {"success": False, "message": f"잘못된 종목코드입니다: {ticker}"}
+    if interval not in INTERVALS:
+        return {"success": False, "message": f"지원하지 않는 주기입니다: {interval}"}
+
+    # 미래 구간은 봉이 없으므로 하루 뒤까지로 제한
+    horizon = int(time.time()) + 86400
+    end = min(int(end), horizon) if end is not None else horizon
+    if start is None:
+        start = end - (2 * 86400 if interval == "1m" else 366 * 86400)
+    start = max(int(start), 0)
+    bars = get_history_store().query(history_market(market), ticker, interval, start, end, limit)
+    return {
+        "success": True,
+        "ticker": ticker,
+        "market": market,
+        "interval": interval,
+        "bars": [{"t": t, "o": float(o), "h": float(h), "l": float(l), "c": float(c), "v": int(v)} for t, o, h, l, c, v in bars]
+    }
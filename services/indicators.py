@@ -0,0 +1,366 @@
+"""종목별 기술적 지표 - 이동평균(SMA), 세션 VWAP, RSI(Wilder), 볼린저 밴드
+
+시세가 들어올 때마다 전체 이력을 다시 계산하지 않고 종목별 롤링 상태만 O(1)로 갱신합니다.
+지표는 분봉(bar_seconds) 종가 기준이며 진행 중인 봉은 마지막 시세로 잠정 반영합니다. 같은 시세가
+여러 번 들어와도(캐시/스냅샷 재전달) 진행 중인 봉의 종가만 다시 쓰므로 값이 달라지지 않습니다.
+
+- SMA/볼린저: 기간 길이 링 버퍼 + 합/제곱합
+- RSI: Wilder 평활 평균 상승/하락폭 (완성된 봉까지 확정, 진행 중인 봉은 잠정 계산)
+- VWAP: 시장 현지 날짜 기준 세션의 봉별 대표가((고가+저가+종가)/3)×봉 거래량 합 / 거래량 합
+  (봉 거래량은 누적거래량 차분, 진행 중인 봉도 같은 식으로 잠정 반영 - 이력 봉으로 초기화한 값과 같은 정의)
+
+종목을 처음 볼 때 시계열 이력(services.history_store)의 최근 분봉으로 상태를 채우며,
+NumPy가 설치되어 있으면 이 초기 계산을 배열 연산으로 한 번에 처리합니다.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy가 없으면 초기 계산도 순수 파이썬으로
+    np = None
+
+from services.history_store import get_history_store, history_market, market_date
+
+logger = logging.getLogger(__name__)
+
+SMA_PERIODS = (5, 20)
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0
+RSI_PERIOD = 14
+# 초기 상태 계산에 쓰는 과거 분봉 수 - RSI 평활이 충분히 수렴하도록 기간의 몇 배를 사용
+SEED_BARS = 200
+
+
+class RollingWindow:
+    """고정 길이 링 버퍼 + 합/제곱합 - 새 값 추가와 마지막 값 교체 모두 O(1)"""
+    __slots__ = ("size", "values", "count", "head", "total", "total_sq", "_pushes")
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.count = 0
+        self.head = 0      # 다음에 쓸 위치
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._pushes = 0
+
+    def push(self, value):
+        if self.count == self.size:
+            old = self.values[self.head]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.total += value
+        self.total_sq += value * value
+        self._pushes += 1
+        if self._pushes % 1024 == 0:
+            self._resync()
+
+    def replace_last(self, value):
+        if not self.count:
+            self.push(value)
+            return
+        last = (self.head - 1) % self.size
+        old = self.values[last]
+        self.values[last] = value
+        self.total += value - old
+        self.total_sq += value * value - old * old
+
+    def _resync(self):
+        """합/제곱합의 부동소수점 누적 오차 정리"""
+        if self.count == self.size:
+            values = self.values
+        else:
+            values = [self.values[(self.head - self.count + i) % self.size] for i in range(self.count)]
+        self.total = math.fsum(values)
+        self.total_sq = math.fsum(v * v for v in values)
+
+    def full(self):
+        return self.count == self.size
+
+    def mean(self):
+        return self.total / self.count
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(0.0, self.total_sq / self.count - mean * mean))
+
+
+class WilderRSI:
+    """Wilder 평활 RSI - 완성된 봉 종가로 확정(commit), 진행 중인 봉은 value(close)로 잠정 계산"""
+    __slots__ = ("period", "prev_close", "avg_gain", "avg_loss", "changes")
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.changes = 0  # 확정된 변화량 수 (period개까지는 단순 평균)
+
+    def _averages(self, close):
+        change = close - self.prev_close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        n = min(self.changes + 1, self.period)
+        return (self.avg_gain * (n - 1) + gain) / n, (self.avg_loss * (n - 1) + loss) / n
+
+    def commit(self, close):
+        if self.prev_close is not None:
+            self.avg_gain, self.avg_loss = self._averages(close)
+            self.changes += 1
+        self.prev_close = close
+
+    def value(self, close):
+        if self.prev_close is None or self.changes + 1 < self.period:
+            return None
+        avg_gain, avg_loss = self._averages(close)
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class SymbolIndicators:
+    """종목 하나의 롤링 지표 상태"""
+    __slots__ = ("market", "bar_ts", "close", "high", "low", "bar_volume", "windows", "rsi", "session", "pv", "volume",
+                 "last_volume")
+
+    def __init__(self, market):
+        self.market = market
+        self.bar_ts = None
+        self.close = None
+        self.high = self.low = None
+        self.bar_volume = 0.0    # 진행 중인 봉의 거래량
+        self.windows = {period: RollingWindow(period) for period in set(SMA_PERIODS) | {BOLLINGER_PERIOD}}
+        self.rsi = WilderRSI(RSI_PERIOD)
+        self.session = None      # VWAP 세션 날짜 (YYYYMMDD)
+        self.pv = 0.0            # 세션의 완성된 봉 대표가×거래량 합
+        self.volume = 0.0        # 세션의 완성된 봉 거래량 합
+        self.last_volume = None  # 직전 누적거래량
+
+    def _typical(self):
+        return (self.high + self.low + self.close) / 3.0
+
+    def _roll(self, bar_ts, close):
+        """새 봉 시작 - 직전 봉 종가를 RSI에, 대표가×거래량을 VWAP에 확정하고 창에 새 칸 추가"""
+        if self.close is not None:
+            self.rsi.commit(self.close)
+            if self.bar_volume:
+                self.pv += self._typical() * self.bar_volume
+                self.volume += self.bar_volume
+        for window in self.windows.values():
+            window.push(close)
+        self.bar_ts = bar_ts
+        self.close = self.high = self.low = close
+        self.bar_volume = 0.0
+
+    def update(self, bar_ts, price, cumulative_volume, session):
+        if bar_ts == self.bar_ts:
+            for window in self.windows.values():
+                window.replace_last(price)
+            self.close = price
+            self.high, self.low = max(self.high, price), min(self.low, price)
+        elif self.bar_ts is None or bar_ts > self.bar_ts:
+            self._roll(bar_ts, price)
+        else:
+            return  # 이전 봉 시각의 늦은 시세는 무시
+
+        if session != self.session:
+            self.session, self.pv, self.volume, self.last_volume = session, 0.0, 0.0, None
+        if self.last_volume is not None and cumulative_volume > self.last_volume:
+            self.bar_volume += cumulative_volume - self.last_volume
+        if self.last_volume is None or cumulative_volume >= self.last_volume:
+            self.last_volume = cumulative_volume
+
+    def values(self):
+        """현재 지표 값 dict - 기간만큼 봉이 쌓이지 않은 지표는 None"""
+        if self.close is None:
+            return None
+        values = {}
+        for period in SMA_PERIODS:
+            window = self.windows[period]
+            values[f"sma{period}"] = round(window.mean(), 4) if window.full() else None
+        band = self.windows[BOLLINGER_PERIOD]
+        if band.full():
+            middle, width = band.mean(), BOLLINGER_WIDTH * band.std()
+            values.update(bbUpper=round(middle + width, 4), bbMiddle=round(middle, 4), bbLower=round(middle - width, 4))
+        else:
+            values.update(bbUpper=None, bbMiddle=None, bbLower=None)
+        rsi = self.rsi.value(self.close)
+        values[f"rsi{RSI_PERIOD}"] = round(rsi, 2) if rsi is not None else None
+        volume = self.volume + self.bar_volume
+        values["vwap"] = round((self.pv + self._typical() * self.bar_volume) / volume, 4) if volume else None
+        return values
+
+
+def _wilder_seed(closes, period):
+    """종가 배열 → (평균 상승폭, 평균 하락폭, 변화량 수) - WilderRSI.commit을 차례로 적용한 것과 같은 결과"""
+    if np is None or len(closes) < 2:
+        rsi = WilderRSI(period)
+        for close in closes:
+            rsi.commit(close)
+        return rsi.avg_gain, rsi.avg_loss, rsi.changes
+
+    changes = np.diff(np.asarray(closes, dtype=np.float64))
+    gains, losses = np.maximum(changes, 0.0), np.maximum(-changes, 0.0)
+    if len(changes) <= period:
+        return float(gains.mean()), float(losses.mean()), len(changes)
+    # 첫 period개는 단순 평균, 이후는 계수 (1 - 1/period)인 지수 평활 - 가중치 벡터 한 번의 내적으로 계산
+    decay = 1.0 - 1.0 / period
+    rest = len(changes) - period
+    weights = decay ** np.arange(rest - 1, -1, -1) / period
+    scale = decay ** rest
+    avg_gain = gains[:period].mean() * scale + float(np.dot(weights, gains[period:]))
+    avg_loss = losses[:period].mean() * scale + float(np.dot(weights, losses[period:]))
+    return float(avg_gain), float(avg_loss), len(changes)
+
+
+def seed_state(market, bars, session):
+    """과거 분봉 [(ts, o, h, l, c, v), ...] (시간순, 완성된 봉만) → 종목 상태
+
+    마지막 봉까지의 창/RSI/당일 VWAP을 한 번에 계산합니다. 이후 시세는 update로 이어서 반영합니다.
+    VWAP은 update가 봉을 확정할 때와 같은 대표가×봉 거래량 합이므로 마지막 봉까지 모두 확정해 둡니다.
+    """
+    state = SymbolIndicators(market)
+    if not bars:
+        return state
+    bars = bars[-SEED_BARS:]
+    closes = [bar[4] for bar in bars]
+
+    # 창은 마지막 period개 종가로 채움 (마지막 봉은 진행 중이 아니므로 다음 시세가 새 봉을 시작)
+    for window in state.windows.values():
+        for close in closes[-window.size:]:
+            window.push(close)
+
+    # RSI는 마지막 봉 직전까지 확정 - 마지막 봉은 다음 봉이 시작될 때 _roll이 확정 (update로 쌓은 상태와 동일)
+    rsi = state.rsi
+    if len(closes) > 1:
+        rsi.avg_gain, rsi.avg_loss, rsi.changes = _wilder_seed(closes[:-1], RSI_PERIOD)
+        rsi.prev_close = closes[-2]
+
+    today = [bar for bar in bars if market_date(market, bar[0]) == session]
+    if np is not None and today:
+        data = np.asarray(today, dtype=np.float64)
+        typical = (data[:, 2] + data[:, 3] + data[:, 4]) / 3.0
+        state.pv, state.volume = float(np.dot(typical, data[:, 5])), float(data[:, 5].sum())
+    else:
+        state.pv = math.fsum((bar[2] + bar[3] + bar[4]) / 3.0 * bar[5] for bar in today)
+        state.volume = float(sum(bar[5] for bar in today))
+    state.session = session
+    state.bar_ts = bars[-1][0]
+    state.close = state.high = state.low = closes[-1]
+    return state
+
+
+class IndicatorEngine:
+    """(시장, 종목)별 지표 상태와 응답용 JSON 조각 보관
+
+    update()는 시세 목록을 받아 종목마다 O(1)로 상태를 갱신하고, 응답 직렬화에 바로 붙일 수 있도록
+    종목별 지표 JSON 조각(',"indicators":{...}')을 미리 만들어 둡니다.
+    """
+
+    def __init__(self, bar_seconds=60, seed_from_history=True):
+        self.bar_seconds = bar_seconds
+        self.seed_from_history = seed_from_history
+        self._states = {}      # (market, ticker) -> SymbolIndicators
+        self._values = {}      # (market, ticker) -> 지표 dict
+        self._fragments = {}   # market -> {ticker: JSON 조각}
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.seeded = 0
+
+    def _seed(self, market, ticker, bar_ts, session):
+        """처음 보는 종목 - 이력 저장소의 최근 완성 분봉으로 상태 초기화"""
+        bars = []
+        if self.seed_from_history and self.bar_seconds == 60:
+            try:
+                bars = get_history_store().query(market, ticker, "1m", bar_ts - 2 * 86400, bar_ts, limit=100000)
+            except Exception as e:
+                logger.error(f"지표 초기화용 이력 조회 실패 ({ticker}): {e}")
+        if bars:
+            self.seeded += 1
+        return seed_state(market, bars, session)
+
+    def update(self, market, stocks, ts=None):
+        """시세 목록(get_stock_price 형태) 반영 - 해외 거래소 코드(NAS/NYS/AMS)는 us로 묶음"""
+        market = history_market(market)
+        ts = ts or time.time()
+        bar_ts = int(ts) - int(ts) % self.bar_seconds
+        session = market_date(market, ts)
+        fragments = self._fragments.setdefault(market, {})
+
+        for stock in stocks:
+            price = stock.get("price")
+            if not price:
+                continue
+            key = (market, stock["ticker"])
+            state = self._states.get(key)
+            if state is None:
+                state = self._seed(market, stock["ticker"], bar_ts, session)
+            with self._lock:
+                state = self._states.setdefault(key, state)
+                state.update(bar_ts, float(price), stock.get("volume") or 0, session)
+                values = state.values()
+                self._values[key] = values
+                fragments[stock["ticker"]] = ',"indicators":' + json.dumps(values, separators=(",", ":"))
+                self.updates += 1
+
+    def get(self, market, ticker):
+        """종목 지표 dict (아직 없으면 None)"""
+        return self._values.get((history_market(market), ticker))
+
+    def fragments(self, market):
+        """{종목: 지표 JSON 조각} - QuoteStore.to_json(suffixes=...)용"""
+        return self._fragments.get(history_market(market), {})
+
+    def attach(self, market, stocks):
+        """시세 목록에 indicators 필드를 붙인 복사본 (캐시 공유 dict는 수정하지 않음)"""
+        return [dict(stock, indicators=self.get(market, stock["ticker"])) for stock in stocks]
+
+    def stats(self):
+        return {"symbols": len(self._states), "updates": self.updates, "seeded": self.seeded,
+                "barSeconds": self.bar_seconds, "vectorized": np is not None}
+
+
+indicator_engine = None
+_engine_lock = threading.Lock()
+
+def get_indicator_engine():
+    """프로세스 공용 지표 엔진 (INDICATOR_BAR_SEC, 기본 60초 봉)"""
+    global indicator_engine
+    with _engine_lock:
+        if indicator_engine is None:
+            indicator_engine = IndicatorEngine(
+                bar_seconds=int(os.getenv("INDICATOR_BAR_SEC", "60")),
+                seed_from_history=os.getenv("HISTORY_ENABLED", "1") != "0"
+            )
+    return indicator_engine
+
+def indicators_enabled():
+    return os.getenv("INDICATORS_ENABLED", "1") != "0"
+
+def update_indicators(market, stocks, ts=None):
+    """시세 목록을 지표 엔진에 반영 (INDICATORS_ENABLED=0이면 사용 안 함)"""
+    if indicators_enabled():
+        get_indicator_engine().update(market, stocks, ts)
+
+def indicator_lookup(market):
+    """알림 평가용 종목 → 지표 dict 조회 함수 (지표를 쓰지 않으면 None)"""
+    if not indicators_enabled():
+        return None
+    engine = get_indicator_engine()
+    return lambda ticker: engine.get(market, ticker)
+
+def attach_indicators(market, result):
+    """직접 조회한 시세 응답 - 엔진에 반영하고 종목마다 indicators를 붙인 응답 반환"""
+    if not result.get("success") or not indicators_enabled():
+        return result
+    engine = get_indicator_engine()
+    engine.update(market, result["stocks"])
+    return dict(result, stocks=engine.attach(market, result["stocks"]))
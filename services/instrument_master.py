@@ -0,0 +1,411 @@
+"""KIS 종목 마스터(.mst/.cod) → 메모리 매핑 종목 색인
+
+    python -m services.instrument_master build --dir data/master [--download]
+
+마스터 파일을 한 번 파싱해 고정 폭 레코드, 코드 해시 테이블, 정렬된 접두사 색인,
+부분 문자열 검색용 이름 블록으로 이루어진 단일 파일(instruments.idx)을 만들고,
+서버는 이 파일을 mmap으로 열어 코드 조회(O(1))와 이름 검색에 사용합니다.
+"""
+import argparse
+import io
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zipfile
+from bisect import bisect_right
+
+from services.log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+MASTER_BASE_URL = "https://new.real.download.dws.co.kr/common/master"
+
+# 파일명 → (시장 코드, 파서 종류)
+MASTER_FILES = {
+    "kospi_code.mst": ("KOSPI", "domestic"),
+    "kosdaq_code.mst": ("KOSDAQ", "domestic"),
+    "nasmst.cod": ("NAS", "overseas"),
+    "nysmst.cod": ("NYS", "overseas"),
+    "amsmst.cod": ("AMS", "overseas"),
+}
+
+# 국내 마스터 뒷부분 고정 폭 필드 길이 (코드/표준코드/종목명 뒤)
+_DOMESTIC_TAIL = {"KOSPI": 228, "KOSDAQ": 222}
+
+MARKETS = ("KOSPI", "KOSDAQ", "NAS", "NYS", "AMS")
+KIND_STOCK, KIND_ETF, KIND_INDEX, KIND_OTHER = range(4)
+KINDS = ("stock", "etf", "index", "other")
+
+_MAGIC = b"IMS1"
+# magic, 레코드 수, 해시 슬롯 수, 접두사 항목 수, 레코드/해시/접두사/검색줄 오프셋, 문자열/검색 블록 오프셋과 길이
+_HEADER = struct.Struct("<4sIIIQQQQQQQQ")
+# 코드 오프셋, 코드 길이, 한글명 오프셋, 한글명 길이, 영문명 오프셋, 영문명 길이, 시장, 종류
+_RECORD = struct.Struct("<IBIHIHBBx")
+_PREFIX = struct.Struct("<IHI")   # 키 오프셋(문자열 블록), 키 길이, 레코드 번호
+_U32 = struct.Struct("<I")
+
+
+def _fnv1a(data):
+    """FNV-1a 32비트 해시 (프로세스와 무관하게 같은 값이라 파일에 저장 가능)"""
+    h = 0x811C9DC5
+    for b in data:
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def normalize(text):
+    """검색용 정규화 - 소문자, 공백 제거"""
+    return "".join(text.lower().split())
+
+
+def parse_domestic_master(path, market):
+    """국내 .mst - 단축코드(9) + 표준코드(12) + 한글명 + 고정 폭 필드, cp949"""
+    tail = _DOMESTIC_TAIL[market]
+    with open(path, "rb") as f:
+        for raw in f:
+            line = raw.rstrip(b"\r\n").decode("cp949", errors="replace")
+            if len(line) <= tail + 21:
+                continue
+            head = line[:-tail]
+            code = head[0:9].strip()
+            name = head[21:].strip()
+            # 그룹코드(ST: 주권, EF: ETF, EN: ETN 등)는 뒷부분 첫 2자리
+            group = line[-tail:][:2]
+            kind = KIND_STOCK if group == "ST" else KIND_ETF if group in ("EF", "EN") else KIND_OTHER
+            if code and name:
+                yield code, name, "", market, kind
+
+
+def parse_overseas_master(path, market):
+    """해외 .cod - 탭 구분 (심볼 4, 한글명 6, 영문명 7, 종류 8: 1 지수/2 주식/3 ETP/4 워런트), cp949"""
+    with open(path, "rb") as f:
+        for raw in f:
+            cols = raw.rstrip(b"\r\n").decode("cp949", errors="replace").split("\t")
+            if len(cols) < 9 or not cols[4]:
+                continue
+            kind = {"1": KIND_INDEX, "2": KIND_STOCK, "3": KIND_ETF}.get(cols[8].strip(), KIND_OTHER)
+            yield cols[4].strip(), cols[6].strip(), cols[7].strip(), market, kind
+
+
+def load_masters(directory):
+    """디렉터리의 마스터 파일 전부 파싱 - 코드 중복 시 먼저 나온 항목 유지"""
+    seen = set()
+    for filename, (market, parser) in MASTER_FILES.items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            continue
+        parse = parse_domestic_master if parser == "domestic" else parse_overseas_master
+        for entry in parse(path, market):
+            if entry[0] not in seen:
+                seen.add(entry[0])
+                yield entry
+
+
+def build_index(entries, out_path):
+    """종목 목록 → 색인 파일 (임시 파일에 쓰고 교체) - 레코드 수 반환"""
+    strings = bytearray()
+    records = []
+    prefix_keys = []
+    search_lines = []
+
+    def intern(text):
+        data = text.encode("utf-8")
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+
+    for code, name_ko, name_en, market, kind in entries:
+        code_off, code_len = intern(code)
+        ko_off, ko_len = intern(name_ko)
+        en_off, en_len = intern(name_en)
+        row = len(records)
+        records.append(_RECORD.pack(code_off, code_len, ko_off, ko_len, en_off, en_len, MARKETS.index(market), kind))
+        # 접두사 색인 키: 코드, 한글명, 영문명 (정규화)
+        for key in {normalize(code), normalize(name_ko), normalize(name_en)}:
+            if key:
+                prefix_keys.append((key.encode("utf-8"), row))
+        search_lines.append(f"{normalize(name_ko)}\t{normalize(name_en)}\t{normalize(code)}\n".encode("utf-8"))
+
+    count = len(records)
+    slots = 1
+    while slots < count * 2:
+        slots <<= 1
+    table = [0] * slots
+    for row, record in enumerate(records):
+        code_off, code_len = _RECORD.unpack(record)[:2]
+        i = _fnv1a(strings[code_off:code_off + code_len]) & (slots - 1)
+        while table[i]:
+            i = (i + 1) & (slots - 1)
+        table[i] = row + 1
+
+    prefix_keys.sort()
+    prefix_entries = []
+    for key, row in prefix_keys:
+        key_off, key_len = intern(key.decode("utf-8"))
+        prefix_entries.append(_PREFIX.pack(key_off, key_len, row))
+
+    # 검색 블록과 줄 시작 오프셋 (부분 문자열 위치 → 레코드 번호)
+    search = b"".join(search_lines)
+    line_starts = []
+    offset = 0
+    for line in search_lines:
+        line_starts.append(offset)
+        offset += len(line)
+
+    parts = [b"\0" * _HEADER.size]
+    def section(data):
+        position = sum(len(p) for p in parts)
+        parts.append(data)
+        return position
+
+    records_off = section(b"".join(records))
+    hash_off = section(struct.pack(f"<{slots}I", *table))
+    prefix_off = section(b"".join(prefix_entries))
+    lines_off = section(struct.pack(f"<{count}I", *line_starts))
+    strings_off = section(bytes(strings))
+    search_off = section(search)
+    parts[0] = _HEADER.pack(_MAGIC, count, slots, len(prefix_entries), records_off, hash_off, prefix_off,
+                            lines_off, strings_off, len(strings), search_off, len(search))
+
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "wb") as f:
+        for part in parts:
+            f.write(part)
+    os.replace(tmp, out_path)
+    return count
+
+
+class InstrumentIndex:
+    """mmap으로 연 종목 색인 - 코드 조회 O(1), 이름 접두사/부분 문자열 검색"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, self._slots, self._prefix_count, self._records, self._hash, self._prefix,
+         self._lines, self._strings, strings_len, self._search, search_len) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError("종목 색인 형식이 아닙니다")
+        self._search_end = self._search + search_len
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _text(self, offset, length):
+        start = self._strings + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def record(self, row):
+        code_off, code_len, ko_off, ko_len, en_off, en_len, market, kind = _RECORD.unpack_from(
+            self._mm, self._records + row * _RECORD.size)
+        return {
+            "code": self._text(code_off, code_len),
+            "name": self._text(ko_off, ko_len) or self._text(en_off, en_len),
+            "nameEn": self._text(en_off, en_len),
+            "market": MARKETS[market],
+            "kind": KINDS[kind]
+        }
+
+    def _code_at(self, row):
+        code_off, code_len = _RECORD.unpack_from(self._mm, self._records + row * _RECORD.size)[:2]
+        start = self._strings + code_off
+        return self._mm[start:start + code_len]
+
+    def get(self, code):
+        """코드 → 종목 dict (없으면 None)"""
+        key = code.encode("utf-8")
+        mask = self._slots - 1
+        i = _fnv1a(key) & mask
+        while True:
+            row = _U32.unpack_from(self._mm, self._hash + i * 4)[0]
+            if row == 0:
+                return None
+            if self._code_at(row - 1) == key:
+                return self.record(row - 1)
+            i = (i + 1) & mask
+
+    def _prefix_key(self, i):
+        key_off, key_len, row = _PREFIX.unpack_from(self._mm, self._prefix + i * _PREFIX.size)
+        start = self._strings + key_off
+        return self._mm[start:start + key_len], row
+
+    def prefix_search(self, prefix, limit=20):
+        """정규화한 코드/이름이 prefix로 시작하는 레코드 번호 (키 정렬 순)"""
+        key = normalize(prefix).encode("utf-8")
+        lo, hi = 0, self._prefix_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._prefix_key(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        rows = []
+        for i in range(lo, self._prefix_count):
+            entry_key, row = self._prefix_key(i)
+            if not entry_key.startswith(key):
+                break
+            if row not in rows:
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def substring_search(self, text, limit=20, exclude=()):
+        """이름/코드 중간에 text가 들어간 레코드 번호 (레코드 순)"""
+        needle = normalize(text).encode("utf-8")
+        if not needle:
+            return []
+
+        line_starts = memoryview(self._mm)[self._lines:self._lines + self.count * 4].cast("I")
+        rows = []
+        position = self._search
+        try:
+            while len(rows) < limit:
+                found = self._mm.find(needle, position, self._search_end)
+                if found < 0:
+                    break
+                row = bisect_right(line_starts, found - self._search) - 1
+                if row not in exclude and row not in rows:
+                    rows.append(row)
+                # 같은 줄의 다른 위치는 건너뛰고 다음 줄부터
+                position = self._search + (line_starts[row + 1] if row + 1 < self.count else self._search_end - self._search)
+        finally:
+            line_starts.release()
+        return rows
+
+    def search(self, query, limit=20):
+        """코드 일치 → 접두사 일치 → 부분 문자열 일치 순으로 최대 limit건"""
+        query = query.strip()
+        if not query:
+            return []
+
+        results = []
+        exact = self.get(query.upper())
+        if exact is not None:
+            results.append(exact)
+
+        rows = self.prefix_search(query, limit)
+        if len(rows) < limit:
+            rows += self.substring_search(query, limit - len(rows), exclude=set(rows))
+
+        seen = {r["code"] for r in results}
+        for row in rows:
+            entry = self.record(row)
+            if entry["code"] not in seen:
+                seen.add(entry["code"])
+                results.append(entry)
+        return results[:limit]
+
+
+def download_masters(directory):
+    """KIS 마스터 zip 내려받아 압축 해제"""
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    for filename in MASTER_FILES:
+        url = f"{MASTER_BASE_URL}/{filename}.zip"
+        logger.info(f"마스터 파일 다운로드: {url}")
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            archive.extractall(directory)
+
+
+instrument_index = None
+_index_lock = threading.Lock()
+_retry_at = 0.0  # 색인을 만들지 못했을 때 다시 확인할 시각 (monotonic)
+
+def _master_dir():
+    return os.getenv("KIS_MASTER_DIR", os.path.join("data", "master"))
+
+def _index_path():
+    return os.getenv("INSTRUMENT_INDEX", os.path.join("data", "instruments.idx"))
+
+def get_instrument_index(block=True):
+    """프로세스 공용 종목 색인 - 색인이 없거나 마스터 파일보다 오래됐으면 다시 생성 (마스터도 없으면 None)
+
+    만들지 못했으면 INSTRUMENT_INDEX_RETRY_SEC초(기본 300) 동안은 파일을 다시 확인하지 않고 None을 반환합니다.
+    block=False면 다른 스레드가 색인을 만드는 중일 때 기다리지 않고 None을 반환합니다 (요청 경로용).
+    """
+    global instrument_index, _retry_at
+    if instrument_index is not None:
+        return instrument_index
+    if time.monotonic() < _retry_at:
+        return None
+    if not _index_lock.acquire(blocking=block):
+        return None
+    try:
+        if instrument_index is not None or time.monotonic() < _retry_at:
+            return instrument_index
+
+        path, directory = _index_path(), _master_dir()
+        masters = [os.path.join(directory, name) for name in MASTER_FILES if os.path.exists(os.path.join(directory, name))]
+        try:
+            if masters and (not os.path.exists(path) or os.path.getmtime(path) < max(map(os.path.getmtime, masters))):
+                count = build_index(load_masters(directory), path)
+                logger.info(f"종목 색인 생성: {count}건 → {path}")
+            if os.path.exists(path):
+                instrument_index = InstrumentIndex(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"종목 색인 로드 실패: {e}")
+        if instrument_index is None:
+            _retry_at = time.monotonic() + float(os.getenv("INSTRUMENT_INDEX_RETRY_SEC", "300"))
+        return instrument_index
+    finally:
+        _index_lock.release()
+
+def start_instrument_index():
+    """서버 시작 시 색인 준비를 백그라운드에서 시작 - 첫 검색 요청이 색인 생성을 기다리지 않도록"""
+    thread = threading.Thread(target=get_instrument_index, name="instrument-index", daemon=True)
+    thread.start()
+    return thread
+
+def lookup_symbol(code):
+    """코드 → 종목 dict (색인이 없거나 준비 중이거나 모르는 코드면 None)"""
+    index = get_instrument_index(block=False)
+    return index.get(code) if index is not None else None
+
+def search_symbols(query, limit=20):
+    """/api/symbols/search 응답 생성"""
+    index = get_instrument_index(block=False)
+    if index is None:
+        return {"success": False, "message": "종목 마스터가 준비되지 않았습니다"}
+    return {"success": True, "results": index.search(query, limit)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KIS 종목 마스터 색인")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="마스터 파일로 색인 생성")
+    build.add_argument("--dir", default=_master_dir(), help="마스터 파일 디렉터리")
+    build.add_argument("--out", default=_index_path(), help="색인 파일 경로")
+    build.add_argument("--download", action="store_true", help="KIS에서 마스터 파일을 먼저 내려받음")
+    search = sub.add_parser("search", help="색인 검색")
+    search.add_argument("query")
+    search.add_argument("--index", default=_index_path())
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == "build":
+        if args.download:
+            download_masters(args.dir)
+        count = build_index(load_masters(args.dir), args.out)
+        print(f"종목 색인 생성 완료: {count}건 → {args.out}")
+    else:
+        for entry in InstrumentIndex(args.index).search(args.query):
+            print(f"{entry['code']}\t{entry['market']}\t{entry['kind']}\t{entry['name']}\t{entry['nameEn']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,426 +1,455 @@
-import requests
 import json
-import time
 from datetime import datetime, timedelta
+import logging
 import os
-from flask import jsonify
-import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services import metrics
+from services.quote_cache import QuoteCache
+from services.rate_limiter import TokenBucket
+from services.kis_transport import KISTransport
+from services.kis_realtime import RealtimeQuoteTable
+from services.shared_state import get_shared_state, get_cluster_state
+from services.token_manager import TokenManager
+from services.market_indices import IndexBoard, index_request, load_market_indices
+from services.kis_resilience import FAILED, TOKEN_REJECTED, Unavailable, build_guards, classify
+from services.kis_endpoints import (
+    DOMESTIC_INDEX, DOMESTIC_MULTI_PRICE, DOMESTIC_PRICE, EXCHANGE_RATE, MULTI_PRICE_MAX_CODES,
+    OVERSEAS_DAILY_INDEX, OVERSEAS_PRICE, to_int
+)
+
+logger = logging.getLogger(__name__)
 
 class KISAPIService:
     """한국투자증권 Open API 서비스 - 실제 데이터만"""
     
-    def __init__(self, app_key=None, app_secret=None):
+    def __init__(self, app_key=None, app_secret=None, quote_cache=None, base_url=None):
         self.app_key = app_key or os.getenv("KIS_APP_KEY")
         self.app_secret = app_secret or os.getenv("KIS_APP_SECRET") 
-        self.base_url = "https://openapi.koreainvestment.com:9443"
-        self.access_token = None
-        self.token_expired = None
-        self.token_cache_file = ".kis_token_cache.pkl"
-        self.last_token_request = None
+        
+        # 프로세스 간 공유 상태 (SHARED_STATE_URL) - 토큰과 시세를 여러 워커가 함께 사용
+        self.shared_state = get_shared_state()
+        
+        # 토큰 수명 관리 - 만료 KIS_TOKEN_REFRESH_MARGIN초 전에 백그라운드에서 재발급
+        self.token_manager = TokenManager(
+            self.request_access_token,
+            self.shared_state,
+            os.getenv("KIS_TOKEN_CACHE_FILE", ".kis_token_cache.json"),
+            refresh_margin=float(os.getenv("KIS_TOKEN_REFRESH_MARGIN", "3600")),
+            wait_timeout=float(os.getenv("KIS_TOKEN_WAIT_SEC", "10")),
+            node_id=f"{os.getpid()}:{id(self)}"
+        )
+        
+        # 프로세스 공용 시세 캐시 (TTL 초, 최대 종목 수) - 공유 백엔드가 있으면 워커 간에도 공유
+        self.quote_cache = quote_cache or QuoteCache(
+            ttl=float(os.getenv("KIS_QUOTE_CACHE_TTL", "5")),
+            max_entries=int(os.getenv("KIS_QUOTE_CACHE_SIZE", "2048")),
+            shared=get_cluster_state()
+        )
+        
+        # 국내 시세를 멀티종목 TR로 묶어 조회할 때의 종목 수 (1 이하면 종목별 조회만 사용)
+        self.multi_quote_size = min(int(os.getenv("KIS_MULTI_QUOTE_SIZE", str(MULTI_PRICE_MAX_CODES))), MULTI_PRICE_MAX_CODES)
+        # 종목별 상장주식수 - 멀티종목 응답에는 없어서 개별 조회 때 받아 두고 시가총액 계산에 사용
+        self.listed_shares = {}
+        
+        # KIS 초당 호출 한도에 맞춘 토큰 버킷과 시세 동시 조회용 스레드 풀
+        self.rate_limiter = TokenBucket(float(os.getenv("KIS_RATE_LIMIT_PER_SEC", "18")))
+        self.fetch_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("KIS_FETCH_WORKERS", "8")),
+            thread_name_prefix="kis-fetch"
+        )
+        
+        # 호출 종류별 동시 호출 한도(AIMD)와 회로 차단기 - 업스트림이 느리거나 막히면 기다리지 않고 바로 실패
+        self.guards = build_guards()
+        
+        # 커넥션 풀 기반 HTTP 전송 계층 (KIS_BASE_URL로 스텁 서버 지정 가능)
+        self.transport = KISTransport(base_url=base_url, rate_limiter=self.rate_limiter)
+        self.base_url = self.transport.base_url
+        
+        # 실시간 웹소켓 체결 테이블 (구독 중인 종목은 REST 대신 사용)
+        self.realtime_quotes = RealtimeQuoteTable()
+        
+        # 지수 레지스트리 (MARKET_INDICES_FILE로 추가)와 지수별 마지막 정상 값
+        self.market_indices = load_market_indices()
+        self.index_board = IndexBoard(max_age=float(os.getenv("KIS_INDEX_TTL", "10")))
         
         if not self.app_key or not self.app_secret:
             raise ValueError("KIS API 키가 설정되지 않았습니다. 환경변수 KIS_APP_KEY, KIS_APP_SECRET을 설정해주세요.")
         
-        # 캐시된 토큰 로드 시도
-        self.load_cached_token()
-        
-        # 토큰이 없거나 만료된 경우에만 새로 발급
-        if not self.check_token_valid():
-            self.get_access_token()
+        # 캐시/공유 토큰을 먼저 쓰고, 없거나 만료 임박이면 갱신 스레드가 발급
+        self.token_manager.adopt()
+        self.token_manager.start()
     
-    def save_token_cache(self):
-        """토큰을 캐시 파일로 저장"""
-        try:
-            cache_data = {
-                'access_token': self.access_token,
-                'token_expired': self.token_expired,
-                'last_token_request': self.last_token_request
-            }
-            with open(self.token_cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
-            print("토큰 캐시 저장 완료")
-        except Exception as e:
-            print(f"토큰 캐시 저장 실패: {e}")
+    @property
+    def access_token(self):
+        return self.token_manager.access_token
     
-    def load_cached_token(self):
-        """캐시된 토큰을 로드"""
+    @property
+    def token_expired(self):
+        """토큰 만료 시각 (datetime, 없으면 None)"""
+        expires_at = self.token_manager.expires_at
+        return datetime.fromtimestamp(expires_at) if expires_at else None
+    
+    def request_access_token(self):
+        """토큰 발급 API 호출 한 번 - (토큰, 유효 초, 오류 코드) 반환 (재시도/대기는 TokenManager 담당)"""
+        path = "/oauth2/tokenP"
+        headers = {"Content-Type": "application/json"}
+        data = {
+            "grant_type": "client_credentials",
+            "appkey": self.app_key,
+            "appsecret": self.app_secret
+        }
+        
+        logger.info("KIS API 토큰 발급 요청 중...")
+        guard = self.guards["token"]
+        started = guard.enter()
+        outcome = FAILED
         try:
-            if os.path.exists(self.token_cache_file):
-                with open(self.token_cache_file, 'rb') as f:
-                    cache_data = pickle.load(f)
-                
-                self.access_token = cache_data.get('access_token')
-                self.token_expired = cache_data.get('token_expired')
-                self.last_token_request = cache_data.get('last_token_request')
-                
-                # 토큰이 여전히 유효한지 확인
-                if self.token_expired and datetime.now() < self.token_expired:
-                    print("캐시된 토큰 로드 성공")
-                    return True
-                else:
-                    print("캐시된 토큰이 만료됨")
-                    
-        except Exception as e:
-            print(f"토큰 캐시 로드 실패: {e}")
+            response = self.transport.post(path, headers=headers, data=json.dumps(data), throttle=False)
+            result = response.json()
+            outcome = classify(response.status_code, result)
+        finally:
+            guard.exit(started, outcome)
         
-        return False
-    
-    def get_access_token(self):
-        """액세스 토큰 발급 - 재시도 로직 포함"""
-        # 1분 제한 확인
-        if self.last_token_request:
-            time_since_last = datetime.now() - self.last_token_request
-            if time_since_last.total_seconds() < 60:
-                wait_time = 61 - time_since_last.total_seconds()
-                print(f"토큰 발급 제한으로 {wait_time:.0f}초 대기 중...")
-                time.sleep(wait_time)
+        if response.status_code == 200 and result.get("access_token"):
+            # 유효 기간은 응답 기준 (보통 24시간), 만료 직전 사용을 피하려고 1분 여유
+            expires_in = float(result.get("expires_in") or 24 * 3600) - 60
+            return result["access_token"], expires_in, None
         
+        logger.error(f"❌ 토큰 발급 실패: {result.get('error_description', '')} ({result.get('error_code', '')})")
+        return None, 0, result.get("error_code", "")
+    
+    def get_approval_key(self):
+        """실시간(웹소켓) 접속키 발급"""
         try:
-            url = f"{self.base_url}/oauth2/tokenP"
-            headers = {"Content-Type": "application/json"}
+            headers = {"content-type": "application/json; utf-8"}
             data = {
                 "grant_type": "client_credentials",
                 "appkey": self.app_key,
-                "appsecret": self.app_secret
+                "secretkey": self.app_secret
             }
             
-            print("KIS API 토큰 발급 요청 중...")
-            self.last_token_request = datetime.now()
-            
-            response = requests.post(url, headers=headers, data=json.dumps(data))
+            response = self.transport.post("/oauth2/Approval", headers=headers, data=json.dumps(data), throttle=False)
             result = response.json()
             
-            if response.status_code == 200 and result.get("access_token"):
-                self.access_token = result["access_token"]
-                # 토큰 만료시간 설정 (보통 24시간)
-                self.token_expired = datetime.now() + timedelta(hours=23)
-                
-                # 캐시에 저장
-                self.save_token_cache()
-                
-                print("✅ KIS API 토큰 발급 성공")
-                return True
-            else:
-                error_code = result.get("error_code", "")
-                error_desc = result.get("error_description", "")
-                
-                if error_code == "EGW00133":  # 1분당 1회 제한
-                    print("⏳ 토큰 발급 제한 (1분당 1회) - 60초 후 재시도...")
-                    time.sleep(61)
-                    return self.get_access_token()  # 재귀 호출
-                else:
-                    print(f"❌ 토큰 발급 실패: {error_desc} ({error_code})")
-                    return False
-                
+            if response.status_code == 200 and result.get("approval_key"):
+                logger.info("✅ KIS 실시간 접속키 발급 성공")
+                return result["approval_key"]
+            
+            logger.error(f"❌ 실시간 접속키 발급 실패: {result}")
         except Exception as e:
-            print(f"❌ 토큰 발급 중 오류: {e}")
-            return False
+            logger.error(f"❌ 실시간 접속키 발급 중 오류: {e}")
+        
+        return None
     
     def check_token_valid(self):
-        """토큰 유효성 확인 및 갱신"""
-        if not self.access_token or not self.token_expired:
-            return False
-        
-        if datetime.now() >= self.token_expired:
-            print("토큰이 만료되어 새로 발급합니다...")
-            return self.get_access_token()
+        """유효한 토큰 확보 - 갱신 중이면 최대 KIS_TOKEN_WAIT_SEC초만 기다림 (발급 제한 대기는 갱신 스레드가 담당)
         
-        return True
+        토큰 발급 회로가 열려 있으면 기다려도 받을 수 없으므로 바로 반환합니다.
+        """
+        wait = not self.guards["token"].breaker.is_open()
+        return self.token_manager.token(wait=wait) is not None
     
-    def get_stock_price(self, stock_code):
-        """개별 주식 현재가 조회"""
-        if not self.check_token_valid():
-            return None
-        
-        try:
-            url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/inquire-price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "FHKST01010100"  # 주식현재가 시세
-            }
-            params = {
-                "fid_cond_mrkt_div_code": "J",  # 시장분류코드 (J:주식)
-                "fid_input_iscd": stock_code     # 종목코드
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            result = response.json()
-            
-            if response.status_code == 200 and result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                return {
-                    "ticker": stock_code,
-                    "name": output.get("hts_kor_isnm", ""),  # 종목명
-                    "price": int(output.get("stck_prpr", 0)),  # 현재가
-                    "change": int(output.get("prdy_vrss", 0)),  # 전일대비
-                    "changePercent": float(output.get("prdy_ctrt", 0)),  # 전일대비율
-                    "volume": int(output.get("acml_vol", 0)),  # 누적거래량
-                    "high": int(output.get("stck_hgpr", 0)),   # 최고가
-                    "low": int(output.get("stck_lwpr", 0)),    # 최저가
-                    "open": int(output.get("stck_oprc", 0)),   # 시가
-                    "marketCap": self.format_market_cap(output.get("lstn_stcn", 0), int(output.get("stck_prpr", 0)))
-                }
-            else:
-                print(f"주식 현재가 조회 실패: {result}")
-                return None
-                
-        except Exception as e:
-            print(f"주식 현재가 조회 중 오류: {e}")
-            return None
+    def build_headers(self, tr_id, token=None):
+        """KIS 시세 API 공통 요청 헤더 (token: 거부 시 무효화할 수 있도록 호출 측이 읽어 둔 토큰)"""
+        return {
+            "Content-Type": "application/json; charset=utf-8",
+            "authorization": f"Bearer {token or self.access_token}",
+            "appkey": self.app_key,
+            "appsecret": self.app_secret,
+            "tr_id": tr_id
+        }
     
-    def get_multiple_stock_prices(self, stock_codes):
-        """여러 주식의 현재가를 한번에 조회"""
-        results = []
-        
-        for code in stock_codes:
-            stock_data = self.get_stock_price(code)
-            if stock_data:
-                results.append(stock_data)
-            time.sleep(0.1)  # API 호출 제한 방지
-        
-        return results
+    def pace(self):
+        """토큰 버킷 차례를 기다림 (보호 장치 자리를 잡기 전에 호출)"""
+        wait = self.rate_limiter.acquire()
+        if wait > 0:
+            metrics.rate_limit_wait_seconds.observe(wait)
     
-    def get_overseas_stock_price(self, symbol, market_code="NAS"):
-        """해외 주식 현재가 조회"""
+    def call(self, endpoint, group=None, **values):
+        """선언된 조회 TR 호출 (services.kis_endpoints) - 정상 응답 본문 또는 None
+        
+        group(기본: endpoint.group) 보호 장치가 막으면 업스트림을 부르지 않고 바로 None을 반환합니다.
+        토큰 버킷 대기 → 동시 호출 자리 확보 → HTTP 호출 순서라 보호 장치의 지연에는 HTTP 호출 시간만 잡힙니다.
+        """
         if not self.check_token_valid():
             return None
         
+        guard = self.guards[group or endpoint.group]
         try:
-            url = f"{self.base_url}/uapi/overseas-price/v1/quotations/price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "HHDFS00000300"  # 해외주식 현재가
-            }
-            params = {
-                "AUTH": "",
-                "EXCD": market_code,  # 거래소코드 (NAS:나스닥, NYS:뉴욕, HKS:홍콩, TYO:도쿄 등)
-                "SYMB": symbol       # 종목심볼
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            result = response.json()
-            
-            if response.status_code == 200 and result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                current_price = float(output.get("last", 0))
-                prev_close = float(output.get("base", 0))
-                change = current_price - prev_close
-                change_percent = (change / prev_close * 100) if prev_close != 0 else 0
-                
-                return {
-                    "ticker": symbol,
-                    "name": output.get("name", symbol),
-                    "price": round(current_price, 2),
-                    "change": round(change, 2),
-                    "changePercent": round(change_percent, 2),
-                    "volume": int(float(output.get("tvol", 0))),  # 거래량
-                    "high": float(output.get("high", 0)),         # 최고가
-                    "low": float(output.get("low", 0)),           # 최저가
-                    "open": float(output.get("open", 0)),         # 시가
-                    "marketCap": "-"
-                }
-            else:
-                print(f"해외주식 현재가 조회 실패 ({symbol}): {result}")
-                return None
-                
-        except Exception as e:
-            print(f"해외주식 현재가 조회 중 오류 ({symbol}): {e}")
-            return None
-    
-    def get_kospi_index(self):
-        """코스피 지수 조회"""
-        if not self.check_token_valid():
+            started = guard.enter(pace=self.pace)
+        except Unavailable as e:
+            logger.debug("%s 조회 생략 (%s): %s", endpoint.label, values, e)
             return None
         
+        outcome = FAILED
+        token = self.access_token
         try:
-            url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/inquire-index-price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "FHPUP02100000"  # 지수현재가 시세
-            }
-            params = {
-                "fid_cond_mrkt_div_code": "U",  # 시장분류코드
-                "fid_input_iscd": "0001"        # 코스피 지수코드
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
+            response = self.transport.get(
+                endpoint.path, headers=self.build_headers(endpoint.tr_id, token), params=endpoint.params(**values),
+                throttle=False
+            )
             result = response.json()
+            outcome = classify(response.status_code, result)
             
             if response.status_code == 200 and result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                return {
-                    "name": "코스피",
-                    "value": float(output.get("bstp_nmix_prpr", 0)),      # 현재지수
-                    "change": float(output.get("bstp_nmix_prdy_vrss", 0)), # 전일대비
-                    "changePercent": float(output.get("prdy_vrss_sign", 0)) # 전일대비율
-                }
+                return result
+            if outcome == TOKEN_REJECTED:
+                self.token_manager.invalidate(token)
+            logger.error(f"{endpoint.label} 조회 실패 ({values}): {result.get('msg1', result)}")
             
         except Exception as e:
-            print(f"코스피 지수 조회 중 오류: {e}")
+            logger.error(f"{endpoint.label} 조회 중 오류 ({values}): {e}")
+        finally:
+            guard.exit(started, outcome)
         
         return None
     
-    def get_kosdaq_index(self):
-        """코스닥 지수 조회"""
-        if not self.check_token_valid():
-            return None
+    def last_known(self, market, symbol):
+        """마지막으로 받은 시세를 stale 표시로 (조회 실패/회로 차단 중 대체값, 없으면 None)"""
+        row = self.realtime_quotes.get(market, symbol)
+        return dict(row, stale=True) if row is not None else None
+    
+    @classmethod
+    def parse_stock_price(cls, stock_code, output):
+        """국내 주식 현재가 응답(output) → 시세 dict"""
+        quote = {"ticker": stock_code, **DOMESTIC_PRICE.decode(output)}
+        quote["marketCap"] = cls.format_market_cap(quote.pop("listedShares"), quote["price"])
+        return quote
+    
+    @classmethod
+    def parse_multi_price(cls, row, listed_shares=None):
+        """멀티종목 시세 응답 행 → 시세 dict (get_stock_price와 같은 형태)"""
+        quote = DOMESTIC_MULTI_PRICE.decode(row)
+        quote["marketCap"] = cls.format_market_cap(listed_shares, quote["price"])
+        return quote
+    
+    @staticmethod
+    def parse_overseas_stock_price(symbol, output):
+        """해외 주식 현재가 응답(output) → 시세 dict"""
+        fields = OVERSEAS_PRICE.decode(output)
+        current_price, prev_close = fields["last"], fields["base"]
+        change = current_price - prev_close
+        change_percent = (change / prev_close * 100) if prev_close != 0 else 0
         
-        try:
-            url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/inquire-index-price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "FHPUP02100000"
-            }
-            params = {
-                "fid_cond_mrkt_div_code": "U",
-                "fid_input_iscd": "1001"        # 코스닥 지수코드
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            result = response.json()
-            
-            if response.status_code == 200 and result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                return {
-                    "name": "코스닥",
-                    "value": float(output.get("bstp_nmix_prpr", 0)),
-                    "change": float(output.get("bstp_nmix_prdy_vrss", 0)),
-                    "changePercent": float(output.get("prdy_vrss_sign", 0))
-                }
-            
-        except Exception as e:
-            print(f"코스닥 지수 조회 중 오류: {e}")
+        return {
+            "ticker": symbol,
+            "name": fields["name"] or symbol,
+            "price": round(current_price, 2),
+            "change": round(change, 2),
+            "changePercent": round(change_percent, 2),
+            "volume": fields["volume"],
+            "high": fields["high"],
+            "low": fields["low"],
+            "open": fields["open"],
+            "marketCap": "-"
+        }
+    
+    @staticmethod
+    def parse_domestic_index(name, output):
+        """국내 지수 응답(output) → 지수 dict"""
+        return {"name": name, **DOMESTIC_INDEX.decode(output)}
+    
+    @staticmethod
+    def parse_overseas_index(name, output):
+        """해외 지수 응답(output) → 지수 dict"""
+        fields = OVERSEAS_PRICE.decode(output)
+        change = fields["last"] - fields["base"]
+        change_percent = (change / fields["base"] * 100) if fields["base"] != 0 else 0
         
-        return None
+        return {
+            "name": name,
+            "value": round(fields["last"], 2),
+            "change": round(change, 2),
+            "changePercent": round(change_percent, 2)
+        }
     
-    def get_dow_jones_index(self):
-        """다우존스 지수 조회"""
-        if not self.check_token_valid():
+    @staticmethod
+    def parse_overseas_daily_index(name, output):
+        """해외지수 기간별시세 응답(output1) → 지수 dict"""
+        fields = OVERSEAS_DAILY_INDEX.decode(output)
+        change, change_percent = fields["change"], fields["changePercent"]
+        if fields["sign"] in ("4", "5"):  # 부호 없이 오는 경우 보정
+            change, change_percent = -abs(change), -abs(change_percent)
+        
+        return {
+            "name": name,
+            "value": round(fields["value"], 2),
+            "change": round(change, 2),
+            "changePercent": round(change_percent, 2)
+        }
+    
+    @classmethod
+    def parse_index(cls, entry, result):
+        """지수 응답 → 지수 dict (값이 0 이하면 None)"""
+        kind = entry["kind"]
+        if kind == "domestic":
+            data = cls.parse_domestic_index(entry["name"], DOMESTIC_INDEX.body(result))
+        elif kind == "overseas_price":
+            data = cls.parse_overseas_index(entry["name"], OVERSEAS_PRICE.body(result))
+        else:
+            data = cls.parse_overseas_daily_index(entry["name"], OVERSEAS_DAILY_INDEX.body(result))
+        return data if data["value"] > 0 else None
+    
+    def get_stock_price(self, stock_code):
+        """개별 주식 현재가 조회 (실시간 구독 중이면 실시간 값, 아니면 캐시 경유 REST)"""
+        live = self.realtime_quotes.get_live("domestic", stock_code)
+        if live is not None:
+            return live
+        quote = self.quote_cache.get_or_load(
+            "domestic", stock_code, lambda: self._fetch_stock_price(stock_code)
+        )
+        return quote if quote is not None else self.last_known("domestic", stock_code)
+    
+    def _fetch_stock_price(self, stock_code):
+        """개별 주식 현재가 업스트림 조회"""
+        result = self.call(DOMESTIC_PRICE, symbol=stock_code)
+        if result is None:
             return None
         
-        try:
-            url = f"{self.base_url}/uapi/overseas-price/v1/quotations/price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "FHPUP02100000"
-            }
-            params = {
-                "AUTH": "",
-                "EXCD": "NYS",
-                "SYMB": "DJI"  # 다우존스 심볼
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            result = response.json()
-            
-            if response.status_code == 200 and result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                current_value = float(output.get("last", 0))
-                prev_close = float(output.get("base", 0))
-                change = current_value - prev_close
-                change_percent = (change / prev_close * 100) if prev_close != 0 else 0
-                
-                return {
-                    "name": "다우존스",
-                    "value": round(current_value, 2),
-                    "change": round(change, 2),
-                    "changePercent": round(change_percent, 2)
-                }
-                
-        except Exception as e:
-            print(f"다우존스 지수 조회 중 오류: {e}")
+        output = DOMESTIC_PRICE.body(result)
+        self.listed_shares[stock_code] = to_int(output.get("lstn_stcn"))
+        quote = self.parse_stock_price(stock_code, output)
+        self.realtime_quotes.seed("domestic", stock_code, quote)
+        return quote
+    
+    def multi_quote_chunks(self, stock_codes):
+        """멀티종목 조회 대상을 TR 한 번 분량씩 나눔 - 상장주식수를 모르는 종목은 제외 (개별 조회로 보완)"""
+        codes = [code for code in stock_codes if code in self.listed_shares]
+        size = self.multi_quote_size
+        return [codes[i:i + size] for i in range(0, len(codes), size)]
+    
+    def parse_multi_prices(self, codes, result):
+        """멀티종목 응답 → {종목코드: 시세} (요청한 종목, 현재가가 있는 행만)"""
+        quotes = {}
+        for row in DOMESTIC_MULTI_PRICE.rows(result):
+            quote = self.parse_multi_price(row, self.listed_shares.get(row.get("inter_shrn_iscd")))
+            if quote["ticker"] in codes and quote["price"] > 0:
+                self.realtime_quotes.seed("domestic", quote["ticker"], quote)
+                quotes[quote["ticker"]] = quote
+        return quotes
+    
+    def _fetch_multi_prices(self, stock_codes):
+        """멀티종목 TR로 국내 현재가 업스트림 조회 - {종목코드: 시세}, 빠진 종목은 호출 측이 개별 조회"""
+        chunks = self.multi_quote_chunks(stock_codes)
+        if len(chunks) > 1:
+            results = [r["data"] for r in self.fetch_batch(self._fetch_multi_chunk, chunks)]
+        else:
+            results = [self._fetch_multi_chunk(chunk) for chunk in chunks]
         
-        return None
+        quotes = {}
+        for result in results:
+            quotes.update(result or {})
+        return quotes
+    
+    def _fetch_multi_chunk(self, codes):
+        result = self.call(DOMESTIC_MULTI_PRICE, codes=codes)
+        return self.parse_multi_prices(codes, result) if result is not None else {}
     
-    def get_nasdaq_index(self):
+    def fetch_batch(self, fetch, items):
+        """항목별 조회를 스레드 풀에서 동시 실행 - 입력 순서대로 항목별 결과/오류 반환
+        
+        호출 속도는 각 업스트림 호출의 토큰 버킷(rate_limiter)이 조절합니다.
         """
-        나스닥 지수 조회 (TR: HHDFS00000300)
-        - KIS 내부 코드(PCOMP)를 사용하여 공식 심볼(IXIC)의 0 반환 문제를 우회합니다.
-        - API가 0을 반환할 경우 경고를 출력합니다.
+        futures = [self.fetch_executor.submit(fetch, item) for item in items]
+        results = []
+        
+        for item, future in zip(items, futures):
+            try:
+                data = future.result()
+                error = None if data else "조회 실패"
+            except Exception as e:
+                data, error = None, str(e)
+            results.append({"item": item, "data": data, "error": error})
+        
+        return results
+    
+    def get_stock_prices_batch(self, stock_codes):
+        """여러 국내 주식 현재가 조회 - 종목별 결과/오류 포함
+        
+        캐시에 없는 종목은 멀티종목 TR로 최대 multi_quote_size개씩 묶어 조회하고,
+        거기서 빠진 종목(처음 보는 종목, 조회 실패)만 종목별로 동시 조회합니다.
         """
-        if not self.check_token_valid():
+        quotes = {}
+        pending = []
+        for code in stock_codes:
+            live = self.realtime_quotes.get_live("domestic", code)
+            if live is not None:
+                quotes[code] = live
+            else:
+                pending.append(code)
+        
+        if pending and self.multi_quote_size > 1:
+            try:
+                quotes.update(self.quote_cache.get_or_load_many("domestic", pending, self._fetch_multi_prices))
+            except Exception as e:
+                logger.error(f"멀티종목 시세 조회 실패: {e}")
+        
+        missing = [code for code in dict.fromkeys(stock_codes) if code not in quotes]
+        fallback = {r["item"]: r for r in self.fetch_batch(self.get_stock_price, missing)}
+        return [
+            {"ticker": code, "data": quotes[code], "error": None} if code in quotes
+            else {"ticker": code, "data": fallback[code]["data"], "error": fallback[code]["error"]}
+            for code in stock_codes
+        ]
+    
+    def get_overseas_stock_prices_batch(self, symbols, market_code="NAS"):
+        """여러 해외 주식 현재가 동시 조회 - 종목별 결과/오류 포함"""
+        return [
+            {"ticker": r["item"], "data": r["data"], "error": r["error"]}
+            for r in self.fetch_batch(
+                lambda symbol: self.get_overseas_stock_price(symbol, market_code), symbols
+            )
+        ]
+    
+    def get_multiple_stock_prices(self, stock_codes):
+        """여러 주식의 현재가를 한번에 조회 (성공한 종목만, 입력 순서 유지)"""
+        return [r["data"] for r in self.get_stock_prices_batch(stock_codes) if r["data"]]
+    
+    def get_overseas_stock_price(self, symbol, market_code="NAS"):
+        """해외 주식 현재가 조회 (실시간 구독 중이면 실시간 값, 아니면 캐시 경유 REST)"""
+        live = self.realtime_quotes.get_live(market_code, symbol)
+        if live is not None:
+            return live
+        quote = self.quote_cache.get_or_load(
+            market_code, symbol, lambda: self._fetch_overseas_stock_price(symbol, market_code)
+        )
+        return quote if quote is not None else self.last_known(market_code, symbol)
+    
+    def _fetch_overseas_stock_price(self, symbol, market_code="NAS"):
+        """해외 주식 현재가 업스트림 조회"""
+        result = self.call(OVERSEAS_PRICE, exchange=market_code, symbol=symbol)
+        if result is None:
             return None
         
-        NASDAQ_SYMBOL = "PCOMP" # KIS 해외 마스터 파일 기반 나스닥 종합지수 코드
+        quote = self.parse_overseas_stock_price(symbol, OVERSEAS_PRICE.body(result))
+        self.realtime_quotes.seed(market_code, symbol, quote)
+        return quote
+    
+    def get_index(self, entry):
+        """지수 조회 - entry는 지수 레지스트리 항목 (services.market_indices)"""
+        endpoint, values = index_request(entry)
+        result = self.call(endpoint, group="index", **values)
+        if result is None:
+            return None
         
-        try:
-            print(f"[DEBUG] 나스닥 지수 조회 재시도 (TR: HHDFS00000300, Symbol: {NASDAQ_SYMBOL})...")
-            
-            url = f"{self.base_url}/uapi/overseas-price/v1/quotations/price"
-            headers = {
-                "Content-Type": "application/json; charset=utf-8",
-                "authorization": f"Bearer {self.access_token}",
-                "appkey": self.app_key,
-                "appsecret": self.app_secret,
-                "tr_id": "HHDFS00000300"
-            }
-            params = {
-                "AUTH": "",
-                "EXCD": "NAS",  
-                "SYMB": NASDAQ_SYMBOL
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code != 200:
-                print(f"[ERROR] 나스닥 지수 API HTTP 오류: Status Code {response.status_code}")
-                return None
-            
-            try:
-                result = response.json()
-            except json.JSONDecodeError as e:
-                print(f"[CRITICAL ERROR] JSON 디코딩 실패: {e}")
-                return None
-            
-            print(f"[DEBUG] 나스닥 지수 API 응답: rt_cd={result.get('rt_cd', 'N/A')}")
-
-            if result.get("rt_cd") == "0":
-                output = result.get("output", {})
-                
-                current_value = float(output.get("last", 0) or 0)
-                prev_close = float(output.get("base", 0) or 0)
-                
-                change = current_value - prev_close
-                change_percent = (change / prev_close * 100) if prev_close != 0 else 0
-                
-                if current_value > 0:
-                    result_data = {
-                        "name": "나스닥 종합지수 (PCOMP)",
-                        "value": round(current_value, 2),
-                        "change": round(change, 2),
-                        "changePercent": round(change_percent, 2)
-                    }
-                    print(f"[SUCCESS] 나스닥 지수 성공")
-                    return result_data
-                else:
-                    print(f"[WARNING] 나스닥 지수 데이터가 유효하지 않음 (value=0). PCOMP도 실패.")
-                    # 시장 폐장 시 0이 반환될 수 있으므로, 전일 종가를 반환하는 로직을 추가할 수도 있음
-                    if prev_close > 0:
-                         print(f"[INFO] 전일 종가({prev_close})는 유효. 시장 폐장으로 추정.")
-                    return None
-            else:
-                error_msg = result.get("msg1", "알 수 없는 오류")
-                print(f"[ERROR] 나스닥 지수 API 실패 (rt_cd={result.get('rt_cd')}): {error_msg}")
-                return None
-                
-        except Exception as e:
-            print(f"[FATAL ERROR] 나스닥 지수 조회 중 오류: {e}")
+        data = self.parse_index(entry, result)
+        if data is None:
+            # 장 마감 후 해외 지수는 0이 올 수 있음 - 호출 측이 마지막 정상 값을 유지
+            logger.warning(f"{entry['name']} 지수 값이 유효하지 않음 (value=0)")
+        return data
+    
+    def get_exchange_rate(self, code="FX@KRW"):
+        """환율 조회 (기본: 원/달러) - 실패하거나 값이 없으면 None"""
+        today = datetime.now()
+        result = self.call(
+            EXCHANGE_RATE, code=code,
+            start=(today - timedelta(days=7)).strftime("%Y%m%d"), end=today.strftime("%Y%m%d")
+        )
+        if result is None:
             return None
+        rate = EXCHANGE_RATE.decode(EXCHANGE_RATE.body(result))["rate"]
+        return rate if rate > 0 else None
     
     @staticmethod
     def format_market_cap(listed_shares, current_price):
@@ -440,95 +469,114 @@ class KISAPIService:
             return "-"
 
 
+# 국내 주요 종목 코드들
+DOMESTIC_MAJOR_STOCKS = [
+    "005930",  # 삼성전자
+    "000660",  # SK하이닉스  
+    "035420",  # NAVER
+    "005380",  # 현대차
+    "006400",  # 삼성SDI
+    "051910",  # LG화학
+    "068270",  # 셀트리온
+    "035720",  # 카카오
+    "207940",  # 삼성바이오로직스
+    "373220"   # LG에너지솔루션
+]
+
+# 미국 주요 종목들 (exchange: KIS 거래소 코드 NAS/NYS/AMS)
+US_MAJOR_STOCKS = [
+    {"symbol": "AAPL", "name": "Apple Inc.", "exchange": "NAS"},
+    {"symbol": "MSFT", "name": "Microsoft Corp.", "exchange": "NAS"},
+    {"symbol": "GOOGL", "name": "Alphabet Inc.", "exchange": "NAS"},
+    {"symbol": "AMZN", "name": "Amazon.com Inc.", "exchange": "NAS"},
+    {"symbol": "TSLA", "name": "Tesla Inc.", "exchange": "NAS"},
+    {"symbol": "NVDA", "name": "NVIDIA Corp.", "exchange": "NAS"},
+    {"symbol": "META", "name": "Meta Platforms", "exchange": "NAS"},
+    {"symbol": "NFLX", "name": "Netflix Inc.", "exchange": "NAS"},
+    {"symbol": "AMD", "name": "Advanced Micro Devices", "exchange": "NAS"},
+    {"symbol": "CRM", "name": "Salesforce Inc.", "exchange": "NYS"}
+]
+
 # Flask 앱에서 사용할 인스턴스 생성
 kis_api = None
 
+_init_lock = threading.Lock()
+# KIS 클라이언트 초기화 상태 - pending → initializing → ready | failed (/readyz에서 사용)
+kis_init_state = {"status": "pending", "error": None}
+
 def init_kis_api():
-    """KIS API 초기화"""
+    """KIS API 초기화 (이미 초기화되어 있으면 그대로 사용)"""
     global kis_api
-    try:
-        kis_api = KISAPIService()
-        return True
-    except Exception as e:
-        print(f"KIS API 초기화 실패: {e}")
-        return False
+    with _init_lock:
+        if kis_api is not None:
+            return True
+        try:
+            kis_api = KISAPIService()
+            kis_init_state.update(status="ready", error=None)
+            return True
+        except Exception as e:
+            logger.error(f"KIS API 초기화 실패: {e}")
+            kis_init_state.update(status="failed", error=str(e))
+            return False
 
-def get_domestic_stocks():
-    """국내 주요 종목 현재가 조회"""
+def init_kis_api_background():
+    """KIS API를 백그라운드 스레드에서 초기화 - 앱 시작을 막지 않음 (토큰 발급 대기도 갱신 스레드가 담당)"""
+    if kis_api is not None:
+        return None
+    kis_init_state["status"] = "initializing"
+    thread = threading.Thread(target=init_kis_api, name="kis-init", daemon=True)
+    thread.start()
+    return thread
+
+def get_domestic_stocks(stock_codes=None):
+    """국내 종목 현재가 조회 (기본: 주요 종목)"""
     global kis_api
     
     if not kis_api:
         if not init_kis_api():
             return {"success": False, "message": "API 초기화 실패"}
     
-    # 주요 종목 코드들
-    major_stocks = [
-        "005930",  # 삼성전자
-        "000660",  # SK하이닉스  
-        "035420",  # NAVER
-        "005380",  # 현대차
-        "006400",  # 삼성SDI
-        "051910",  # LG화학
-        "068270",  # 셀트리온
-        "035720",  # 카카오
-        "207940",  # 삼성바이오로직스
-        "373220"   # LG에너지솔루션
-    ]
-    
     try:
-        stocks_data = kis_api.get_multiple_stock_prices(major_stocks)
+        stocks_data = kis_api.get_multiple_stock_prices(stock_codes or DOMESTIC_MAJOR_STOCKS)
         return {"success": True, "stocks": stocks_data}
     except Exception as e:
-        print(f"국내 주식 데이터 조회 실패: {e}")
+        logger.error(f"국내 주식 데이터 조회 실패: {e}")
         return {"success": False, "message": str(e)}
 
-def get_overseas_stocks(market_type):
-    """해외 주식 데이터 조회 - 미국만 지원"""
+def get_overseas_stocks(market_type, stocks=None):
+    """해외 주식 데이터 조회 - 미국만 지원 (stocks: symbol/name/exchange 목록, 기본: 주요 종목)"""
     global kis_api
     
     if not kis_api:
         if not init_kis_api():
             return {"success": False, "message": "API 초기화 실패"}
     
-    # 미국 주요 종목들만
+    # 미국 종목만 - 종목별 거래소 코드로 조회
     if market_type == "us":
-        us_stocks = [
-            {"symbol": "AAPL", "name": "Apple Inc."},
-            {"symbol": "MSFT", "name": "Microsoft Corp."},
-            {"symbol": "GOOGL", "name": "Alphabet Inc."},
-            {"symbol": "AMZN", "name": "Amazon.com Inc."},
-            {"symbol": "TSLA", "name": "Tesla Inc."},
-            {"symbol": "NVDA", "name": "NVIDIA Corp."},
-            {"symbol": "META", "name": "Meta Platforms"},
-            {"symbol": "NFLX", "name": "Netflix Inc."},
-            {"symbol": "AMD", "name": "Advanced Micro Devices"},
-            {"symbol": "CRM", "name": "Salesforce Inc."}
-        ]
-        
         try:
+            stocks = stocks or US_MAJOR_STOCKS
+            results = kis_api.fetch_batch(
+                lambda stock_info: kis_api.get_overseas_stock_price(stock_info["symbol"], stock_info.get("exchange", "NAS")),
+                stocks
+            )
+            
             stocks_data = []
-            for stock_info in us_stocks:
-                stock_data = kis_api.get_overseas_stock_price(
-                    stock_info["symbol"], 
-                    "NAS"  # 나스닥 거래소 코드
-                )
-                if stock_data:
-                    # 한국어 이름으로 덮어쓰기
-                    stock_data["name"] = stock_info["name"]
-                    stocks_data.append(stock_data)
-                time.sleep(0.1)  # API 호출 제한 방지
+            for stock_info, result in zip(stocks, results):
+                if result["data"]:
+                    # 한국어 이름으로 덮어쓰기 (캐시 공유 객체이므로 복사본 사용)
+                    stocks_data.append(dict(result["data"], name=stock_info["name"]))
             
             return {"success": True, "stocks": stocks_data}
             
         except Exception as e:
-            print(f"미국 주식 데이터 조회 실패: {e}")
+            logger.error(f"미국 주식 데이터 조회 실패: {e}")
             return {"success": False, "message": str(e)}
     
     else:
         return {"success": False, "message": "미국 시장만 지원됩니다"}
 
 def get_all_market_indices():
-    """모든 시장 지수 조회 - 국내 + 미국만"""
+    """모든 시장 지수 동시 조회 - 실패하거나 0이 온 지수는 마지막 정상 값을 stale로 유지"""
     global kis_api
     
     if not kis_api:
@@ -536,28 +584,53 @@ def get_all_market_indices():
             return {"success": False, "message": "API 초기화 실패"}
     
     try:
-        indices = {}
-        
-        # 국내 지수 (코스피, 코스닥)
-        kospi_data = kis_api.get_kospi_index()
-        kosdaq_data = kis_api.get_kosdaq_index()
-        
-        if kospi_data:
-            indices["kospi"] = kospi_data
-        if kosdaq_data:
-            indices["kosdaq"] = kosdaq_data
-        
-        # 미국 지수 (다우존스, 나스닥)
-        dow_data = kis_api.get_dow_jones_index()
-        nasdaq_data = kis_api.get_nasdaq_index()
-        
-        if dow_data:
-            indices["dow"] = dow_data
-        if nasdaq_data:
-            indices["nasdaq"] = nasdaq_data
-            
-        return {"success": True, "indices": indices}
+        results = kis_api.fetch_batch(kis_api.get_index, kis_api.market_indices)
+        kis_api.index_board.merge({r["item"]["key"]: r["data"] for r in results})
+        return kis_api.index_board.result()
         
     except Exception as e:
-        print(f"시장 지수 조회 실패: {e}")
-        return {"success": False, "message": str(e)}
\ No newline at end of file
+        logger.error(f"시장 지수 조회 실패: {e}")
+        return {"success": False, "message": str(e)}
+
+def get_quote_cache_stats():
+    """시세 캐시 적중/미스/합류 카운터 조회"""
+    global kis_api
+    
+    if not kis_api:
+        return {"success": False, "message": "API 초기화 전입니다"}
+    
+    return {"success": True, "cache": kis_api.quote_cache.stats()}
+
+def get_guard_stats():
+    """호출 종류별 보호 장치 상태 (초기화 전이면 빈 dict)"""
+    if not kis_api:
+        return {}
+    return {name: guard.stats() for name, guard in kis_api.guards.items()}
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _collect_kis_metrics():
+    """/metrics 출력 시점에 시세 캐시, 호출 속도 제한, 토큰 상태를 읽어 지표로 변환"""
+    if not kis_api:
+        return []
+    cache = kis_api.quote_cache.stats()
+    limiter = kis_api.rate_limiter.stats()
+    token = kis_api.token_manager.stats()
+    guards = get_guard_stats()
+    return [
+        ("kis_quote_cache_lookups_total", "counter", "시세 캐시 조회 결과별 건수",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"]),
+          ({"result": "coalesced"}, cache["coalesced"]), ({"result": "shared_hit"}, cache["sharedHits"])]),
+        ("kis_quote_cache_hit_ratio", "gauge", "시세 캐시 적중률 (합류 포함)", [({}, cache["hitRatio"])]),
+        ("kis_quote_cache_entries", "gauge", "시세 캐시 항목 수", [({}, cache["entries"])]),
+        ("kis_rate_limit_waits_total", "counter", "토큰 버킷 대기 발생 횟수", [({}, limiter["waits"])]),
+        ("kis_token_expires_in_seconds", "gauge", "현재 토큰 만료까지 남은 시간", [({}, token["expiresIn"])]),
+        ("kis_upstream_concurrency_limit", "gauge", "호출 종류별 현재 동시 호출 한도 (AIMD)",
+         [({"group": name}, guard["limit"]) for name, guard in guards.items()]),
+        ("kis_upstream_inflight", "gauge", "호출 종류별 진행 중인 호출 수",
+         [({"group": name}, guard["inflight"]) for name, guard in guards.items()]),
+        ("kis_upstream_circuit_state", "gauge", "호출 종류별 회로 상태 (0: closed, 1: half_open, 2: open)",
+         [({"group": name}, CIRCUIT_STATE_VALUES[guard["state"]]) for name, guard in guards.items()]),
+    ]
+
+metrics.registry.add_collector(_collect_kis_metrics)
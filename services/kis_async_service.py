@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp가 없으면 동기 경로만 사용
+    aiohttp = None
+
+from services import kis_api_service, metrics
+from services.kis_api_service import DOMESTIC_MAJOR_STOCKS, US_MAJOR_STOCKS
+from services.kis_resilience import FAILED, TOKEN_REJECTED, Unavailable, classify
+from services.kis_endpoints import DOMESTIC_MULTI_PRICE, DOMESTIC_PRICE, OVERSEAS_PRICE, loads, to_int
+from services.market_indices import index_request
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncKISAPIService:
+    """KISAPIService의 asyncio 버전 - 토큰, 시세 캐시, 토큰 버킷은 동기 서비스와 공유
+
+    aiohttp 세션(커넥션 풀)은 공용 이벤트 루프 하나에서만 생성/사용합니다.
+    """
+
+    def __init__(self, sync_service, pool_size=None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp가 설치되어 있지 않습니다")
+
+        self.sync = sync_service
+        self.pool_size = pool_size or int(os.getenv("KIS_ASYNC_POOL_SIZE", str(sync_service.transport.pool_size)))
+        self._session = None
+
+    def _get_session(self):
+        """이벤트 루프 공용 aiohttp 세션 (지연 생성)"""
+        if self._session is None or self._session.closed:
+            connect_timeout, read_timeout = self.sync.transport.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _ensure_token(self):
+        """토큰 확인 - 재발급이 필요하면 이벤트 루프를 막지 않도록 스레드 풀에서 처리"""
+        sync = self.sync
+        if sync.token_manager.is_valid():
+            return True
+        return await asyncio.get_running_loop().run_in_executor(None, sync.check_token_valid)
+
+    async def _pace(self):
+        """토큰 버킷 차례를 기다림 (보호 장치 자리를 잡기 전에 호출)"""
+        wait = self.sync.rate_limiter.reserve()
+        if wait > 0:
+            metrics.rate_limit_wait_seconds.observe(wait)
+            await asyncio.sleep(wait)
+
+    async def _get(self, path, tr_id, params, token=None):
+        """GET 호출 한 번 - (HTTP 상태, JSON) 반환 (속도 조절은 호출 측이 _pace로)"""
+        session = self._get_session()
+        headers = self.sync.build_headers(tr_id, token)
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{self.sync.base_url}{path}", headers=headers, params=params) as response:
+                status, result = response.status, loads(await response.read())
+        except Exception:
+            metrics.observe_upstream(path, "exception", time.perf_counter() - started, "exception", "exception")
+            raise
+        body = result if isinstance(result, dict) else {}
+        metrics.observe_upstream(path, status, time.perf_counter() - started, body.get("rt_cd"), body.get("msg_cd"))
+        return status, result
+
+    async def call(self, endpoint, group=None, **values):
+        """선언된 조회 TR 호출 (services.kis_endpoints) - 정상 응답 본문 또는 None (보호 장치는 동기 서비스와 공유)"""
+        if not await self._ensure_token():
+            return None
+
+        guard = self.sync.guards[group or endpoint.group]
+        try:
+            started = await guard.enter_async(pace=self._pace)
+        except Unavailable as e:
+            logger.debug("%s 조회 생략 (%s): %s", endpoint.label, values, e)
+            return None
+
+        outcome = FAILED
+        token = self.sync.access_token
+        try:
+            status, result = await self._get(endpoint.path, endpoint.tr_id, endpoint.params(**values), token)
+            outcome = classify(status, result)
+            if status == 200 and result.get("rt_cd") == "0":
+                return result
+            if outcome == TOKEN_REJECTED:
+                self.sync.token_manager.invalidate(token)
+            logger.error(f"{endpoint.label} 조회 실패 ({values}): {result.get('msg1', result)}")
+        except Exception as e:
+            logger.error(f"{endpoint.label} 조회 중 오류 ({values}): {e}")
+        finally:
+            guard.exit(started, outcome)
+
+        return None
+
+    async def get_stock_price(self, stock_code):
+        """개별 주식 현재가 조회 (실시간 구독 중이면 실시간 값, 아니면 캐시 경유 REST)"""
+        live = self.sync.realtime_quotes.get_live("domestic", stock_code)
+        if live is not None:
+            return live
+        quote = await self.sync.quote_cache.get_or_load_async(
+            "domestic", stock_code, lambda: self._fetch_stock_price(stock_code)
+        )
+        return quote if quote is not None else self.sync.last_known("domestic", stock_code)
+
+    async def _fetch_stock_price(self, stock_code):
+        """개별 주식 현재가 업스트림 조회"""
+        result = await self.call(DOMESTIC_PRICE, symbol=stock_code)
+        if result is None:
+            return None
+
+        output = DOMESTIC_PRICE.body(result)
+        self.sync.listed_shares[stock_code] = to_int(output.get("lstn_stcn"))
+        quote = self.sync.parse_stock_price(stock_code, output)
+        self.sync.realtime_quotes.seed("domestic", stock_code, quote)
+        return quote
+
+    async def get_overseas_stock_price(self, symbol, market_code="NAS"):
+        """해외 주식 현재가 조회 (실시간 구독 중이면 실시간 값, 아니면 캐시 경유 REST)"""
+        live = self.sync.realtime_quotes.get_live(market_code, symbol)
+        if live is not None:
+            return live
+        quote = await self.sync.quote_cache.get_or_load_async(
+            market_code, symbol, lambda: self._fetch_overseas_stock_price(symbol, market_code)
+        )
+        return quote if quote is not None else self.sync.last_known(market_code, symbol)
+
+    async def _fetch_overseas_stock_price(self, symbol, market_code="NAS"):
+        """해외 주식 현재가 업스트림 조회"""
+        result = await self.call(OVERSEAS_PRICE, exchange=market_code, symbol=symbol)
+        if result is None:
+            return None
+
+        quote = self.sync.parse_overseas_stock_price(symbol, OVERSEAS_PRICE.body(result))
+        self.sync.realtime_quotes.seed(market_code, symbol, quote)
+        return quote
+
+    async def fetch_batch(self, fetch, items):
+        """항목별 코루틴을 동시 실행 - 입력 순서대로 항목별 결과/오류 반환"""
+        outcomes = await asyncio.gather(*(fetch(item) for item in items), return_exceptions=True)
+        results = []
+
+        for item, outcome in zip(items, outcomes):
+            if isinstance(outcome, BaseException):
+                results.append({"ticker": item, "data": None, "error": str(outcome)})
+            else:
+                results.append({"ticker": item, "data": outcome, "error": None if outcome else "조회 실패"})
+
+        return results
+
+    async def _fetch_multi_prices(self, stock_codes):
+        """멀티종목 TR로 국내 현재가 업스트림 조회 - {종목코드: 시세}, 빠진 종목은 호출 측이 개별 조회"""
+        chunks = self.sync.multi_quote_chunks(stock_codes)
+        results = await asyncio.gather(*(self._fetch_multi_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        quotes = {}
+        for result in results:
+            if isinstance(result, dict):
+                quotes.update(result)
+        return quotes
+
+    async def _fetch_multi_chunk(self, codes):
+        result = await self.call(DOMESTIC_MULTI_PRICE, codes=codes)
+        return self.sync.parse_multi_prices(codes, result) if result is not None else {}
+
+    async def get_stock_prices_batch(self, stock_codes):
+        """여러 국내 주식 현재가 조회 - 멀티종목 TR로 묶어 조회하고 빠진 종목만 종목별로 동시 조회"""
+        quotes = {}
+        pending = []
+        for code in stock_codes:
+            live = self.sync.realtime_quotes.get_live("domestic", code)
+            if live is not None:
+                quotes[code] = live
+            else:
+                pending.append(code)
+
+        if pending and self.sync.multi_quote_size > 1:
+            try:
+                quotes.update(await self.sync.quote_cache.get_or_load_many_async("domestic", pending, self._fetch_multi_prices))
+            except Exception as e:
+                logger.error(f"멀티종목 시세 조회 실패: {e}")
+
+        missing = [code for code in dict.fromkeys(stock_codes) if code not in quotes]
+        fallback = {r["ticker"]: r for r in await self.fetch_batch(self.get_stock_price, missing)}
+        return [
+            {"ticker": code, "data": quotes[code], "error": None} if code in quotes else fallback[code]
+            for code in stock_codes
+        ]
+
+    async def get_overseas_stock_prices_batch(self, symbols, market_code="NAS"):
+        """여러 해외 주식 현재가 동시 조회 - 종목별 결과/오류 포함"""
+        return await self.fetch_batch(lambda symbol: self.get_overseas_stock_price(symbol, market_code), symbols)
+
+    async def get_multiple_stock_prices(self, stock_codes):
+        """여러 주식의 현재가를 한번에 조회 (성공한 종목만, 입력 순서 유지)"""
+        return [r["data"] for r in await self.get_stock_prices_batch(stock_codes) if r["data"]]
+
+    async def get_index(self, entry):
+        """지수 조회 - entry는 지수 레지스트리 항목 (값이 0 이하면 None)"""
+        endpoint, values = index_request(entry)
+        result = await self.call(endpoint, group="index", **values)
+        return self.sync.parse_index(entry, result) if result is not None else None
+
+
+# 공용 이벤트 루프 (백그라운드 스레드) 와 비동기 서비스 인스턴스
+async_kis_api = None
+_loop = None
+_loop_lock = threading.Lock()
+
+def is_async_enabled():
+    """비동기 경로 사용 여부 - aiohttp 설치 + KIS_ASYNC != 0"""
+    return aiohttp is not None and os.getenv("KIS_ASYNC", "1") != "0"
+
+def _get_loop():
+    """모든 비동기 KIS 호출이 공유하는 이벤트 루프"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="kis-async-loop", daemon=True).start()
+    return _loop
+
+def run_async(coro, timeout=None):
+    """동기 코드(Flask 핸들러)에서 공용 루프로 코루틴 실행 후 결과 대기"""
+    if timeout is None:
+        timeout = float(os.getenv("KIS_ASYNC_TIMEOUT", "30"))
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+def call_market_api(sync_func, async_func, *args):
+    """비동기 모드면 공용 루프에서 async_func, 아니면 sync_func 실행"""
+    if is_async_enabled():
+        return run_async(async_func(*args))
+    return sync_func(*args)
+
+def _init_async_kis_api():
+    """비동기 서비스 초기화 - 동기 서비스(토큰 발급 포함)를 먼저 준비"""
+    global async_kis_api
+
+    if not kis_api_service.kis_api:
+        if not kis_api_service.init_kis_api():
+            return None
+
+    if async_kis_api is None or async_kis_api.sync is not kis_api_service.kis_api:
+        async_kis_api = AsyncKISAPIService(kis_api_service.kis_api)
+    return async_kis_api
+
+async def _get_async_kis_api():
+    if async_kis_api is not None and async_kis_api.sync is kis_api_service.kis_api:
+        return async_kis_api
+    # 초기화는 토큰 발급으로 블로킹될 수 있으므로 루프 밖에서 실행
+    return await asyncio.get_running_loop().run_in_executor(None, _init_async_kis_api)
+
+async def get_domestic_stocks_async(stock_codes=None):
+    """국내 종목 현재가 동시 조회 (기본: 주요 종목)"""
+    api = await _get_async_kis_api()
+    if not api:
+        return {"success": False, "message": "API 초기화 실패"}
+
+    try:
+        stocks_data = await api.get_multiple_stock_prices(stock_codes or DOMESTIC_MAJOR_STOCKS)
+        return {"success": True, "stocks": stocks_data}
+    except Exception as e:
+        logger.error(f"국내 주식 데이터 조회 실패: {e}")
+        return {"success": False, "message": str(e)}
+
+async def get_overseas_stocks_async(market_type, stocks=None):
+    """해외 주식 데이터 동시 조회 - 미국만 지원 (종목별 거래소 코드 사용)"""
+    if market_type != "us":
+        return {"success": False, "message": "미국 시장만 지원됩니다"}
+
+    api = await _get_async_kis_api()
+    if not api:
+        return {"success": False, "message": "API 초기화 실패"}
+
+    try:
+        stocks = stocks or US_MAJOR_STOCKS
+        results = await asyncio.gather(*(
+            api.get_overseas_stock_price(stock_info["symbol"], stock_info.get("exchange", "NAS"))
+            for stock_info in stocks
+        ), return_exceptions=True)
+        stocks_data = [
+            dict(result, name=stock_info["name"])
+            for stock_info, result in zip(stocks, results)
+            if result and not isinstance(result, BaseException)
+        ]
+        return {"success": True, "stocks": stocks_data}
+    except Exception as e:
+        logger.error(f"미국 주식 데이터 조회 실패: {e}")
+        return {"success": False, "message": str(e)}
+
+async def get_all_market_indices_async():
+    """모든 시장 지수 동시 조회 - 실패하거나 0이 온 지수는 마지막 정상 값을 stale로 유지"""
+    api = await _get_async_kis_api()
+    if not api:
+        return {"success": False, "message": "API 초기화 실패"}
+
+    try:
+        entries = api.sync.market_indices
+        values = await asyncio.gather(*(api.get_index(entry) for entry in entries), return_exceptions=True)
+        api.sync.index_board.merge({
+            entry["key"]: None if isinstance(value, BaseException) else value
+            for entry, value in zip(entries, values)
+        })
+        return api.sync.index_board.result()
+    except Exception as e:
+        logger.error(f"시장 지수 조회 실패: {e}")
+        return {"success": False, "message": str(e)}
+
+def get_market_indices():
+    """지수 조회 (stale-while-revalidate) - 마지막 값을 바로 반환하고, KIS_INDEX_TTL이 지났으면
+    백그라운드에서 한 번만 다시 조회 (값이 하나도 없을 때만 조회를 기다림)"""
+    if not kis_api_service.kis_api and not kis_api_service.init_kis_api():
+        return {"success": False, "message": "API 초기화 실패"}
+
+    return kis_api_service.kis_api.index_board.snapshot(
+        lambda: call_market_api(kis_api_service.get_all_market_indices, get_all_market_indices_async)
+    )
@@ -0,0 +1,313 @@
+"""KIS 차트 API로 과거 일봉/분봉을 받아 시계열 저장소(history_store)에 채우는 백필 작업
+
+    python -m services.kis_backfill --from 20200101 --minute 005930 NAS:AAPL
+
+종목은 국내 종목코드 또는 '거래소코드:심볼'(NAS/NYS/AMS) 형식이며, 생략하면 대시보드 주요 종목을
+사용합니다. 진행 상황은 체크포인트 파일에 기록되어 중단 후 다시 실행하면 이어서 받습니다.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from services.history_store import get_history_store, history_market
+from services.kis_endpoints import DOMESTIC_DAILY_CHART, DOMESTIC_MINUTE_CHART, OVERSEAS_DAILY_CHART, OVERSEAS_MINUTE_CHART
+from services.market_hours import KST, NEW_YORK
+
+logger = logging.getLogger(__name__)
+
+# 일봉 한 번 조회 최대 100건 - 달력 기준 140일이면 거래일 100일 이내
+DAILY_WINDOW_DAYS = 140
+# 호출이 보호 장치에 막히거나 실패하면 페이지마다 이만큼 다시 시도 (1초, 2초 간격)
+PAGE_RETRIES = 3
+# 해외 분봉 한 페이지 건수 (최대 120)
+OVERSEAS_MINUTE_COUNT = 120
+
+
+def _local_ts(tz, ymd, hms="000000"):
+    """현지 날짜/시각 문자열 → epoch 초"""
+    return int(datetime.strptime(ymd + hms, "%Y%m%d%H%M%S").replace(tzinfo=tz).timestamp())
+
+
+def _ymd(text):
+    return datetime.strptime(text, "%Y%m%d")
+
+
+def _market_tz(market):
+    return KST if market == "domestic" else NEW_YORK
+
+
+class BackfillCheckpoint:
+    """작업별 진행 상황 - {"domestic:005930:1d": {"first": "20200101", "through": "20240531"}, ...}
+
+    일봉은 끝까지 받은 구간(first~through 날짜), 분봉은 마지막으로 받은 완성 봉의 ts(through)를 기록합니다.
+
+    갱신할 때마다 임시 파일에 쓰고 os.replace로 교체하므로 중단되어도 파일이 깨지지 않습니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, key):
+        return self.state.get(key, {})
+
+    def update(self, key, **values):
+        with self._lock:
+            self.state[key] = dict(self.state.get(key, {}), **values)
+            if not self.path:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+
+
+class KISBackfill:
+    """종목별 일봉/분봉 백필 - 차트 API를 페이지 단위로 받아 바로 저장소에 추가
+
+    한 번에 한 페이지(최대 100건) 또는 분봉 하루치만 메모리에 두므로 기간이 길어도
+    사용량이 늘지 않습니다. 종목 간에는 스레드 풀로 병렬 처리하고, 호출 속도는
+    KISAPIService의 토큰 버킷이 전체적으로 맞춥니다.
+    """
+
+    def __init__(self, api, store=None, checkpoint=None, workers=4):
+        self.api = api
+        self.store = store or get_history_store()
+        self.checkpoint = checkpoint or BackfillCheckpoint(None)
+        self.workers = workers
+        self.requests = 0
+        self.bars = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint, **values):
+        """차트 TR 호출 - KISAPIService.call을 거치므로 보호 장치(한도/차단기)와 토큰 무효화가 그대로 적용됨
+
+        막히거나 실패하면 잠시 후 다시 시도하고, 끝내 실패하면 RuntimeError (체크포인트부터 다시 실행)
+        """
+        for attempt in range(PAGE_RETRIES):
+            if attempt:
+                time.sleep(attempt)
+            result = self.api.call(endpoint, **values)
+            with self._lock:
+                self.requests += 1
+            if result is not None:
+                return result
+        raise RuntimeError(f"{endpoint.label} 조회 실패")
+
+    def _write(self, market, symbol, interval, bars):
+        # 실시간 기록기가 이미 더 늦은 봉을 써 둔 세그먼트에도 빠짐없이 들어가도록 합쳐서 기록
+        added = self.store.merge_bars(history_market(market), symbol, interval, bars)
+        with self._lock:
+            self.bars += added
+        return added
+
+    # 일봉 - 시작일부터 창 단위로 앞으로 진행 (응답은 최신순이라 페이지마다 뒤집어 추가)
+
+    def backfill_daily(self, market, symbol, start, end):
+        """start~end 일봉 - 이미 받은 날짜(through)까지는 건너뛰고 그 다음 날부터 end까지만 조회
+
+        --to를 늘려 다시 실행하면 새 날짜만 받습니다. --from을 전보다 앞당기면 시작일부터 다시 받습니다.
+        오늘 일봉은 장중에 바뀌므로 through는 전날까지만 기록해 다음 실행 때 다시 받습니다.
+        """
+        key = f"{market}:{symbol}:1d"
+        state = self.checkpoint.get(key)
+        through = state.get("through")
+        if through is None or start < state.get("first", start):
+            cursor = _ymd(start)
+            self.checkpoint.update(key, first=start, through=None)
+        else:
+            cursor = max(_ymd(start), _ymd(through) + timedelta(days=1))
+        last = _ymd(end)
+        complete = (datetime.now(_market_tz(market)) - timedelta(days=1)).replace(tzinfo=None)
+
+        while cursor <= last:
+            window_end = min(cursor + timedelta(days=DAILY_WINDOW_DAYS - 1), last)
+            if market == "domestic":
+                rows = self._domestic_daily_page(symbol, cursor, window_end)
+            else:
+                rows = self._overseas_daily_page(market, symbol, cursor, window_end)
+
+            self._write(market, symbol, "1d", rows)
+            done = min(window_end, complete)
+            if done >= cursor:
+                self.checkpoint.update(key, through=done.strftime("%Y%m%d"))
+            cursor = window_end + timedelta(days=1)
+
+    def _domestic_daily_page(self, symbol, start, end):
+        result = self._get(DOMESTIC_DAILY_CHART, symbol=symbol, start=start.strftime("%Y%m%d"),
+                           end=end.strftime("%Y%m%d"))
+        rows = [DOMESTIC_DAILY_CHART.decode(row) for row in DOMESTIC_DAILY_CHART.rows(result)]
+        return sorted(
+            (_local_ts(KST, row["date"]), row["open"], row["high"], row["low"], row["close"], row["volume"])
+            for row in rows if row["date"]
+        )
+
+    def _overseas_daily_page(self, market, symbol, start, end):
+        # 종료일(BYMD)부터 과거로 최대 100건 - 시작일 이전 행은 버림
+        result = self._get(OVERSEAS_DAILY_CHART, exchange=market, symbol=symbol, end=end.strftime("%Y%m%d"))
+        first = start.strftime("%Y%m%d")
+        rows = [OVERSEAS_DAILY_CHART.decode(row) for row in OVERSEAS_DAILY_CHART.rows(result)]
+        return sorted(
+            (_local_ts(NEW_YORK, row["date"]), row["open"], row["high"], row["low"], row["close"], row["volume"])
+            for row in rows if row["date"] and row["date"] >= first
+        )
+
+    # 분봉 - 최신부터 거꾸로 페이지를 받고, 하루치가 모이면 그 날 세그먼트에 시간순으로 추가
+
+    def backfill_minute(self, market, symbol):
+        """최근 분봉 - 최신부터 거꾸로 받다가 지난 실행에서 받은 봉(through)에 닿으면 멈춤
+
+        진행 중인 분의 봉은 아직 바뀌므로 through에는 1분 이상 지난 봉까지만 기록합니다.
+        """
+        key = f"{market}:{symbol}:1m"
+        through = self.checkpoint.get(key).get("through", 0)
+        complete = int(time.time()) - 60
+        newest = through
+
+        day, buffered = None, {}
+        for ymd, ts, bar in self._minute_pages(market, symbol):
+            if ts <= through:
+                break
+            if day is not None and ymd != day:
+                self._write(market, symbol, "1m", sorted(buffered.values()))
+                buffered = {}
+            day = ymd
+            buffered[ts] = bar
+            if ts <= complete:
+                newest = max(newest, ts)
+        if buffered:
+            self._write(market, symbol, "1m", sorted(buffered.values()))
+
+        if newest > through:
+            self.checkpoint.update(key, through=newest)
+
+    def _minute_pages(self, market, symbol):
+        """(현지 날짜, ts, 봉)을 최신순으로 생성 - 소비를 멈추면 다음 페이지는 요청하지 않음"""
+        if market == "domestic":
+            # 당일 분봉만 제공 - 30건씩 기준 시각을 앞당기며 조회
+            hour = "153000"
+            while hour >= "090000":
+                result = self._get(DOMESTIC_MINUTE_CHART, symbol=symbol, hour=hour)
+                rows = [DOMESTIC_MINUTE_CHART.decode(row) for row in DOMESTIC_MINUTE_CHART.rows(result)]
+                rows = [row for row in rows if row["date"] and row["time"]]
+                if not rows:
+                    return
+                for row in rows:
+                    ts = _local_ts(KST, row["date"], row["time"])
+                    yield row["date"], ts, (ts, row["open"], row["high"], row["low"], row["close"], row["volume"])
+                oldest = datetime.strptime(rows[-1]["time"], "%H%M%S") - timedelta(minutes=1)
+                next_hour = oldest.strftime("%H%M%S")
+                if next_hour >= hour:
+                    return
+                hour = next_hour
+        else:
+            # 해외 분봉 - 응답 마지막 레코드의 일시를 KEYB로 넘겨 다음 페이지 조회
+            page, keyb = "", ""
+            while True:
+                result = self._get(OVERSEAS_MINUTE_CHART, exchange=market, symbol=symbol, next=page, keyb=keyb,
+                                   count=str(OVERSEAS_MINUTE_COUNT))
+                rows = [OVERSEAS_MINUTE_CHART.decode(row) for row in OVERSEAS_MINUTE_CHART.rows(result)]
+                rows = [row for row in rows if row["date"] and row["time"]]
+                if not rows:
+                    return
+                for row in rows:
+                    ts = _local_ts(NEW_YORK, row["date"], row["time"])
+                    yield row["date"], ts, (ts, row["open"], row["high"], row["low"], row["close"], row["volume"])
+                last = rows[-1]["date"] + rows[-1]["time"]
+                if last == keyb or len(rows) < OVERSEAS_MINUTE_COUNT:
+                    return
+                page, keyb = "1", last
+
+    def _run_symbol(self, market, symbol, start, end, minute):
+        try:
+            if start:
+                self.backfill_daily(market, symbol, start, end)
+            if minute:
+                self.backfill_minute(market, symbol)
+            logger.info(f"백필 완료: {market}:{symbol}")
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.error(f"백필 실패 ({market}:{symbol}): {e} - 다시 실행하면 이어서 받습니다")
+
+    def run(self, symbols, start=None, end=None, minute=False):
+        """symbols: [(market, symbol)] - 종목 간 병렬 실행 후 처리량 보고 dict 반환"""
+        end = end or datetime.now(KST).strftime("%Y%m%d")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kis-backfill") as executor:
+            for market, symbol in symbols:
+                executor.submit(self._run_symbol, market, symbol, start, end, minute)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        return {
+            "symbols": len(symbols),
+            "failures": self.failures,
+            "requests": self.requests,
+            "bars": self.bars,
+            "seconds": round(elapsed, 2),
+            "barsPerSec": round(self.bars / elapsed, 1),
+            "requestsPerSec": round(self.requests / elapsed, 2)
+        }
+
+
+def parse_symbol(text):
+    """'005930' → ('domestic', '005930'), 'NAS:AAPL' → ('NAS', 'AAPL')"""
+    market, sep, symbol = text.partition(":")
+    return (market.upper(), symbol) if sep else ("domestic", text)
+
+
+def main():
+    from dotenv import load_dotenv
+    from services.kis_api_service import KISAPIService, DOMESTIC_MAJOR_STOCKS, US_MAJOR_STOCKS
+    from services.log_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="KIS 과거 일봉/분봉 백필")
+    parser.add_argument("symbols", nargs="*", help="종목코드 또는 거래소:심볼 (기본: 주요 종목)")
+    parser.add_argument("--symbols-file", help="한 줄에 종목 하나씩 적은 파일")
+    parser.add_argument("--from", dest="start", help="일봉 시작일 YYYYMMDD (생략 시 일봉 백필 안 함)")
+    parser.add_argument("--to", dest="end", help="일봉 종료일 YYYYMMDD (기본: 오늘)")
+    parser.add_argument("--minute", action="store_true", help="최근 분봉도 백필")
+    parser.add_argument("--workers", type=int, default=4, help="동시 처리 종목 수")
+    parser.add_argument("--checkpoint", default=os.path.join("data", "backfill_checkpoint.json"))
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_logging()
+
+    names = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file, encoding="utf-8") as f:
+            names += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if names:
+        symbols = [parse_symbol(name) for name in names]
+    else:
+        symbols = [("domestic", code) for code in DOMESTIC_MAJOR_STOCKS]
+        symbols += [(stock_info["exchange"], stock_info["symbol"]) for stock_info in US_MAJOR_STOCKS]
+
+    if not args.start and not args.minute:
+        parser.error("--from 또는 --minute 중 하나는 지정해야 합니다")
+
+    backfill = KISBackfill(KISAPIService(), checkpoint=BackfillCheckpoint(args.checkpoint), workers=args.workers)
+    report = backfill.run(symbols, start=args.start, end=args.end, minute=args.minute)
+    print(
+        f"백필 종료: {report['symbols']}종목 (실패 {report['failures']}), "
+        f"요청 {report['requests']}건, 봉 {report['bars']}건, {report['seconds']}초 - "
+        f"{report['barsPerSec']} bars/s, {report['requestsPerSec']} req/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
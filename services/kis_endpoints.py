@@ -0,0 +1,303 @@
+"""KIS 조회 TR 선언 - 경로, tr_id, 요청 파라미터 틀, 응답 필드 스키마
+
+새 조회 TR은 Endpoint 하나를 선언하면 되고, 호출은 KISAPIService.call(endpoint, **값)이 담당합니다.
+응답 필드 변환은 스키마로부터 한 번 생성한 함수(compile_schema)로 처리해 필드마다 조건 분기나
+int(float(...)) 같은 이중 변환을 반복하지 않습니다. orjson이 설치되어 있으면 JSON 파싱에도 사용합니다.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json 사용
+    orjson = None
+
+
+def loads(data):
+    """응답 본문(bytes/str) → JSON 객체"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def to_int(value):
+    """KIS 숫자 문자열 → int ("71500", "-1.0", "" 모두 허용, 변환 불가면 0)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+def to_float(value):
+    """KIS 숫자 문자열 → float (변환 불가면 0.0)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_str(value):
+    return "" if value is None else str(value)
+
+
+CONVERTERS = {"int": to_int, "float": to_float, "str": to_str}
+
+
+# 빠른 경로에서 쓰는 내장 변환 - 값이 비었거나 형식이 다르면 예외가 나고 안전한 변환(CONVERTERS)으로 다시 처리
+# (str은 예외 없이 결과가 달라질 수 있어 빠른 경로에서도 to_str 사용)
+_FAST = {"int": "int({})", "float": "float({})"}
+
+
+def compile_schema(fields):
+    """필드 스키마 {출력 키: (응답 키, 변환)} → output dict를 변환하는 함수
+
+    변환은 CONVERTERS 이름 또는 함수입니다. 필드마다 루프를 돌지 않도록 dict 리터럴 하나를
+    반환하는 함수를 만들어 두고, 정상 응답은 내장 int/float만 쓰는 빠른 경로로 변환합니다.
+    빈 문자열이나 "1.0" 같은 값이 섞여 예외가 나면 그 응답만 필드별 안전 변환으로 다시 처리합니다.
+    """
+    namespace = {}
+    fast, safe = [], []
+    for index, (key, (source, convert)) in enumerate(fields.items()):
+        namespace[f"_c{index}"] = CONVERTERS.get(convert, convert)
+        value = f"get({source!r})"
+        fast.append(f"{key!r}: " + (_FAST[convert].format(value) if convert in _FAST else f"_c{index}({value})"))
+        safe.append(f"{key!r}: _c{index}({value})")
+    code = (
+        "def decode(output):\n"
+        "    get = output.get\n"
+        "    try:\n"
+        "        return {" + ", ".join(fast) + "}\n"
+        "    except (TypeError, ValueError):\n"
+        "        return {" + ", ".join(safe) + "}\n"
+    )
+    exec(compile(code, "<kis-schema>", "exec"), namespace)
+    return namespace["decode"]
+
+
+class Endpoint:
+    """KIS 조회 TR 하나 - params 값 중 "{이름}"은 호출 시 키워드 인자로 채움
+
+    파라미터 개수가 호출마다 달라지는 TR은 params에 함수(**값 → dict)를 줍니다.
+    group은 호출 보호 장치(services.kis_resilience)의 호출 종류입니다.
+    """
+
+    def __init__(self, label, path, tr_id, params, fields, output="output", group="domestic_quote"):
+        self.label = label
+        self.group = group
+        self.path = path
+        self.tr_id = tr_id
+        self.output = output  # 스키마가 적용되는 응답 키 (output/output1)
+        self.fields = fields
+        self._build = params if callable(params) else None
+        self._static = {} if self._build else {key: value for key, value in params.items() if not _is_slot(value)}
+        self._slots = [] if self._build else [(key, value[1:-1]) for key, value in params.items() if _is_slot(value)]
+        self.decode = compile_schema(fields)
+
+    def body(self, result):
+        """응답에서 스키마를 적용할 부분 (output 키) - 없으면 빈 dict"""
+        return result.get(self.output) or {}
+
+    def rows(self, result):
+        """output이 행 목록인 TR(멀티종목)의 행들 - 없으면 빈 목록"""
+        return result.get(self.output) or []
+
+    def params(self, **values):
+        if self._build is not None:
+            return self._build(**values)
+        params = dict(self._static)
+        for key, name in self._slots:
+            params[key] = values[name]
+        return params
+
+
+def _is_slot(value):
+    return isinstance(value, str) and len(value) > 2 and value[0] == "{" and value[-1] == "}"
+
+
+DOMESTIC_PRICE = Endpoint(
+    "주식 현재가", "/uapi/domestic-stock/v1/quotations/inquire-price", "FHKST01010100",
+    {"fid_cond_mrkt_div_code": "J", "fid_input_iscd": "{symbol}"},
+    {
+        "name": ("hts_kor_isnm", "str"),       # 종목명
+        "price": ("stck_prpr", "int"),         # 현재가
+        "change": ("prdy_vrss", "int"),        # 전일대비
+        "changePercent": ("prdy_ctrt", "float"),  # 전일대비율
+        "volume": ("acml_vol", "int"),         # 누적거래량
+        "high": ("stck_hgpr", "int"),          # 최고가
+        "low": ("stck_lwpr", "int"),           # 최저가
+        "open": ("stck_oprc", "int"),          # 시가
+        "listedShares": ("lstn_stcn", "int"),  # 상장주식수
+    }
+)
+
+# 관심종목(멀티종목) 시세 - 한 번에 최대 MULTI_PRICE_MAX_CODES 종목, output은 종목별 행 목록
+MULTI_PRICE_MAX_CODES = 30
+
+
+def _multi_price_params(codes):
+    params = {}
+    for i, code in enumerate(codes[:MULTI_PRICE_MAX_CODES], 1):
+        params[f"FID_COND_MRKT_DIV_CODE_{i}"] = "J"
+        params[f"FID_INPUT_ISCD_{i}"] = code
+    return params
+
+
+DOMESTIC_MULTI_PRICE = Endpoint(
+    "멀티종목 시세", "/uapi/domestic-stock/v1/quotations/intstock-multprice", "FHKST11300006",
+    _multi_price_params,
+    {
+        "ticker": ("inter_shrn_iscd", "str"),     # 종목코드
+        "name": ("inter_kor_isnm", "str"),        # 종목명
+        "price": ("inter2_prpr", "int"),          # 현재가
+        "change": ("inter2_prdy_vrss", "int"),    # 전일대비
+        "changePercent": ("prdy_ctrt", "float"),  # 전일대비율
+        "volume": ("acml_vol", "int"),            # 누적거래량
+        "high": ("inter2_hgpr", "int"),           # 최고가
+        "low": ("inter2_lwpr", "int"),            # 최저가
+        "open": ("inter2_oprc", "int"),           # 시가
+    }
+)
+
+OVERSEAS_PRICE = Endpoint(
+    "해외주식 현재가", "/uapi/overseas-price/v1/quotations/price", "HHDFS00000300",
+    {"AUTH": "", "EXCD": "{exchange}", "SYMB": "{symbol}"},  # EXCD - NAS:나스닥, NYS:뉴욕, HKS:홍콩, TYO:도쿄 등
+    {
+        "name": ("name", "str"),
+        "last": ("last", "float"),   # 현재가
+        "base": ("base", "float"),   # 전일 종가
+        "volume": ("tvol", "int"),   # 거래량
+        "high": ("high", "float"),
+        "low": ("low", "float"),
+        "open": ("open", "float"),
+    },
+    group="overseas_quote"
+)
+
+DOMESTIC_INDEX = Endpoint(
+    "업종지수 현재가", "/uapi/domestic-stock/v1/quotations/inquire-index-price", "FHPUP02100000",
+    {"fid_cond_mrkt_div_code": "U", "fid_input_iscd": "{code}"},
+    {
+        "value": ("bstp_nmix_prpr", "float"),             # 현재지수
+        "change": ("bstp_nmix_prdy_vrss", "float"),       # 전일대비
+        "changePercent": ("bstp_nmix_prdy_ctrt", "float"),  # 전일대비율
+    },
+    group="index"
+)
+
+OVERSEAS_DAILY_INDEX = Endpoint(
+    "해외지수 기간별시세", "/uapi/overseas-price/v1/quotations/inquire-daily-chartprice", "FHKST03030100",
+    {
+        "FID_COND_MRKT_DIV_CODE": "N",
+        "FID_INPUT_ISCD": "{code}",
+        "FID_INPUT_DATE_1": "{start}",
+        "FID_INPUT_DATE_2": "{end}",
+        "FID_PERIOD_DIV_CODE": "D"
+    },
+    {
+        "value": ("ovrs_nmix_prpr", "float"),       # 현재지수
+        "change": ("ovrs_nmix_prdy_vrss", "float"), # 전일대비
+        "changePercent": ("prdy_ctrt", "float"),    # 전일대비율
+        "sign": ("prdy_vrss_sign", "str"),          # 전일대비 부호 (4:하한, 5:하락)
+    },
+    output="output1",
+    group="index"
+)
+
+# 같은 기간별시세 TR을 시장 구분 X(환율)로 호출 - FX@KRW는 원/달러
+EXCHANGE_RATE = Endpoint(
+    "환율 기간별시세", "/uapi/overseas-price/v1/quotations/inquire-daily-chartprice", "FHKST03030100",
+    {
+        "FID_COND_MRKT_DIV_CODE": "X",
+        "FID_INPUT_ISCD": "{code}",
+        "FID_INPUT_DATE_1": "{start}",
+        "FID_INPUT_DATE_2": "{end}",
+        "FID_PERIOD_DIV_CODE": "D"
+    },
+    {
+        "rate": ("ovrs_nmix_prpr", "float"),        # 현재 환율
+        "change": ("ovrs_nmix_prdy_vrss", "float"), # 전일대비
+    },
+    output="output1",
+    group="index"
+)
+
+# 차트(과거 시세) TR - services.kis_backfill에서 사용, output2가 봉 목록(최신순)
+DOMESTIC_DAILY_CHART = Endpoint(
+    "국내주식 기간별시세", "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice", "FHKST03010100",
+    {
+        "FID_COND_MRKT_DIV_CODE": "J",
+        "FID_INPUT_ISCD": "{symbol}",
+        "FID_INPUT_DATE_1": "{start}",
+        "FID_INPUT_DATE_2": "{end}",
+        "FID_PERIOD_DIV_CODE": "D",
+        "FID_ORG_ADJ_PRC": "0"  # 수정주가
+    },
+    {
+        "date": ("stck_bsop_date", "str"),  # 영업일자
+        "open": ("stck_oprc", "float"),
+        "high": ("stck_hgpr", "float"),
+        "low": ("stck_lwpr", "float"),
+        "close": ("stck_clpr", "float"),
+        "volume": ("acml_vol", "int"),
+    },
+    output="output2",
+    group="history"
+)
+
+OVERSEAS_DAILY_CHART = Endpoint(
+    "해외주식 기간별시세", "/uapi/overseas-price/v1/quotations/dailyprice", "HHDFS76240000",
+    {"AUTH": "", "EXCD": "{exchange}", "SYMB": "{symbol}", "GUBN": "0", "BYMD": "{end}", "MODP": "1"},  # GUBN 0:일
+    {
+        "date": ("xymd", "str"),
+        "open": ("open", "float"),
+        "high": ("high", "float"),
+        "low": ("low", "float"),
+        "close": ("clos", "float"),
+        "volume": ("tvol", "int"),
+    },
+    output="output2",
+    group="history"
+)
+
+DOMESTIC_MINUTE_CHART = Endpoint(
+    "주식당일분봉조회", "/uapi/domestic-stock/v1/quotations/inquire-time-itemchartprice", "FHKST03010200",
+    {
+        "FID_ETC_CLS_CODE": "",
+        "FID_COND_MRKT_DIV_CODE": "J",
+        "FID_INPUT_ISCD": "{symbol}",
+        "FID_INPUT_HOUR_1": "{hour}",  # 이 시각 이전 30건
+        "FID_PW_DATA_INCU_YN": "Y"
+    },
+    {
+        "date": ("stck_bsop_date", "str"),
+        "time": ("stck_cntg_hour", "str"),  # 체결시간 HHMMSS
+        "open": ("stck_oprc", "float"),
+        "high": ("stck_hgpr", "float"),
+        "low": ("stck_lwpr", "float"),
+        "close": ("stck_prpr", "float"),
+        "volume": ("cntg_vol", "int"),
+    },
+    output="output2",
+    group="history"
+)
+
+OVERSEAS_MINUTE_CHART = Endpoint(
+    "해외주식분봉조회", "/uapi/overseas-price/v1/quotations/inquire-time-itemchartprice", "HHDFS76950200",
+    {
+        "AUTH": "", "EXCD": "{exchange}", "SYMB": "{symbol}", "NMIN": "1", "PINC": "1",
+        "NEXT": "{next}", "NREC": "{count}", "FILL": "", "KEYB": "{keyb}"  # KEYB - 이전 페이지 마지막 일시
+    },
+    {
+        "date": ("xymd", "str"),
+        "time": ("xhms", "str"),
+        "open": ("open", "float"),
+        "high": ("high", "float"),
+        "low": ("low", "float"),
+        "close": ("last", "float"),
+        "volume": ("evol", "int"),
+    },
+    output="output2",
+    group="history"
+)
@@ -0,0 +1,351 @@
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import websocket  # websocket-client
+except ImportError:  # 실시간 수신은 websocket-client 설치 시에만 사용
+    websocket = None
+
+from services.alert_engine import evaluate_quotes
+from services.history_store import record_quotes
+from services.indicators import indicator_lookup, update_indicators
+from services.quote_store import store_for_market
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WS_URL = "ws://ops.koreainvestment.com:21000"
+
+DOMESTIC_TRADE_TR = "H0STCNT0"   # 국내주식 실시간체결가
+OVERSEAS_TRADE_TR = "HDFSCNT0"   # 해외주식 실시간지연체결가
+
+# 실시간 체결로 갱신되는 필드
+REALTIME_FIELDS = ("price", "change", "changePercent", "volume", "high", "low", "open", "tradeTime")
+
+# 하락 부호 (4: 하한, 5: 하락) - 전일대비 값에 부호 적용
+_DOWN_SIGNS = ("4", "5")
+
+
+def _signed(value, sign):
+    value = abs(float(value or 0))
+    return -value if sign in _DOWN_SIGNS else value
+
+
+def _parse_domestic_trade(fields):
+    """H0STCNT0 레코드 → (market, ticker, 시세 필드)"""
+    sign = fields[3]
+    return "domestic", fields[0], {
+        "price": int(fields[2]),
+        "change": int(_signed(fields[4], sign)),
+        "changePercent": _signed(fields[5], sign),
+        "open": int(fields[7]),
+        "high": int(fields[8]),
+        "low": int(fields[9]),
+        "volume": int(fields[13]),
+        "tradeTime": fields[1]
+    }
+
+
+def _parse_overseas_trade(fields):
+    """HDFSCNT0 레코드 → (market, ticker, 시세 필드) - RSYM은 'D' + 거래소코드 + 심볼"""
+    sign = fields[12]
+    return fields[0][1:4], fields[1], {
+        "price": round(float(fields[11]), 2),
+        "change": round(_signed(fields[13], sign), 2),
+        "changePercent": round(_signed(fields[14], sign), 2),
+        "open": float(fields[8]),
+        "high": float(fields[9]),
+        "low": float(fields[10]),
+        "volume": int(fields[20]),
+        "tradeTime": fields[5]
+    }
+
+
+FRAME_PARSERS = {
+    DOMESTIC_TRADE_TR: _parse_domestic_trade,
+    OVERSEAS_TRADE_TR: _parse_overseas_trade,
+}
+
+
+def parse_frame(raw):
+    """실시간 데이터 프레임 파싱 - '0|TR_ID|건수|필드^필드^...'
+
+    한 프레임에 여러 건이 이어 붙어 올 수 있어 건수로 나눠 레코드별로 파싱합니다.
+    제어 메시지(JSON)나 암호화 프레임, 모르는 TR은 빈 리스트를 반환합니다.
+    """
+    if not raw or raw[0] != "0":
+        return []
+
+    parts = raw.split("|", 3)
+    if len(parts) != 4:
+        return []
+
+    parser = FRAME_PARSERS.get(parts[1])
+    if parser is None:
+        return []
+
+    fields = parts[3].split("^")
+    count = max(1, int(parts[2]))
+    width = len(fields) // count
+    updates = []
+    for i in range(count):
+        try:
+            updates.append(parser(fields[i * width:(i + 1) * width]))
+        except (ValueError, IndexError):
+            continue
+    return updates
+
+
+def tr_key_for(market, symbol):
+    """구독 키 - 국내는 종목코드, 해외는 'D' + 거래소코드 + 심볼"""
+    return symbol if market == "domestic" else f"D{market}{symbol}"
+
+
+def tr_id_for(market):
+    return DOMESTIC_TRADE_TR if market == "domestic" else OVERSEAS_TRADE_TR
+
+
+class RealtimeQuoteTable:
+    """실시간 체결로 갱신되는 메모리 시세 테이블 - (market, ticker) -> 시세 dict
+
+    행은 갱신 때마다 새 dict로 교체하므로 읽는 쪽은 잠금 없이 참조를 써도 됩니다.
+    구독이 살아 있는 종목(live)은 REST 대신 이 테이블 값을 사용합니다.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._live_since = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def seed(self, market, ticker, quote):
+        """REST 조회 결과로 행 채우기 - 구독 중 받은 실시간 값은 유지하고 종목명 등만 보강"""
+        key = (market, ticker)
+        with self._lock:
+            row = self._rows.get(key)
+            since = self._live_since.get(key)
+            if row is not None and since is not None and row["source"] == "realtime" and row["updatedAt"] >= since:
+                self._rows[key] = dict(quote, **{k: row[k] for k in REALTIME_FIELDS if k in row},
+                                       source="realtime", updatedAt=row["updatedAt"])
+            else:
+                self._rows[key] = dict(quote, source="rest", updatedAt=time.time())
+
+    def apply(self, market, ticker, fields):
+        """실시간 체결 필드 반영"""
+        with self._lock:
+            row = self._rows.get((market, ticker)) or {"ticker": ticker, "name": ticker, "marketCap": "-"}
+            row = self._rows[(market, ticker)] = dict(row, **fields, source="realtime", updatedAt=time.time())
+            self.updates += 1
+
+        # 체결 틱을 분봉/일봉 이력, 기술적 지표와 가격 알림에 반영
+        record_quotes(market, [row], row["updatedAt"])
+        update_indicators(market, [row], row["updatedAt"])
+        evaluate_quotes([row], indicator_lookup(market))
+
+        # 화면에 올라간 종목이면 컬럼 저장소도 제자리 갱신
+        store = store_for_market(market)
+        if store is not None:
+            store.update(ticker, fields)
+
+    def set_live(self, market, ticker, live):
+        with self._lock:
+            if live:
+                self._live_since.setdefault((market, ticker), time.time())
+            else:
+                self._live_since.pop((market, ticker), None)
+
+    def clear_live(self):
+        with self._lock:
+            self._live_since.clear()
+
+    def get(self, market, ticker):
+        return self._rows.get((market, ticker))
+
+    def get_live(self, market, ticker):
+        """구독 중이고 구독 이후 값이 채워진 행만 반환 (아니면 None → REST 폴백)"""
+        since = self._live_since.get((market, ticker))
+        row = self._rows.get((market, ticker))
+        if since is None or row is None or row["updatedAt"] < since:
+            return None
+        return row
+
+
+class KISRealtimeClient:
+    """KIS 실시간 웹소켓 수신기 - 접속키 발급, 구독/해지, 자동 재접속, 프레임 파싱
+
+    수신한 체결은 RealtimeQuoteTable에 반영되고, REST 시세 조회는 구독되지 않았거나
+    연결이 끊긴 종목에 대해서만 사용됩니다.
+    """
+
+    MAX_SUBSCRIPTIONS = 40  # KIS 세션당 실시간 등록 한도(41건) 이내
+
+    def __init__(self, api, table, url=None, record_file=None):
+        if websocket is None:
+            raise RuntimeError("websocket-client가 설치되어 있지 않습니다")
+
+        self.api = api
+        self.table = table
+        self.url = url or os.getenv("KIS_WS_URL") or DEFAULT_WS_URL
+        self.record_file = record_file or os.getenv("KIS_WS_RECORD")
+        self.approval_key = os.getenv("KIS_WS_APPROVAL_KEY")  # 재생 서버 등 고정 키 사용 시
+        self._subscriptions = set()   # (market, symbol)
+        self._ws = None
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._record = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kis-realtime", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def subscribe(self, market, symbol):
+        """종목 실시간 구독 (연결 전이면 접속 후 일괄 등록)"""
+        key = (market, symbol)
+        if key in self._subscriptions:
+            return True
+        if len(self._subscriptions) >= self.MAX_SUBSCRIPTIONS:
+            logger.warning(f"실시간 구독 한도 초과 - {symbol}은 REST로 조회합니다")
+            return False
+        self._subscriptions.add(key)
+        self._send_subscription(market, symbol, True)
+        return True
+
+    def unsubscribe(self, market, symbol):
+        key = (market, symbol)
+        if key not in self._subscriptions:
+            return
+        self._subscriptions.discard(key)
+        self.table.set_live(market, symbol, False)
+        self._send_subscription(market, symbol, False)
+
+    def _send_subscription(self, market, symbol, register):
+        ws = self._ws
+        if ws is None or self.approval_key is None:
+            return
+        message = {
+            "header": {
+                "approval_key": self.approval_key,
+                "custtype": "P",
+                "tr_type": "1" if register else "2",
+                "content-type": "utf-8"
+            },
+            "body": {"input": {"tr_id": tr_id_for(market), "tr_key": tr_key_for(market, symbol)}}
+        }
+        try:
+            with self._send_lock:
+                ws.send(json.dumps(message))
+        except Exception as e:
+            logger.error(f"실시간 구독 요청 실패 ({symbol}): {e}")
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                if self.approval_key is None:
+                    self.approval_key = self.api.get_approval_key()
+                    if not self.approval_key:
+                        raise RuntimeError("실시간 접속키 발급 실패")
+
+                self._ws = websocket.create_connection(self.url, timeout=60)
+                logger.info(f"KIS 실시간 연결: {self.url}")
+                for market, symbol in list(self._subscriptions):
+                    self._send_subscription(market, symbol, True)
+
+                backoff = 1.0
+                self._receive_loop()
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.error(f"KIS 실시간 연결 오류: {e} - {backoff:.0f}초 후 재접속")
+            finally:
+                self.table.clear_live()
+                ws, self._ws = self._ws, None
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def _receive_loop(self):
+        while not self._stop.is_set():
+            raw = self._ws.recv()
+            if not raw:
+                raise ConnectionError("연결 종료")
+            if self.record_file:
+                self._record_frame(raw)
+
+            if raw[0] in "01":
+                for market, ticker, fields in parse_frame(raw):
+                    self.table.apply(market, ticker, fields)
+            else:
+                self._handle_control(raw)
+
+    def _handle_control(self, raw):
+        """JSON 제어 메시지 - PINGPONG 응답, 구독 결과 처리"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+
+        header = message.get("header", {})
+        if header.get("tr_id") == "PINGPONG":
+            with self._send_lock:
+                self._ws.send(raw)
+            return
+
+        body = message.get("body", {})
+        tr_key = header.get("tr_key", "")
+        market, symbol = ("domestic", tr_key) if header.get("tr_id") == DOMESTIC_TRADE_TR else (tr_key[1:4], tr_key[4:])
+        if body.get("rt_cd") == "0":
+            # 등록 성공이면 live, 해지 성공이면 REST로 복귀
+            self.table.set_live(market, symbol, (market, symbol) in self._subscriptions)
+        else:
+            logger.error(f"실시간 구독 실패 ({tr_key}): {body.get('msg1', '')} ({body.get('msg_cd', '')})")
+            if body.get("msg_cd") in ("OPSP0011", "OPSP8996"):  # 접속키 오류 - 재발급 후 재접속
+                self.approval_key = None
+                raise ConnectionError("실시간 접속키 재발급 필요")
+
+    def _record_frame(self, raw):
+        """수신 프레임을 재생 서버용 파일로 기록 - '경과 ms<TAB>프레임'"""
+        if self._record is None:
+            self._record = (open(self.record_file, "a", encoding="utf-8"), time.monotonic())
+        f, started = self._record
+        f.write(f"{int((time.monotonic() - started) * 1000)}\t{raw}\n")
+        f.flush()
+
+
+realtime_client = None
+
+def start_realtime_feed(api, symbols):
+    """실시간 수신 시작 (KIS_REALTIME_ENABLED=1 일 때) - symbols는 (market, symbol) 목록"""
+    global realtime_client
+
+    if os.getenv("KIS_REALTIME_ENABLED", "0") != "1" or api is None:
+        return None
+    if websocket is None:
+        logger.warning("websocket-client 미설치 - 실시간 수신 없이 REST 조회만 사용합니다")
+        return None
+
+    if realtime_client is None:
+        realtime_client = KISRealtimeClient(api, api.realtime_quotes)
+        for market, symbol in symbols:
+            realtime_client.subscribe(market, symbol)
+    realtime_client.start()
+    return realtime_client
@@ -0,0 +1,210 @@
+"""KIS 실시간 웹소켓 재생 서버 - 기록해 둔 프레임을 로컬에서 다시 내보내는 오프라인 테스트용 서버
+
+    python -m services.kis_replay_server frames.log --port 21000 --speed 2 --loop
+
+프레임 파일은 KIS_WS_RECORD로 기록한 '경과 ms<TAB>프레임' 형식이거나 한 줄에 프레임 하나입니다.
+클라이언트가 구독한 tr_key의 프레임만 보내며, 접속키는 검사하지 않습니다.
+수신 측은 KIS_WS_URL=ws://127.0.0.1:21000, KIS_WS_APPROVAL_KEY=replay 로 연결합니다.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import threading
+import time
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def load_frames(path):
+    """프레임 파일 로드 → [(경과초, 프레임)]"""
+    frames = []
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            offset, sep, raw = line.partition("\t")
+            if sep and offset.isdigit():
+                frames.append((int(offset) / 1000.0, raw))
+            else:
+                frames.append((index * 0.1, line))
+    return frames
+
+
+def frame_tr_key(raw):
+    """데이터 프레임의 첫 레코드 키 (국내: 종목코드, 해외: RSYM)"""
+    parts = raw.split("|", 3)
+    if len(parts) != 4:
+        return None
+    return parts[3].split("^", 1)[0]
+
+
+class ReplayHandler(socketserver.BaseRequestHandler):
+    """웹소켓 연결 하나 - 핸드셰이크 후 구독 처리와 프레임 재생"""
+
+    def handle(self):
+        if not self._handshake():
+            return
+
+        self.subscribed = set()
+        self.closed = threading.Event()
+        self.send_lock = threading.Lock()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+        server = self.server
+        last_ping = time.monotonic()
+        try:
+            while not self.closed.is_set():
+                started = time.monotonic()
+                for offset, raw in server.frames:
+                    delay = offset / server.speed - (time.monotonic() - started)
+                    if delay > 0 and self.closed.wait(delay):
+                        return
+                    if time.monotonic() - last_ping >= server.ping_interval:
+                        self.send_text(json.dumps({"header": {"tr_id": "PINGPONG", "datetime": time.strftime("%Y%m%d%H%M%S")}}))
+                        last_ping = time.monotonic()
+                    if raw[:1] in ("0", "1") and frame_tr_key(raw) in self.subscribed:
+                        self.send_text(raw)
+                if not server.loop:
+                    self.closed.wait()
+        except OSError:
+            pass
+        finally:
+            self.closed.set()
+
+    def _handshake(self):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            data += chunk
+
+        headers = {}
+        for line in data.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        key = headers.get("sec-websocket-key")
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        self.request.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        return True
+
+    def _recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("연결 종료")
+            data += chunk
+        return data
+
+    def _read_loop(self):
+        """클라이언트 프레임 수신 - 구독/해지 요청에 응답, close/ping 처리"""
+        try:
+            while not self.closed.is_set():
+                first, second = self._recv_exact(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack(">H", self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack(">Q", self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if second & 0x80 else b"\x00\x00\x00\x00"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(length)))
+
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+                elif opcode == 0x1:
+                    self._handle_request(payload.decode("utf-8"))
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            self.closed.set()
+
+    def _handle_request(self, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if message.get("header", {}).get("tr_id") == "PINGPONG":
+            return
+
+        body = message.get("body", {}).get("input", {})
+        tr_id, tr_key = body.get("tr_id"), body.get("tr_key")
+        register = message.get("header", {}).get("tr_type", "1") == "1"
+        if register:
+            self.subscribed.add(tr_key)
+        else:
+            self.subscribed.discard(tr_key)
+
+        self.send_text(json.dumps({
+            "header": {"tr_id": tr_id, "tr_key": tr_key, "encrypt": "N"},
+            "body": {
+                "rt_cd": "0",
+                "msg_cd": "OPSP0000" if register else "OPSP0001",
+                "msg1": "SUBSCRIBE SUCCESS" if register else "UNSUBSCRIBE SUCCESS"
+            }
+        }))
+
+    def send_text(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        with self.send_lock:
+            self.request.sendall(header + payload)
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, frames, speed=1.0, loop=False, ping_interval=10.0):
+        super().__init__(address, ReplayHandler)
+        self.frames = frames
+        self.speed = speed
+        self.loop = loop
+        self.ping_interval = ping_interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KIS 실시간 웹소켓 재생 서버")
+    parser.add_argument("frames", help="기록된 프레임 파일")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=21000)
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속")
+    parser.add_argument("--loop", action="store_true", help="끝나면 처음부터 반복")
+    parser.add_argument("--ping", type=float, default=10.0, help="PINGPONG 전송 주기(초)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    server = ReplayServer((args.host, args.port), frames, speed=args.speed, loop=args.loop, ping_interval=args.ping)
+    print(f"재생 서버 시작: ws://{args.host}:{args.port} ({len(frames)}개 프레임)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
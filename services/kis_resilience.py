@@ -0,0 +1,270 @@
+"""KIS 호출 보호 - 호출 종류별 적응형 동시 호출 한도(AIMD)와 회로 차단기
+
+KIS가 느려지거나 초당 거래건수 초과(EGW00201)를 돌려주기 시작하면 같은 종류의 호출을 더 보내 봐야
+대기열만 길어지고 Flask 요청 스레드가 함께 묶입니다. 호출 종류(국내 시세, 해외 시세, 지수, 토큰)마다
+
+- 동시 호출 한도: 정상 응답이면 한도만큼 성공할 때마다 1씩 늘리고(가산 증가), 지연이 목표를 넘거나
+  제한/서버 오류가 나면 절반으로 줄임(곱셈 감소). 빈자리를 wait_timeout초 안에 얻지 못하면 바로 포기
+- 회로 차단기: 연속 실패가 failure_threshold번이면 열려서 reset_timeout초 동안 호출 없이 바로 실패하고,
+  이후 한 건만 시험 호출(half-open)해 성공하면 닫고 실패하면 대기 시간을 두 배로 늘려 다시 엶
+
+을 두어 호출 측은 기다리지 않고 마지막으로 받은 값(stale)을 내보내게 합니다.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# 호출 결과 분류
+OK = "ok"                # 업스트림 정상 (rt_cd 업무 오류 포함 - 종목코드 오류 등은 업스트림 상태와 무관)
+THROTTLED = "throttled"  # 초당 거래건수 초과 / 429
+FAILED = "failed"        # 연결 오류, 타임아웃, 5xx
+TOKEN_REJECTED = "token_rejected"  # 액세스 토큰 만료/무효 - 업스트림 상태와 무관하므로 한도/차단기에 반영하지 않음
+
+RATE_LIMITED_CODES = frozenset(["EGW00201"])
+# 기간이 만료된 token / 유효하지 않은 token
+TOKEN_REJECTED_CODES = frozenset(["EGW00121", "EGW00123"])
+
+# 호출 종류별 동시 호출 한도 (초기값, 최대값)과 차단기 연속 실패 기준
+GUARD_CLASSES = {
+    "domestic_quote": {"initial": 8, "maximum": 16, "failures": 5},
+    "overseas_quote": {"initial": 8, "maximum": 16, "failures": 5},
+    "index": {"initial": 4, "maximum": 8, "failures": 5},
+    # 백필 차트 조회 - 대시보드 시세와 한도/차단기를 나눠 백필이 몰려도 시세 조회가 막히지 않게 함
+    "history": {"initial": 4, "maximum": 8, "failures": 5},
+    # 토큰 발급은 1분에 1회라 한 건씩, 두 번 연속 실패하면 열어서 시세 호출이 토큰을 기다리지 않게 함
+    "token": {"initial": 1, "maximum": 1, "failures": 2},
+}
+
+
+def classify(status, body):
+    """HTTP 상태와 응답 본문 → 호출 결과 분류"""
+    msg_cd = (body.get("msg_cd") or body.get("error_code")) if isinstance(body, dict) else None
+    if msg_cd in TOKEN_REJECTED_CODES:
+        return TOKEN_REJECTED
+    if status == 429 or msg_cd in RATE_LIMITED_CODES:
+        return THROTTLED
+    if status >= 500:
+        return FAILED
+    return OK
+
+
+class Unavailable(Exception):
+    """보호 장치가 호출을 막음 - reason은 open(차단기 열림) 또는 saturated(동시 호출 한도 초과)"""
+
+    def __init__(self, group, reason):
+        super().__init__(f"{group} 호출 {'차단 중' if reason == 'open' else '한도 초과'}")
+        self.group = group
+        self.reason = reason
+
+
+class AdaptiveLimit:
+    """AIMD 동시 호출 한도 - 지연 목표와 제한/오류 응답으로 한도를 조절"""
+
+    def __init__(self, initial, minimum=1, maximum=16, latency_target=1.5, backoff=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(initial)
+        self.inflight = 0
+        self.decreases = 0
+        self._hold_until = 0.0  # 같은 혼잡 구간의 응답들로 여러 번 줄이지 않도록 이 시각까지는 감소 보류
+        self._cond = threading.Condition()
+
+    def _has_room(self):
+        return self.inflight < max(self.minimum, int(self.limit))
+
+    def try_acquire(self):
+        with self._cond:
+            if not self._has_room():
+                return False
+            self.inflight += 1
+            return True
+
+    def acquire(self, timeout):
+        """빈자리를 timeout초까지 기다려 얻으면 True"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._has_room():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.inflight += 1
+            return True
+
+    def release(self, latency, outcome):
+        """호출 한 건 종료 - 결과와 지연으로 한도 조절"""
+        with self._cond:
+            self.inflight -= 1
+            now = time.monotonic()
+            if outcome == TOKEN_REJECTED:
+                pass
+            elif outcome != OK or latency > self.latency_target:
+                if now >= self._hold_until:
+                    self.limit = max(float(self.minimum), self.limit * self.backoff)
+                    self._hold_until = now + max(latency, self.latency_target)
+                    self.decreases += 1
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """연속 실패 기준 회로 차단기 - closed → open → half_open(시험 호출 한 건) → closed/open"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=5.0, max_reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self._timeout = reset_timeout
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self.state == self.OPEN and time.monotonic() < self._open_until
+
+    def allow(self):
+        """호출해도 되면 True - 열린 뒤 reset 시간이 지났으면 시험 호출 한 건만 허용"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() < self._open_until:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def cancel(self):
+        """허용받은 시험 호출을 보내지 못했을 때 (동시 호출 한도 초과)"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success):
+        with self._lock:
+            if self.state == self.OPEN:
+                return  # 열리기 전에 보낸 호출의 늦은 결과는 무시
+            if success:
+                if self.state == self.HALF_OPEN:
+                    logger.info(f"KIS {self.name} 호출 회로 복구")
+                self.state = self.CLOSED
+                self.failures = 0
+                self._timeout = self.reset_timeout
+                return
+
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self._open_until = time.monotonic() + self._timeout
+            self._probing = False
+            self.opens += 1
+            logger.warning(f"KIS {self.name} 호출 회로 열림 - 연속 실패 {self.failures}회, {self._timeout:.0f}초 동안 바로 실패 처리")
+
+
+class CallGuard:
+    """호출 종류 하나의 보호 장치 - enter()로 들어가 exit()로 결과를 남김"""
+
+    def __init__(self, name, limit, breaker, wait_timeout=0.5):
+        self.name = name
+        self.limit = limit
+        self.breaker = breaker
+        self.wait_timeout = wait_timeout
+        self.rejected = {"open": 0, "saturated": 0}
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        metrics.upstream_rejections.inc(self.name, reason)
+        raise Unavailable(self.name, reason)
+
+    def enter(self, pace=None):
+        """호출 시작 - 막히면 Unavailable, 통과하면 시작 시각 반환
+
+        pace(토큰 버킷 대기)는 차단기 확인 뒤, 동시 호출 자리를 잡기 전에 부릅니다. 속도 제한 대기열에서
+        보낸 시간이 자리를 차지하거나 업스트림 지연으로 잡혀 한도를 줄이지 않도록 하기 위함입니다.
+        """
+        if not self.breaker.allow():
+            self._reject("open")
+        if pace is not None:
+            try:
+                pace()
+            except BaseException:
+                self.breaker.cancel()
+                raise
+        if not self.limit.acquire(self.wait_timeout):
+            self.breaker.cancel()
+            self._reject("saturated")
+        return time.perf_counter()
+
+    async def enter_async(self, pace=None):
+        """enter의 asyncio 버전 - pace는 코루틴 함수, 이벤트 루프를 막지 않도록 빈자리를 짧은 간격으로 확인"""
+        if not self.breaker.allow():
+            self._reject("open")
+        if pace is not None:
+            try:
+                await pace()
+            except BaseException:
+                self.breaker.cancel()
+                raise
+        deadline = time.monotonic() + self.wait_timeout
+        while not self.limit.try_acquire():
+            if time.monotonic() >= deadline:
+                self.breaker.cancel()
+                self._reject("saturated")
+            await asyncio.sleep(0.01)
+        return time.perf_counter()
+
+    def exit(self, started, outcome):
+        self.limit.release(time.perf_counter() - started, outcome)
+        if outcome == TOKEN_REJECTED:
+            self.breaker.cancel()  # 시험 호출이었다면 다음 호출이 다시 시험하도록
+        else:
+            self.breaker.record(outcome == OK)
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "limit": round(self.limit.limit, 2),
+            "inflight": self.limit.inflight,
+            "decreases": self.limit.decreases,
+            "opens": self.breaker.opens,
+            "rejected": dict(self.rejected)
+        }
+
+
+def build_guards():
+    """호출 종류별 보호 장치 - 환경 변수로 지연 목표, 대기 시간, 차단기 시간 조절"""
+    latency_target = float(os.getenv("KIS_GUARD_LATENCY_TARGET", "1.5"))
+    wait_timeout = float(os.getenv("KIS_GUARD_WAIT_SEC", "0.5"))
+    failures = os.getenv("KIS_BREAKER_FAILURES")
+    reset_timeout = float(os.getenv("KIS_BREAKER_RESET_SEC", "5"))
+    max_reset_timeout = float(os.getenv("KIS_BREAKER_MAX_RESET_SEC", "60"))
+
+    guards = {}
+    for name, spec in GUARD_CLASSES.items():
+        guards[name] = CallGuard(
+            name,
+            AdaptiveLimit(spec["initial"], maximum=spec["maximum"], latency_target=latency_target),
+            CircuitBreaker(name, int(failures) if failures else spec["failures"], reset_timeout, max_reset_timeout),
+            wait_timeout=wait_timeout
+        )
+    return guards
@@ -0,0 +1,334 @@
+"""KIS REST 스텁 서버 - 실계좌 키 없이 시세 경로를 돌려 보는 로컬 테스트/벤치마크용 서버
+
+    python -m services.kis_stub_server --port 18080 --latency 40 --jitter 20 --error-rate 0.01 --rate-limit 20
+
+앱은 KIS_BASE_URL=http://127.0.0.1:18080 (키는 아무 값)으로 연결합니다.
+조회는 이 서버가 발급한 토큰만 받고(그 밖에는 EGW00123), POST /_stub/expire-tokens로 발급한 토큰을 모두 만료시킵니다.
+가격은 종목 코드별 무작위 보행으로 호출마다 조금씩 움직이고, 경로별 호출 수는 GET /_stub/stats로 확인합니다.
+
+    --latency/--jitter  응답 지연 (ms, 평균/±폭)
+    --error-rate        이 비율만큼 503 응답 (전송 계층 재시도 대상)
+    --rate-limit        초당 호출 한도 - 넘으면 KIS와 같은 EGW00201 응답 (0이면 무제한)
+    --token-interval    토큰 발급 최소 간격(초) - 넘기면 EGW00133 응답 (0이면 제한 없음)
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 지수 코드 → 기준가 (전일 종가)
+_INDEX_BASE = {"0001": 2600.0, "1001": 850.0, "DJI": 39000.0, "PCOMP": 16500.0, "COMP": 16500.0, "SPX": 5200.0, "FX@KRW": 1380.0}
+
+
+class StubMarket:
+    """종목별 가격 상태 - 기준가(전일 종가)에서 호출마다 ±0.2% 이내로 움직임"""
+
+    def __init__(self, seed=None):
+        self._prices = {}
+        self._volumes = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def base(self, code, domestic):
+        if code in _INDEX_BASE:
+            return _INDEX_BASE[code]
+        crc = zlib.crc32(code.encode())
+        return float(1000 + crc % 200000) if domestic else round(20 + crc % 50000 / 100, 2)
+
+    def tick(self, code, domestic=True):
+        """(현재가, 전일 종가, 누적 거래량)"""
+        base = self.base(code, domestic)
+        with self._lock:
+            price = self._prices.get(code, base) * (1 + self._random.uniform(-0.002, 0.002))
+            price = min(max(price, base * 0.7), base * 1.3)
+            self._prices[code] = price
+            self._volumes[code] = self._volumes.get(code, 0) + self._random.randint(0, 5000)
+            return price, base, self._volumes[code]
+
+
+def _sign(change):
+    """KIS 전일대비 부호 - 2:상승, 3:보합, 5:하락"""
+    return "2" if change > 0 else "5" if change < 0 else "3"
+
+
+def domestic_price(market, params):
+    code = params.get("fid_input_iscd", "")
+    price, base, volume = market.tick(code)
+    price = int(round(price))
+    change = price - int(base)
+    return {
+        "stck_prpr": str(price), "hts_kor_isnm": f"종목{code}", "prdy_vrss": str(change),
+        "prdy_vrss_sign": _sign(change), "prdy_ctrt": f"{change / base * 100:.2f}",
+        "acml_vol": str(volume), "stck_hgpr": str(max(price, int(base))), "stck_lwpr": str(min(price, int(base))),
+        "stck_oprc": str(int(base)), "lstn_stcn": "100000000"
+    }
+
+
+def domestic_multi_price(market, params):
+    """관심종목(멀티종목) 시세 - FID_INPUT_ISCD_1..30 순서대로 행 반환"""
+    rows = []
+    for i in range(1, 31):
+        code = params.get(f"FID_INPUT_ISCD_{i}")
+        if not code:
+            break
+        price, base, volume = market.tick(code)
+        price = int(round(price))
+        change = price - int(base)
+        rows.append({
+            "inter_shrn_iscd": code, "inter_kor_isnm": f"종목{code}", "inter2_prpr": str(price),
+            "inter2_prdy_vrss": str(change), "prdy_vrss_sign": _sign(change), "prdy_ctrt": f"{change / base * 100:.2f}",
+            "acml_vol": str(volume), "inter2_oprc": str(int(base)), "inter2_hgpr": str(max(price, int(base))),
+            "inter2_lwpr": str(min(price, int(base))), "inter2_prdy_clpr": str(int(base))
+        })
+    return rows
+
+
+def domestic_index(market, params):
+    code = params.get("fid_input_iscd", "")
+    value, base, volume = market.tick(code)
+    change = value - base
+    return {
+        "bstp_nmix_prpr": f"{value:.2f}", "bstp_nmix_prdy_vrss": f"{change:.2f}",
+        "prdy_vrss_sign": _sign(change), "bstp_nmix_prdy_ctrt": f"{change / base * 100:.2f}",
+        "acml_vol": str(volume)
+    }
+
+
+def overseas_price(market, params):
+    symbol = params.get("SYMB", "")
+    price, base, volume = market.tick(symbol, domestic=False)
+    return {
+        "rsym": f"D{params.get('EXCD', '')}{symbol}", "name": symbol, "last": f"{price:.4f}", "base": f"{base:.4f}",
+        "diff": f"{price - base:.4f}", "rate": f"{(price - base) / base * 100:.2f}", "sign": _sign(price - base),
+        "tvol": str(volume), "open": f"{base:.4f}", "high": f"{max(price, base):.4f}", "low": f"{min(price, base):.4f}"
+    }
+
+
+def overseas_index(market, params):
+    """해외지수 기간별시세 - output1(현재값)과 output2(일봉)를 함께 반환"""
+    code = params.get("FID_INPUT_ISCD", "")
+    value, base, volume = market.tick(code, domestic=False)
+    change = value - base
+    return {
+        "output1": {
+            "ovrs_nmix_prpr": f"{value:.2f}", "ovrs_nmix_prdy_vrss": f"{change:.2f}",
+            "prdy_vrss_sign": _sign(change), "prdy_ctrt": f"{change / base * 100:.2f}",
+            "ovrs_nmix_prdy_clpr": f"{base:.2f}", "acml_vol": str(volume), "hts_kor_isnm": code
+        },
+        "output2": [{
+            "stck_bsop_date": params.get("FID_INPUT_DATE_2", ""), "ovrs_nmix_prpr": f"{value:.2f}",
+            "ovrs_nmix_oprc": f"{base:.2f}", "ovrs_nmix_hgpr": f"{max(value, base):.2f}",
+            "ovrs_nmix_lwpr": f"{min(value, base):.2f}", "acml_vol": str(volume)
+        }]
+    }
+
+
+# GET 경로 → output 생성 함수 (output1/output2로 나뉘는 TR은 응답 본문에 그대로 병합)
+ROUTES = {
+    "/uapi/domestic-stock/v1/quotations/inquire-price": domestic_price,
+    "/uapi/domestic-stock/v1/quotations/intstock-multprice": domestic_multi_price,
+    "/uapi/domestic-stock/v1/quotations/inquire-index-price": domestic_index,
+    "/uapi/overseas-price/v1/quotations/price": overseas_price,
+    "/uapi/overseas-price/v1/quotations/inquire-daily-chartprice": overseas_index,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive - 앱의 커넥션 풀 재사용을 그대로 측정
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_POST(self):
+        server = self.server
+        self._read_body()
+        path = urlparse(self.path).path
+        server.count(path)
+        if path == "/oauth2/tokenP":
+            self._send(*server.issue_token())
+        elif path == "/oauth2/Approval":
+            self._send(200, {"approval_key": "stub-approval-key"})
+        elif path == "/_stub/reset":
+            server.reset()
+            self._send(200, {"success": True})
+        elif path == "/_stub/expire-tokens":
+            server.expire_tokens()
+            self._send(200, {"success": True})
+        else:
+            self._send(404, {"rt_cd": "1", "msg_cd": "STUB0404", "msg1": f"지원하지 않는 경로: {path}"})
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path == "/_stub/stats":
+            self._send(200, server.stats())
+            return
+
+        server.count(url.path)
+        server.delay()
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send(404, {"rt_cd": "1", "msg_cd": "STUB0404", "msg1": f"지원하지 않는 경로: {url.path}"})
+            return
+        if not server.token_valid(self.headers.get("authorization")):
+            server.count("token_rejected")
+            self._send(500, {"rt_cd": "1", "msg_cd": "EGW00123", "msg1": "기간이 만료된 token 입니다."})
+            return
+        if not server.allow():
+            server.count("throttled")
+            self._send(500, {"rt_cd": "1", "msg_cd": "EGW00201", "msg1": "초당 거래건수를 초과하였습니다."})
+            return
+        if server.should_fail():
+            server.count("errors")
+            self._send(503, {"rt_cd": "1", "msg_cd": "STUB0503", "msg1": "스텁 서버 오류 주입"})
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        output = route(server.market, params)
+        payload = {"rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다."}
+        payload.update(output if isinstance(output, dict) and "output1" in output else {"output": output})
+        self._send(200, payload)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0.0,
+                 token_interval=60.0, seed=None):
+        super().__init__(address, StubHandler)
+        self.latency = latency          # 초
+        self.jitter = jitter            # 초
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit    # 초당 호출 수 (0이면 무제한)
+        self.token_interval = token_interval
+        self.market = StubMarket(seed)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = set()  # 발급한 토큰 - 그 밖의 토큰으로 오는 조회는 EGW00123
+        self.reset()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self._lock:
+            self.calls = Counter()
+            self.started = time.monotonic()
+            self._window = (int(time.monotonic()), 0)
+            self._last_token = None
+
+    def count(self, key):
+        with self._lock:
+            self.calls[key] += 1
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self._lock:
+                delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+    def allow(self):
+        """1초 고정 창 기준 호출 한도 확인"""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            second, used = self._window
+            now = int(time.monotonic())
+            if now != second:
+                second, used = now, 0
+            self._window = (second, used + 1)
+            return used < self.rate_limit
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def issue_token(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.token_interval and self._last_token is not None and now - self._last_token < self.token_interval:
+                return 403, {"error_code": "EGW00133", "error_description": "접근토큰 발급 잠시 후 다시 시도하세요(1분당 1회)"}
+            self._last_token = now
+            token = f"stub-{time.time_ns()}"
+            self._tokens.add(token)
+        return 200, {"access_token": token, "token_type": "Bearer", "expires_in": 86400,
+                     "access_token_token_expired": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() + 86400))}
+
+    def token_valid(self, authorization):
+        """이 서버가 발급했고 만료 처리하지 않은 토큰인지"""
+        token = (authorization or "").partition(" ")[2]
+        with self._lock:
+            return token in self._tokens
+
+    def expire_tokens(self):
+        """발급한 토큰을 모두 만료 처리 (토큰 거부 후 재발급 확인용)"""
+        with self._lock:
+            self._tokens.clear()
+            self._last_token = None
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            upstream = sum(count for key, count in self.calls.items() if key.startswith("/uapi/"))
+            return {
+                "calls": dict(self.calls),
+                "upstream": upstream,
+                "seconds": round(elapsed, 3),
+                "perSecond": round(upstream / elapsed, 2) if elapsed else 0.0
+            }
+
+
+def start_stub_server(host="127.0.0.1", port=0, **options):
+    """스텁 서버를 데몬 스레드로 시작 (port=0이면 빈 포트) - StubServer 반환"""
+    server = StubServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="kis-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KIS REST 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.0, help="평균 응답 지연(ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="지연 ±폭(ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 응답 비율 (0~1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="초당 호출 한도 (0이면 무제한)")
+    parser.add_argument("--token-interval", type=float, default=60.0, help="토큰 발급 최소 간격(초)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), latency=args.latency / 1000, jitter=args.jitter / 1000,
+                        error_rate=args.error_rate, rate_limit=args.rate_limit,
+                        token_interval=args.token_interval, seed=args.seed)
+    print(f"KIS 스텁 서버 시작: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
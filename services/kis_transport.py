@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services import metrics
+from services.kis_endpoints import loads
+
+DEFAULT_BASE_URL = "https://openapi.koreainvestment.com:9443"
+
+
+class KISResponse:
+    """KIS 응답 - HTTP 상태와 전송 계층이 한 번 파싱한 JSON 본문
+
+    requests 응답처럼 status_code와 json()을 제공하며, 본문이 JSON이 아니면 json()이 ValueError를 냅니다.
+    """
+    __slots__ = ("status_code", "headers", "body", "raw")
+
+    def __init__(self, raw, body):
+        self.raw = raw
+        self.status_code = raw.status_code
+        self.headers = raw.headers
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError(f"JSON 응답이 아닙니다 (HTTP {self.status_code})")
+        return self.body
+
+
+class KISTransport:
+    """KIS REST 호출용 HTTP 전송 계층 - keep-alive 커넥션 풀, 타임아웃, 백오프 재시도
+
+    스레드마다 별도 Session을 쓰되 같은 HTTPAdapter(커넥션 풀)를 공유하므로
+    쿠키/헤더 상태 경합 없이 TCP+TLS 연결을 재사용합니다.
+    base_url(KIS_BASE_URL)을 바꾸면 로컬 스텁 서버로 돌릴 수 있습니다.
+    """
+
+    def __init__(self, base_url=None, pool_size=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_factor=None, rate_limiter=None):
+        self.base_url = (base_url or os.getenv("KIS_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.pool_size = pool_size or int(os.getenv("KIS_HTTP_POOL_SIZE", "16"))
+        self.timeout = (
+            connect_timeout or float(os.getenv("KIS_CONNECT_TIMEOUT", "3")),
+            read_timeout or float(os.getenv("KIS_READ_TIMEOUT", "5"))
+        )
+        self.rate_limiter = rate_limiter
+
+        # 연결 오류는 모든 메서드, 응답 상태 재시도는 멱등한 GET만
+        retry = Retry(
+            total=max_retries if max_retries is not None else int(os.getenv("KIS_HTTP_RETRIES", "2")),
+            backoff_factor=backoff_factor if backoff_factor is not None else float(os.getenv("KIS_HTTP_BACKOFF", "0.3")),
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+            respect_retry_after_header=True
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            max_retries=retry
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """현재 스레드 전용 Session (커넥션 풀은 공유)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, path, throttle=True, **kwargs):
+        """KIS API 호출 - throttle이면 호출 전에 토큰 버킷으로 속도 조절
+
+        호출 시간과 rt_cd/msg_cd 오류를 지표로 남깁니다. 본문 JSON은 여기서 한 번만 (orjson이 있으면 orjson으로) 파싱해
+        KISResponse로 돌려주므로 호출 측에서 다시 파싱하지 않습니다.
+        """
+        if throttle and self.rate_limiter is not None:
+            wait = self.rate_limiter.acquire()
+            if wait > 0:
+                metrics.rate_limit_wait_seconds.observe(wait)
+        kwargs.setdefault("timeout", self.timeout)
+
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except Exception:
+            metrics.observe_upstream(path, "exception", time.perf_counter() - started, "exception", "exception")
+            raise
+
+        try:
+            body = loads(response.content)
+        except ValueError:
+            body = None
+        rt_cd = msg_cd = None
+        if isinstance(body, dict):
+            rt_cd, msg_cd = body.get("rt_cd"), body.get("msg_cd")
+            if rt_cd is None and body.get("error_code"):
+                rt_cd, msg_cd = "error", body["error_code"]  # oauth2 계열 오류 형식
+        if rt_cd is None and response.status_code >= 400:
+            rt_cd, msg_cd = "http", str(response.status_code)
+        metrics.observe_upstream(path, response.status_code, time.perf_counter() - started, rt_cd, msg_cd)
+        return KISResponse(response, body)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        """커넥션 풀 정리"""
+        self._adapter.close()
@@ -0,0 +1,32 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener = None
+
+
+def setup_logging(level=None):
+    """로그 설정 - 요청 스레드는 큐에 넣기만 하고 출력은 별도 스레드(QueueListener)가 담당
+
+    레벨은 LOG_LEVEL(기본 INFO)로 정하며, DEBUG 로그는 LOG_LEVEL=DEBUG일 때만 만들어집니다.
+    여러 번 호출해도 한 번만 설정합니다.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,49 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+KST = ZoneInfo("Asia/Seoul")
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def _local_hhmm(tz, now=None):
+    """해당 시간대 기준 (요일, HHMM) - 요일은 월요일=0 ... 일요일=6"""
+    local = (now or datetime.now(tz)).astimezone(tz)
+    return local.weekday(), local.hour * 100 + local.minute
+
+
+def is_korean_market_open(now=None):
+    """한국 시장 상태 (dashboard.js의 isKoreanMarketOpen과 같은 규칙)"""
+    weekday, current_time = _local_hhmm(KST, now)
+
+    # 주말 체크
+    if weekday >= 5:
+        return {"isOpen": False, "status": "주말 휴장"}
+
+    # 평일 시간 체크 (한국시간 09:00 - 15:30)
+    if 900 <= current_time < 1530:
+        return {"isOpen": True, "status": "장중"}
+    elif 800 <= current_time < 900:
+        return {"isOpen": False, "status": "장 시작 전"}
+    elif 1530 <= current_time < 1800:
+        return {"isOpen": False, "status": "장 마감"}
+    else:
+        return {"isOpen": False, "status": "장외시간"}
+
+
+def is_us_market_open(now=None):
+    """미국 시장 상태 (dashboard.js의 isUSMarketOpen과 같은 규칙)"""
+    weekday, current_time = _local_hhmm(NEW_YORK, now)
+
+    # 주말 체크
+    if weekday >= 5:
+        return {"isOpen": False, "status": "주말 휴장"}
+
+    # 평일 시간 체크 (미국 동부시간 9:30 AM - 4:00 PM)
+    if 930 <= current_time < 1600:
+        return {"isOpen": True, "status": "장중"}
+    elif 400 <= current_time < 930:
+        return {"isOpen": False, "status": "프리마켓"}
+    elif 1600 <= current_time < 2000:
+        return {"isOpen": False, "status": "애프터마켓"}
+    else:
+        return {"isOpen": False, "status": "장외시간"}
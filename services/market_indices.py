@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.kis_endpoints import DOMESTIC_INDEX, OVERSEAS_DAILY_INDEX, OVERSEAS_PRICE
+
+logger = logging.getLogger(__name__)
+
+# 지수 조회 방식
+#   domestic        국내 업종지수 현재가 (FHPUP02100000) - code: 업종코드
+#   overseas_price  해외 현재가 TR (HHDFS00000300) - exchange + code: KIS 심볼
+#   overseas_index  해외지수 기간별시세 (FHKST03030100) - code: 해외지수 코드 (예: SPX, .DJI)
+INDEX_KINDS = ("domestic", "overseas_price", "overseas_index")
+
+# 기본 지수 - MARKET_INDICES_FILE(JSON 목록)로 항목을 추가하거나 같은 key로 덮어쓸 수 있음
+#   [{"key": "sp500", "name": "S&P 500", "kind": "overseas_index", "code": "SPX"}]
+DEFAULT_MARKET_INDICES = [
+    {"key": "kospi", "name": "코스피", "kind": "domestic", "code": "0001"},
+    {"key": "kosdaq", "name": "코스닥", "kind": "domestic", "code": "1001"},
+    {"key": "dow", "name": "다우존스", "kind": "overseas_price", "exchange": "NYS", "code": "DJI"},
+    {"key": "nasdaq", "name": "나스닥", "kind": "overseas_price", "exchange": "NAS", "code": "PCOMP"},
+]
+
+
+def load_market_indices(path=None):
+    """지수 레지스트리 - 기본 지수에 설정 파일 항목을 key 기준으로 병합 (순서 유지)"""
+    entries = {entry["key"]: entry for entry in DEFAULT_MARKET_INDICES}
+    path = path if path is not None else os.getenv("MARKET_INDICES_FILE")
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    if entry.get("kind") not in INDEX_KINDS or not entry.get("key") or not entry.get("code"):
+                        logger.warning(f"잘못된 지수 설정을 건너뜁니다: {entry}")
+                        continue
+                    entries[entry["key"]] = dict(entry, name=entry.get("name", entry["key"]))
+        except (OSError, ValueError) as e:
+            logger.error(f"지수 설정 파일 로드 실패: {e}")
+    return list(entries.values())
+
+
+def index_request(entry):
+    """지수 항목 → (Endpoint, 파라미터 값)"""
+    kind = entry["kind"]
+    if kind == "domestic":
+        return DOMESTIC_INDEX, {"code": entry["code"]}
+    if kind == "overseas_price":
+        return OVERSEAS_PRICE, {"exchange": entry.get("exchange", "NAS"), "symbol": entry["code"]}
+    # 최근 1주 일봉을 요청하면 output1에 현재값/전일대비가 담겨 옴
+    today = datetime.now()
+    return OVERSEAS_DAILY_INDEX, {
+        "code": entry["code"],
+        "start": (today - timedelta(days=7)).strftime("%Y%m%d"),
+        "end": today.strftime("%Y%m%d")
+    }
+
+
+def _as_of(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+class IndexBoard:
+    """지수별 마지막 정상 값 보관 - 조회에 실패하거나 0이 온 지수는 이전 값을 stale로 표시해 유지
+
+    stale-while-revalidate: snapshot()은 값이 max_age보다 오래됐으면 백그라운드 갱신을 한 번만
+    시작하고 기다리지 않고 현재 값을 돌려줍니다. 값이 하나도 없을 때만 갱신을 기다립니다.
+    """
+
+    def __init__(self, max_age=10.0):
+        self.max_age = max_age
+        self._values = {}     # key -> (조회 시각 epoch, 지수 dict)
+        self._failed = set()  # 마지막 갱신에서 실패한 key
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self.updated = 0.0
+
+    def merge(self, results):
+        """갱신 결과 반영 - results는 {key: 지수 dict 또는 None}"""
+        now = time.time()
+        with self._lock:
+            for key, data in results.items():
+                if data:
+                    self._values[key] = (now, data)
+                    self._failed.discard(key)
+                else:
+                    self._failed.add(key)
+            self.updated = now
+
+    def result(self, keys=None):
+        """응답 형식 - {"success", "indices": {key: {..., asOf, stale}}, "asOf"}"""
+        now = time.time()
+        with self._lock:
+            indices = {}
+            for key, (fetched, data) in self._values.items():
+                if keys is not None and key not in keys:
+                    continue
+                stale = key in self._failed or now - fetched > self.max_age
+                indices[key] = dict(data, asOf=_as_of(fetched), stale=stale)
+            updated = self.updated
+        if not indices:
+            return {"success": False, "message": "지수 데이터를 가져오지 못했습니다"}
+        return {"success": True, "indices": indices, "asOf": _as_of(updated)}
+
+    def snapshot(self, refresh, keys=None):
+        """stale-while-revalidate 조회 - refresh()는 조회 결과를 merge하는 동기 함수"""
+        with self._lock:
+            empty = not self._values
+            expired = time.time() - self.updated > self.max_age
+
+        if empty:
+            refresh()
+        elif expired:
+            self._revalidate(refresh)
+        return self.result(keys)
+
+    def _revalidate(self, refresh):
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self._run_refresh, args=(refresh,),
+                                                name="index-revalidate", daemon=True)
+            self._refreshing.start()
+
+    def _run_refresh(self, refresh):
+        try:
+            refresh()
+        except Exception as e:
+            logger.error(f"지수 재검증 실패: {e}")
@@ -0,0 +1,452 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from services import kis_api_service, metrics
+from services.kis_api_service import (
+    get_domestic_stocks, get_overseas_stocks, get_all_market_indices, init_kis_api,
+    DOMESTIC_MAJOR_STOCKS, US_MAJOR_STOCKS
+)
+from services.kis_async_service import (
+    call_market_api, get_domestic_stocks_async, get_overseas_stocks_async, get_all_market_indices_async
+)
+from services.alert_engine import evaluate_quotes
+from services.history_store import record_quotes
+from services.indicators import get_indicator_engine, indicator_lookup, update_indicators
+from services.portfolio import revalue_portfolios
+from services import kis_realtime
+from services.kis_realtime import start_realtime_feed
+from services.market_hours import is_korean_market_open, is_us_market_open
+from services.quote_store import store_for_market
+from services.shared_state import get_cluster_state, get_leader_election, get_json, set_json
+from services.symbol_registry import get_symbol_registry, get_exchange_resolver
+
+logger = logging.getLogger(__name__)
+
+
+class PollJob:
+    """주기적으로 갱신할 스냅샷 한 종류 (국내 종목, 미국 종목, 지수 등)"""
+
+    def __init__(self, name, fetch, is_open):
+        self.name = name
+        self.fetch = fetch        # () -> {"success": ..., ...}
+        self.is_open = is_open    # () -> 장중 여부
+        self.next_run = 0.0
+
+
+class MarketDataPoller:
+    """KIS 시세를 일정 주기로 받아 최신 스냅샷을 메모리에 보관하는 백그라운드 갱신기
+
+    사용자 요청은 스냅샷만 읽으므로 업스트림 호출량은 접속자 수와 무관하게 일정합니다.
+    장중/장외 주기는 각 작업의 시장 운영 시간 기준으로 따로 적용됩니다.
+
+    election(리더 선출기)을 주면 리더만 업스트림을 조회해 스냅샷을 공유 상태에 올리고,
+    나머지 프로세스는 같은 주기로 공유 상태의 스냅샷을 읽어 리스너에 전달합니다.
+    """
+
+    def __init__(self, jobs, open_interval=10.0, closed_interval=60.0, listeners=None, on_start=None,
+                 shared=None, election=None, on_cycle=None):
+        self.jobs = jobs
+        self.on_start = on_start  # 갱신기 스레드에서 첫 갱신 전에 한 번 실행
+        self.on_cycle = on_cycle  # 매 주기 작업 실행 전에 호출
+        self.shared = shared
+        self.election = election
+        self.open_interval = open_interval
+        self.closed_interval = closed_interval
+        self.listeners = listeners if listeners is not None else []
+        self._snapshot = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def get(self, name):
+        """최신 스냅샷 조회 (아직 없으면 None)"""
+        return self._snapshot.get(name)
+
+    def seed(self, snapshots):
+        """이전 실행에서 복원한 스냅샷으로 빈 자리 채우기 - 리스너에는 알리지 않음 (이력/알림 중복 방지)"""
+        for name, snapshot in snapshots.items():
+            self._snapshot.setdefault(name, snapshot)
+
+    def snapshots(self):
+        return dict(self._snapshot)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="market-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """구독 종목이 늘었을 때 다음 주기를 기다리지 않고 모든 작업 즉시 실행"""
+        for job in self.jobs:
+            job.next_run = 0.0
+        self._wake.set()
+
+    def is_leader(self):
+        return self.election is None or self.election.is_leader()
+
+    def refresh(self, job):
+        """작업 하나를 즉시 실행 - 실패 시 이전 성공 스냅샷 유지, 조회 대상이 없으면(None) 건너뜀"""
+        if not self.is_leader():
+            return self.follow(job)
+
+        started = time.perf_counter()
+        try:
+            result = job.fetch()
+        except Exception as e:
+            metrics.poll_seconds.observe(time.perf_counter() - started, job.name, "error")
+            logger.error(f"시세 갱신 실패 ({job.name}): {e}")
+            return False
+
+        if result is None:
+            return False
+
+        metrics.poll_seconds.observe(time.perf_counter() - started, job.name, "ok" if result.get("success") else "error")
+        if not result.get("success"):
+            logger.error(f"시세 갱신 실패 ({job.name}): {result.get('message', '알 수 없는 오류')}")
+            return False
+
+        previous = self._snapshot.get(job.name)
+        current = dict(result, asOf=datetime.now().isoformat(timespec="seconds"))
+        self._snapshot[job.name] = current
+        if self.shared is not None:
+            try:
+                set_json(self.shared, f"snapshot:{job.name}", current, ttl=self.closed_interval * 3)
+            except Exception as e:
+                logger.error(f"공유 스냅샷 저장 실패 ({job.name}): {e}")
+        self._notify(job.name, previous, current)
+        return True
+
+    def follow(self, job):
+        """리더가 공유 상태에 올린 스냅샷 반영 - 새 스냅샷이 없으면 False"""
+        if self.shared is None:
+            return False
+        try:
+            current = get_json(self.shared, f"snapshot:{job.name}")
+        except Exception as e:
+            logger.error(f"공유 스냅샷 조회 실패 ({job.name}): {e}")
+            return False
+
+        previous = self._snapshot.get(job.name)
+        if current is None or (previous is not None and previous.get("asOf") == current.get("asOf")):
+            return False
+        self._snapshot[job.name] = current
+        self._notify(job.name, previous, current)
+        return True
+
+    def _notify(self, name, previous, current):
+        """스냅샷 갱신을 리스너에 전달 - (이름, 이전 스냅샷, 새 스냅샷)"""
+        for listener in self.listeners:
+            try:
+                listener(name, previous, current)
+            except Exception as e:
+                logger.error(f"스냅샷 리스너 오류 ({name}): {e}")
+
+    def _run(self):
+        if self.on_start is not None:
+            try:
+                self.on_start()
+            except Exception as e:
+                logger.error(f"갱신기 시작 작업 실패: {e}")
+
+        while not self._stop.is_set():
+            if self.on_cycle is not None:
+                try:
+                    self.on_cycle()
+                except Exception as e:
+                    logger.error(f"갱신 주기 작업 실패: {e}")
+
+            now = time.monotonic()
+            for job in self.jobs:
+                if job.next_run <= now:
+                    self.refresh(job)
+                    interval = self.open_interval if job.is_open() else self.closed_interval
+                    job.next_run = time.monotonic() + interval
+
+            next_run = min(job.next_run for job in self.jobs)
+            self._wake.wait(max(0.1, next_run - time.monotonic()))
+            self._wake.clear()
+
+
+def board_symbols(market):
+    """시세판(주요 종목) 구독 대상 - (market, symbol) 목록"""
+    if market == "domestic":
+        return [("domestic", code) for code in DOMESTIC_MAJOR_STOCKS]
+    return [("us", stock_info["symbol"]) for stock_info in US_MAJOR_STOCKS]
+
+
+def _cluster_demand():
+    """다른 프로세스가 공유 상태에 올린 구독 수요 - (그룹 집합, {market: [symbol]})"""
+    groups, symbols = set(), {}
+    if market_poller is None or market_poller.shared is None:
+        return groups, symbols
+    shared = market_poller.shared
+    for key in shared.keys(DEMAND_PREFIX):
+        demand = get_json(shared, key)
+        if not demand:
+            continue
+        groups.update(demand.get("groups", []))
+        for market, market_symbols in demand.get("symbols", {}).items():
+            symbols.setdefault(market, []).extend(market_symbols)
+    return groups, symbols
+
+
+def _has_group(group):
+    """이 프로세스나 다른 프로세스에 그룹 임대를 가진 세션이 있는지"""
+    return get_symbol_registry().has_group(group) or group in _cluster_demand()[0]
+
+
+def _active_symbols(market):
+    """이 프로세스와 다른 프로세스의 구독 종목 합집합 (최초 구독 순, 중복 제거)"""
+    symbols = get_symbol_registry().active(market) + _cluster_demand()[1].get(market, [])
+    return list(dict.fromkeys(symbols))
+
+
+_demand_published = 0.0
+
+def _publish_demand(force=False):
+    """리더가 아닌 프로세스는 자기 구독 수요를 공유 상태에 올림 (임대 TTL의 1/3 주기)"""
+    global _demand_published
+    if market_poller is None or market_poller.shared is None or market_poller.is_leader():
+        return
+    registry = get_symbol_registry()
+    if not force and time.monotonic() - _demand_published < registry.lease_ttl / 3:
+        return
+    _demand_published = time.monotonic()
+    set_json(market_poller.shared, DEMAND_PREFIX + market_poller.election.node_id,
+             registry.demand(), ttl=registry.lease_ttl)
+
+
+def _fetch_board(market):
+    """시세판을 보는 세션이 있을 때만 주요 종목 조회 (없으면 None)"""
+    if not _has_group(f"board:{market}"):
+        return None
+    if market == "domestic":
+        return call_market_api(get_domestic_stocks, get_domestic_stocks_async)
+    return call_market_api(get_overseas_stocks, get_overseas_stocks_async, "us")
+
+
+def _fetch_watch(market):
+    """관심종목 등 시세판 밖에서 구독 중인 종목 조회 (없으면 None)"""
+    board = {symbol for _, symbol in board_symbols(market)} if _has_group(f"board:{market}") else set()
+    symbols = [symbol for symbol in _active_symbols(market) if symbol not in board]
+    if not symbols:
+        return None
+    if market == "domestic":
+        return call_market_api(get_domestic_stocks, get_domestic_stocks_async, symbols)
+
+    # 미국 종목은 거래소 코드(NAS/NYS/AMS)를 판별해 조회
+    if not kis_api_service.kis_api and not init_kis_api():
+        return None
+    resolver = get_exchange_resolver()
+    stocks = []
+    for symbol in symbols:
+        exchange = resolver.resolve(symbol, kis_api_service.kis_api)
+        if exchange:
+            stocks.append({"symbol": symbol, "name": symbol, "exchange": exchange})
+    if not stocks:
+        return None
+    return call_market_api(get_overseas_stocks, get_overseas_stocks_async, "us", stocks)
+
+
+def _fetch_indices():
+    """대시보드를 보는 세션이 있을 때만 지수 조회 (없으면 None)"""
+    if not _has_group("indices"):
+        return None
+    return call_market_api(get_all_market_indices, get_all_market_indices_async)
+
+
+def _default_jobs():
+    """기본 갱신 대상 - 시세판 주요 종목, 관심종목, 4대 지수 (종목은 구독자가 있을 때만 조회)"""
+    korea_open = lambda: is_korean_market_open()["isOpen"]
+    us_open = lambda: is_us_market_open()["isOpen"]
+
+    return [
+        PollJob("domestic", lambda: _fetch_board("domestic"), korea_open),
+        PollJob("us", lambda: _fetch_board("us"), us_open),
+        PollJob("watch:domestic", lambda: _fetch_watch("domestic"), korea_open),
+        PollJob("watch:us", lambda: _fetch_watch("us"), us_open),
+        PollJob("indices", _fetch_indices, lambda: korea_open() or us_open()),
+    ]
+
+
+def _realtime_key(market, symbol):
+    """구독 레지스트리 키 → 실시간 구독 키 (미국은 판별된 거래소 코드, 모르면 None)"""
+    if market == "domestic":
+        return "domestic"
+    return get_exchange_resolver().known(symbol)
+
+
+def _start_realtime():
+    """실시간 체결 수신 시작 - 현재 구독 중인 종목으로 시작하고 이후 증감은 레지스트리 리스너가 반영"""
+    if os.getenv("KIS_REALTIME_ENABLED", "0") != "1":
+        return
+    if market_poller is not None and not market_poller.is_leader():
+        return
+    if not kis_api_service.kis_api and not init_kis_api():
+        return
+
+    symbols = []
+    for market in ("domestic", "us"):
+        for symbol in _active_symbols(market):
+            realtime_market = _realtime_key(market, symbol)
+            if realtime_market:
+                symbols.append((realtime_market, symbol))
+    start_realtime_feed(kis_api_service.kis_api, symbols)
+
+
+def _on_symbol_change(event, market, symbol):
+    """구독 종목 증감 - 새 종목은 즉시 조회하고 실시간 구독, 빠진 종목은 실시간 해지"""
+    if event == "add" and market_poller is not None:
+        _publish_demand(force=True)
+        market_poller.wake()
+
+    client = kis_realtime.realtime_client
+    realtime_market = _realtime_key(market, symbol)
+    if client is None or realtime_market is None:
+        return
+    if event == "add":
+        client.subscribe(realtime_market, symbol)
+    else:
+        client.unsubscribe(realtime_market, symbol)
+
+
+def _on_leadership(leader):
+    """리더가 되면 즉시 조회하고 실시간 수신 시작, 리더에서 내려오면 실시간 수신 중지"""
+    if market_poller is None:
+        return
+    if leader:
+        market_poller.wake()
+        _start_realtime()
+    elif kis_realtime.realtime_client is not None:
+        kis_realtime.realtime_client.stop()
+
+
+def _stock_market(name):
+    """스냅샷 이름 → 시장 ('domestic', 'watch:us' 등), 종목 스냅샷이 아니면 None"""
+    market = name.rsplit(":", 1)[-1]
+    return market if market in ("domestic", "us") else None
+
+
+def _update_quote_stores(name, previous, current):
+    """종목 스냅샷을 시장별 컬럼 저장소에 반영"""
+    store = store_for_market(name)
+    if store is not None:
+        for stock in current.get("stocks", []):
+            store.upsert(stock)
+
+
+def _record_history(name, previous, current):
+    """종목 스냅샷을 시계열 이력(분봉/일봉)에 틱으로 기록"""
+    market = _stock_market(name)
+    if market:
+        record_quotes(market, current.get("stocks", []))
+
+
+def _update_indicators(name, previous, current):
+    """종목 스냅샷을 기술적 지표 엔진에 반영"""
+    market = _stock_market(name)
+    if market:
+        update_indicators(market, current.get("stocks", []))
+
+
+def _evaluate_alerts(name, previous, current):
+    """종목 스냅샷으로 가격/거래량/RSI 알림 평가 (RSI는 직전 리스너가 갱신한 지표 값)"""
+    market = _stock_market(name)
+    if market:
+        evaluate_quotes(current.get("stocks", []), indicator_lookup(market))
+
+
+def _revalue_portfolios(name, previous, current):
+    """종목 스냅샷 시세로 전 사용자 포트폴리오 재평가"""
+    market = _stock_market(name)
+    if market:
+        revalue_portfolios(market, current.get("stocks", []))
+
+
+DEMAND_PREFIX = "demand:"
+
+market_poller = None
+_poller_lock = threading.Lock()
+_seed_snapshots = {}  # 갱신기 생성 전에 복원된 웜 스타트 스냅샷
+_snapshot_listeners = [_update_quote_stores, _record_history, _update_indicators, _evaluate_alerts, _revalue_portfolios]
+
+def add_snapshot_listener(listener):
+    """스냅샷 갱신 리스너 등록 - listener(name, previous, current)는 갱신기 스레드에서 호출됨"""
+    _snapshot_listeners.append(listener)
+
+def start_market_poller():
+    """백그라운드 갱신기 시작 (중복 호출 시 기존 인스턴스 유지)"""
+    global market_poller
+
+    if os.getenv("MARKET_POLLER_ENABLED", "1") == "0":
+        return None
+
+    with _poller_lock:
+        if market_poller is None:
+            get_symbol_registry().listeners.append(_on_symbol_change)
+            # 공유 백엔드가 설정된 경우에만 리더 선출 (단일 프로세스면 항상 직접 조회)
+            shared = get_cluster_state()
+            election = get_leader_election() if shared is not None else None
+            market_poller = MarketDataPoller(
+                _default_jobs(),
+                open_interval=float(os.getenv("MARKET_POLL_OPEN_SEC", "10")),
+                closed_interval=float(os.getenv("MARKET_POLL_CLOSED_SEC", "60")),
+                listeners=_snapshot_listeners,
+                on_start=_start_realtime,
+                shared=shared,
+                election=election,
+                on_cycle=_publish_demand
+            )
+            if election is not None:
+                election.listeners.append(_on_leadership)
+            market_poller.seed(_seed_snapshots)
+        market_poller.start()
+    return market_poller
+
+def seed_snapshots(snapshots):
+    """웜 스타트 스냅샷 등록 - 갱신기가 아직 없으면 생성 시 반영"""
+    with _poller_lock:
+        _seed_snapshots.update(snapshots)
+        if market_poller is not None:
+            market_poller.seed(snapshots)
+
+def current_snapshots():
+    """갱신기가 보관 중인 스냅샷 전체 (갱신기가 아직 없으면 복원된 웜 스타트 스냅샷)"""
+    return market_poller.snapshots() if market_poller is not None else dict(_seed_snapshots)
+
+def get_market_json(name):
+    """시장 종목 응답 JSON 바이트 - 컬럼 저장소에서 바로 직렬화, 종목마다 지표 포함 (스냅샷이 없으면 None)"""
+    snapshot = get_market_snapshot(name)
+    store = store_for_market(name)
+    if not snapshot or store is None or not len(store):
+        return None
+    extra = {"success": True, "asOf": snapshot.get("asOf")}
+    if snapshot.get("stale"):
+        extra["stale"] = True
+    return store.to_json(extra, suffixes=get_indicator_engine().fragments(name))
+
+def get_market_snapshot(name):
+    """최신 스냅샷 조회 - 갱신기는 첫 조회 시 지연 시작 (스냅샷이 없으면 None)"""
+    poller = market_poller if market_poller is not None and market_poller.is_running() else start_market_poller()
+    return poller.get(name) if poller else None
+
+def get_watched_quote(market, ticker):
+    """구독 중인 종목의 최신 시세 - 관심종목 스냅샷, 시세판 저장소 순으로 조회 (없으면 None)"""
+    snapshot = market_poller.get(f"watch:{market}") if market_poller is not None else None
+    for stock in (snapshot or {}).get("stocks", []):
+        if stock["ticker"] == ticker:
+            return stock
+    store = store_for_market(market)
+    return store.get(ticker) if store is not None else None
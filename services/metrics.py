@@ -0,0 +1,196 @@
+"""프로세스 내 지표 수집과 Prometheus 텍스트 형식 출력 (외부 의존성 없음)
+
+지표는 모듈 수준에서 한 번 정의하고 핫패스에서는 observe/inc만 호출합니다.
+라벨 조합별 값은 dict 하나와 잠금 하나로 관리해 호출당 비용이 사전 조회 몇 번 수준입니다.
+캐시 적중률처럼 다른 객체가 이미 세고 있는 값은 collector 콜백으로 출력 시점에 읽습니다.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# 지연 히스토그램 기본 구간 (초)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """단조 증가 카운터"""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _label_text(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """현재 값 - set으로 덮어씀"""
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """누적 구간 히스토그램 - 구간별 개수, 합계, 전체 개수"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # 라벨 값 -> [구간별 개수..., +Inf 개수, 합계]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, *label_values):
+        """with 블록 실행 시간 기록"""
+        return _Timer(self, label_values)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        samples = []
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", _label_text(self.labels, key, f'le="{_number(bound)}"'), cumulative))
+            samples.append((f"{self.name}_sum", _label_text(self.labels, key), entry[-1]))
+            samples.append((f"{self.name}_count", _label_text(self.labels, key), cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+
+
+class Registry:
+    """지표 목록과 출력 시점 collector - collector()는 (이름, 종류, 설명, [(라벨 dict, 값)]) 목록 반환"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        """Prometheus 텍스트 형식 (0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector 오류: {_escape(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_label_text(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP (Flask 라우트 단위)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP 요청 처리 시간", ("endpoint", "method", "status"))
+
+# KIS 업스트림
+upstream_request_seconds = registry.histogram(
+    "kis_upstream_request_duration_seconds", "KIS API 호출 시간", ("path", "status"))
+upstream_errors = registry.counter(
+    "kis_upstream_errors_total", "KIS API 오류 응답 수 (rt_cd/msg_cd 기준, 연결 오류는 msg_cd=exception)",
+    ("path", "rt_cd", "msg_cd"))
+upstream_rejections = registry.counter(
+    "kis_upstream_rejections_total", "보호 장치가 보내지 않고 바로 실패 처리한 KIS 호출 수 (open/saturated)",
+    ("group", "reason"))
+rate_limit_wait_seconds = registry.histogram(
+    "kis_rate_limit_wait_seconds", "호출 속도 제한(토큰 버킷) 대기 시간",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+# 토큰
+token_refresh_events = registry.counter(
+    "kis_token_refresh_total", "토큰 발급 시도 결과 (success/failure/rate_limited/adopted/rejected)", ("result",))
+
+# 백그라운드 갱신기
+poll_seconds = registry.histogram(
+    "market_poll_duration_seconds", "스냅샷 작업 한 번 실행 시간", ("job", "result"))
+
+
+def observe_upstream(path, status, seconds, rt_cd=None, msg_cd=None):
+    """업스트림 응답 한 건 기록 - rt_cd가 '0'이 아니면 오류로 계수"""
+    upstream_request_seconds.observe(seconds, path, str(status))
+    if rt_cd is not None and rt_cd != "0":
+        upstream_errors.inc(path, rt_cd, msg_cd or "")
+
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,432 @@
+"""사용자별 보유 종목과 포트폴리오 평가 - 원화/달러 보유분을 원화로 환산해 손익과 비중 계산
+
+보유 종목은 평균단가법으로 관리하고(매도 시 실현손익 누적) JSON 파일에 저장합니다.
+평가는 모든 사용자의 보유 종목을 한 줄씩 펼친 컬럼 배열(사용자 번호, 종목 번호, 수량, 평균단가,
+실현손익, 달러 여부) 위에서 한 번에 계산하고, 사용자별 합계는 사용자 번호로 묶어 더합니다.
+NumPy가 있으면 배열 연산(bincount)으로, 없으면 같은 계산을 순수 파이썬 루프로 처리합니다.
+
+평가금액과 원가는 현재 환율로 원화 환산하고, 실현손익은 매도 시점 환율로 환산한 원화 금액을 누적해
+두므로 환율이 바뀌어도 달라지지 않습니다. 일간 변동은 종목의 전일대비 × 수량입니다.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # NumPy가 없으면 순수 파이썬으로 평가
+    np = None
+
+from services import kis_api_service
+
+logger = logging.getLogger(__name__)
+
+TRADE_SIDES = ("buy", "sell")
+CURRENCIES = {"domestic": "KRW", "us": "USD"}
+
+
+class ExchangeRate:
+    """원/달러 환율 캐시 - ttl초마다 fetch()로 다시 받고, 실패하면 마지막 값(없으면 기본값)을 stale로 사용
+
+    재시도 간격(_checked)과 마지막 성공 시각(_fetched)을 따로 두어, 갱신에 실패한 뒤에는 다음 재시도까지
+    이전 값을 stale로 표시합니다. 조회는 만료를 처음 본 호출 하나만 잠금 밖에서 하고, 그동안 다른 호출은
+    기다리지 않고 이전 값(없으면 기본값)을 stale로 받습니다 (IndexBoard와 같은 stale-while-revalidate).
+    """
+
+    def __init__(self, fetch, ttl=600.0, default=1400.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.rate = None
+        self.as_of = None
+        self.default = default
+        self._checked = None   # 마지막 조회 시도 (monotonic)
+        self._fetched = None   # 마지막 조회 성공 (monotonic)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """{"rate", "asOf", "stale"} - 만료됐으면 먼저 갱신 시도 (다른 호출이 갱신 중이면 기다리지 않음)"""
+        with self._lock:
+            now = time.monotonic()
+            due = self._checked is None or now - self._checked >= self.ttl
+            if due:
+                self._checked = now  # 조회하는 동안 다른 호출은 만료로 보지 않고 이전 값을 stale로 받음
+
+        if due:
+            try:
+                rate = self.fetch()
+            except Exception as e:
+                logger.error(f"환율 조회 실패: {e}")
+                rate = None
+            if rate:
+                with self._lock:
+                    self.rate = rate
+                    self.as_of = datetime.now().isoformat(timespec="seconds")
+                    self._fetched = now
+
+        with self._lock:
+            if self.rate is None:
+                return {"rate": self.default, "asOf": None, "stale": True}
+            return {"rate": self.rate, "asOf": self.as_of, "stale": now - self._fetched >= self.ttl}
+
+
+def _fetch_usd_krw():
+    """KIS 클라이언트로 원/달러 환율 조회 - 클라이언트가 아직 없으면 None (초기화는 여기서 하지 않음)"""
+    api = kis_api_service.kis_api
+    return api.get_exchange_rate() if api is not None else None
+
+
+def _valuate_numpy(layout, prices, changes, fx_rate):
+    """컬럼 배열 평가 (NumPy) - 종목 번호로 가격을 모아 곱하고 사용자 번호로 합산"""
+    user, symbol = layout["user"], layout["symbol"]
+    quantity, avg_cost, realized = layout["quantity"], layout["avgCost"], layout["realized"]
+    price = np.asarray(prices, dtype=np.float64)[symbol]
+    change = np.asarray(changes, dtype=np.float64)[symbol]
+    priced = ~np.isnan(price)
+    # 시세를 아직 모르는 종목은 평균단가로 평가 (평가손익 0, 일간 변동 0)
+    price = np.where(priced, price, avg_cost)
+    change = np.where(priced, change, 0.0)
+    fx = np.where(layout["usd"], fx_rate, 1.0)
+
+    value = quantity * price * fx
+    cost = quantity * avg_cost * fx
+    day = quantity * change * fx
+    users = len(layout["users"])
+    totals = {
+        "value": np.bincount(user, weights=value, minlength=users),
+        "cost": np.bincount(user, weights=cost, minlength=users),
+        "day": np.bincount(user, weights=day, minlength=users),
+        "realized": np.bincount(user, weights=realized, minlength=users),
+    }
+    user_value = totals["value"][user]
+    allocation = np.divide(value, user_value, out=np.zeros_like(value), where=user_value > 0)
+    return {
+        "price": price, "change": change, "priced": priced, "value": value, "cost": cost,
+        "day": day, "realized": realized, "allocation": allocation
+    }, totals
+
+
+def _valuate_python(layout, prices, changes, fx_rate):
+    """_valuate_numpy와 같은 계산을 순수 파이썬으로"""
+    users = len(layout["users"])
+    totals = {key: [0.0] * users for key in ("value", "cost", "day", "realized")}
+    total_value, total_cost, total_day, total_realized = (totals[key] for key in ("value", "cost", "day", "realized"))
+    rows = {key: [] for key in ("price", "change", "priced", "value", "cost", "day", "realized")}
+    add_price, add_change, add_priced, add_value, add_cost, add_day, add_realized = (
+        rows[key].append for key in ("price", "change", "priced", "value", "cost", "day", "realized"))
+    for user, symbol, quantity, avg_cost, realized, usd in zip(
+            layout["user"], layout["symbol"], layout["quantity"], layout["avgCost"], layout["realized"], layout["usd"]):
+        price, change = prices[symbol], changes[symbol]
+        priced = price == price  # NaN이면 시세 없음
+        if not priced:
+            price, change = avg_cost, 0.0
+        fx = fx_rate if usd else 1.0
+        value, cost, day = quantity * price * fx, quantity * avg_cost * fx, quantity * change * fx
+        total_value[user] += value
+        total_cost[user] += cost
+        total_day[user] += day
+        total_realized[user] += realized
+        add_price(price)
+        add_change(change)
+        add_priced(priced)
+        add_value(value)
+        add_cost(cost)
+        add_day(day)
+        add_realized(realized)
+    rows["allocation"] = [
+        value / total_value[user] if total_value[user] > 0 else 0.0
+        for user, value in zip(layout["user"], rows["value"])
+    ]
+    return rows, totals
+
+
+class PortfolioEngine:
+    """사용자별 보유 종목 저장소와 포트폴리오 평가기
+
+    보유 종목이 바뀌면 컬럼 배치를 다시 만들고, 시세 스냅샷마다 revalue()로 전 사용자를 한 번에
+    다시 평가합니다. summary()는 마지막 평가 결과에서 해당 사용자 구간만 꺼내 응답을 만듭니다.
+    """
+
+    def __init__(self, path, exchange_rate=None):
+        self.path = path
+        # user -> {ticker: {"ticker", "name", "market", "quantity", "avgCost", "realized", "realizedKrw"}}
+        # realized는 종목 통화, realizedKrw는 매도 시점 환율로 환산한 원화 누적
+        self.holdings = {}
+        self.exchange_rate = exchange_rate or ExchangeRate(_fetch_usd_krw)
+        self._prices = {}    # (market, ticker) -> (현재가, 전일대비) - 종목 통화 기준
+        self._lock = threading.RLock()
+        self._layout = None  # 보유 종목이 바뀌면 None
+        self._result = None  # 마지막 평가 결과
+        self._dirty = True
+        self.revaluations = 0
+        self.last_seconds = 0.0
+        self._load()
+
+    # 저장/로드
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"보유 종목 저장 파일 로드 실패: {e}")
+            return
+        self.holdings = data.get("holdings", {})
+        for positions in self.holdings.values():
+            for holding in positions.values():
+                if "realizedKrw" not in holding:
+                    # 매도 시점 환율을 알 수 없는 이전 기록은 기본 환율로 한 번 환산해 고정
+                    fx = self.exchange_rate.default if CURRENCIES[holding["market"]] == "USD" else 1.0
+                    holding["realizedKrw"] = holding["realized"] * fx
+
+    def _save(self):
+        """임시 파일에 쓰고 교체 (호출 측에서 잠금 보유)"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"holdings": self.holdings}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # 보유 종목
+
+    def list_holdings(self, user):
+        return [dict(holding) for holding in self.holdings.get(user, {}).values()]
+
+    def record_trade(self, user, ticker, side, quantity, price, name=None, market=None, fx_rate=None):
+        """매수/매도 한 건 반영 - 평균단가법, 매도분은 (매도가 - 평균단가) × 수량을 실현손익에 누적
+
+        달러 종목 매도는 fx_rate(기본: 현재 환율)로 원화 실현손익을 함께 누적합니다.
+        잘못된 입력(수량/가격 0 이하, 보유 수량 초과 매도 등)이면 ValueError
+        """
+        if side not in TRADE_SIDES:
+            raise ValueError(f"지원하지 않는 거래 유형입니다: {side}")
+        quantity, price = float(quantity), float(price)
+        if quantity <= 0 or price <= 0:
+            raise ValueError("수량과 가격은 0보다 커야 합니다")
+
+        if side == "sell" and fx_rate is None:
+            holding = self.holdings.get(user, {}).get(ticker)
+            if holding is not None and CURRENCIES[holding["market"]] == "USD":
+                # 환율 조회(만료 시 KIS 호출)는 잠금 밖에서
+                fx_rate = self.exchange_rate.get()["rate"]
+
+        with self._lock:
+            holding = self.holdings.get(user, {}).get(ticker)
+            if holding is None:
+                if side == "sell":
+                    raise ValueError("보유하지 않은 종목입니다")
+                market = market or ("domestic" if ticker.isdigit() else "us")
+                if market not in CURRENCIES:
+                    raise ValueError(f"지원하지 않는 시장입니다: {market}")
+                holding = self.holdings.setdefault(user, {})[ticker] = {
+                    "ticker": ticker, "name": name or ticker, "market": market,
+                    "quantity": 0.0, "avgCost": 0.0, "realized": 0.0, "realizedKrw": 0.0
+                }
+
+            if side == "buy":
+                total = holding["quantity"] + quantity
+                holding["avgCost"] = (holding["avgCost"] * holding["quantity"] + price * quantity) / total
+                holding["quantity"] = total
+            else:
+                if quantity > holding["quantity"] + 1e-9:
+                    raise ValueError(f"보유 수량({holding['quantity']:g})보다 많이 매도할 수 없습니다")
+                realized = (price - holding["avgCost"]) * quantity
+                holding["realized"] += realized
+                if CURRENCIES[holding["market"]] == "USD":
+                    holding["realizedKrw"] += realized * (fx_rate or self.exchange_rate.default)
+                else:
+                    holding["realizedKrw"] += realized
+                holding["quantity"] = max(0.0, holding["quantity"] - quantity)
+            holding["updatedAt"] = time.time()
+
+            self._layout = None
+            self._dirty = True
+            self._save()
+            return dict(holding)
+
+    def remove_holding(self, user, ticker):
+        with self._lock:
+            positions = self.holdings.get(user, {})
+            if ticker not in positions:
+                return False
+            del positions[ticker]
+            if not positions:
+                del self.holdings[user]
+            self._layout = None
+            self._dirty = True
+            self._save()
+            return True
+
+    def symbols(self):
+        """보유 중인 (market, ticker) 집합"""
+        with self._lock:
+            return {(h["market"], h["ticker"]) for positions in self.holdings.values() for h in positions.values()}
+
+    # 평가
+
+    def update_prices(self, market, quotes):
+        """시세 목록 반영 (보유 종목만) - 값이 바뀐 종목이 있으면 True"""
+        changed = False
+        with self._lock:
+            held = self._layout_for_update()["symbolIndex"]
+            for quote in quotes:
+                if not quote or (market, quote["ticker"]) not in held:
+                    continue
+                key = (market, quote["ticker"])
+                value = (float(quote.get("price") or 0), float(quote.get("change") or 0))
+                if value[0] > 0 and self._prices.get(key) != value:
+                    self._prices[key] = value
+                    changed = True
+            if changed:
+                self._dirty = True
+        return changed
+
+    def _layout_for_update(self):
+        with self._lock:
+            if self._layout is None:
+                self._layout = self._build_layout()
+            return self._layout
+
+    def _build_layout(self):
+        """보유 종목을 사용자 순으로 펼친 컬럼 배치 - 사용자별 행 구간(offsets)과 종목 번호 포함"""
+        users, offsets, symbol_index = [], {}, {}
+        columns = {key: [] for key in ("user", "symbol", "quantity", "avgCost", "realized", "usd")}
+        rows = []
+        for user, positions in self.holdings.items():
+            start = len(rows)
+            for holding in positions.values():
+                key = (holding["market"], holding["ticker"])
+                columns["user"].append(len(users))
+                columns["symbol"].append(symbol_index.setdefault(key, len(symbol_index)))
+                columns["quantity"].append(holding["quantity"])
+                columns["avgCost"].append(holding["avgCost"])
+                columns["realized"].append(holding["realizedKrw"])
+                columns["usd"].append(CURRENCIES[holding["market"]] == "USD")
+                rows.append(holding)
+            offsets[user] = (len(users), start, len(rows))
+            users.append(user)
+
+        has_usd = any(columns["usd"])
+        if np is not None:
+            columns = {
+                "user": np.asarray(columns["user"], dtype=np.intp),
+                "symbol": np.asarray(columns["symbol"], dtype=np.intp),
+                "quantity": np.asarray(columns["quantity"], dtype=np.float64),
+                "avgCost": np.asarray(columns["avgCost"], dtype=np.float64),
+                "realized": np.asarray(columns["realized"], dtype=np.float64),
+                "usd": np.asarray(columns["usd"], dtype=bool),
+            }
+        return dict(columns, users=users, offsets=offsets, symbolIndex=symbol_index,
+                    symbols=list(symbol_index), rows=rows, hasUsd=has_usd)
+
+    def revalue(self, force=False):
+        """전 사용자 재평가 - 시세/보유 종목이 바뀌지 않았으면 건너뜀"""
+        if not (force or self._dirty) and self._result is not None:
+            return False
+        # 환율 조회(만료 시 KIS 호출)는 잠금 밖에서 - 평가 중에 다른 요청이 기다리지 않게
+        fx = self.exchange_rate.get() if self._layout_for_update()["hasUsd"] else {"rate": 1.0, "asOf": None, "stale": False}
+        with self._lock:
+            started = time.perf_counter()
+            layout = self._layout_for_update()
+            nan = float("nan")
+            prices = [self._prices.get(key, (nan, 0.0))[0] for key in layout["symbols"]]
+            changes = [self._prices.get(key, (nan, 0.0))[1] for key in layout["symbols"]]
+            valuate = _valuate_numpy if np is not None else _valuate_python
+            rows, totals = valuate(layout, prices, changes, fx["rate"])
+            self._result = {
+                "layout": layout, "rows": rows, "totals": totals, "fx": fx,
+                "asOf": datetime.now().isoformat(timespec="seconds")
+            }
+            self._dirty = False
+            self.revaluations += 1
+            self.last_seconds = time.perf_counter() - started
+            return True
+
+    def summary(self, user):
+        """사용자 포트폴리오 응답 - 원화 기준 평가금액, 평가/실현손익, 일간 변동, 종목별 비중"""
+        self.revalue()
+        result = self._result
+        layout = result["layout"]
+        if user not in layout["offsets"]:
+            return {"positions": [], "totalValue": 0.0, "totalCost": 0.0, "unrealized": 0.0, "unrealizedPercent": 0.0,
+                    "realized": 0.0, "dayChange": 0.0, "dayChangePercent": 0.0, "fx": result["fx"], "asOf": result["asOf"]}
+
+        index, start, end = layout["offsets"][user]
+        rows, totals = result["rows"], result["totals"]
+        positions = []
+        for i in range(start, end):
+            holding = layout["rows"][i]
+            value, cost = float(rows["value"][i]), float(rows["cost"][i])
+            positions.append({
+                "ticker": holding["ticker"],
+                "name": holding["name"],
+                "market": holding["market"],
+                "currency": CURRENCIES[holding["market"]],
+                "quantity": holding["quantity"],
+                "avgCost": round(holding["avgCost"], 4),
+                "price": float(rows["price"][i]),
+                "priced": bool(rows["priced"][i]),
+                "marketValue": round(value, 2),
+                "unrealized": round(value - cost, 2),
+                "unrealizedPercent": round((value - cost) / cost * 100, 2) if cost else 0.0,
+                "realized": round(float(rows["realized"][i]), 2),
+                "realizedLocal": round(holding["realized"], 4),  # 종목 통화 기준
+                "dayChange": round(float(rows["day"][i]), 2),
+                "allocation": round(float(rows["allocation"][i]) * 100, 2),
+            })
+
+        value, cost = float(totals["value"][index]), float(totals["cost"][index])
+        day = float(totals["day"][index])
+        return {
+            "positions": positions,
+            "totalValue": round(value, 2),
+            "totalCost": round(cost, 2),
+            "unrealized": round(value - cost, 2),
+            "unrealizedPercent": round((value - cost) / cost * 100, 2) if cost else 0.0,
+            "realized": round(float(totals["realized"][index]), 2),
+            "dayChange": round(day, 2),
+            "dayChangePercent": round(day / (value - day) * 100, 2) if value - day else 0.0,
+            "fx": result["fx"],
+            "asOf": result["asOf"]
+        }
+
+    def stats(self):
+        layout = self._layout_for_update()
+        return {"users": len(layout["users"]), "positions": len(layout["rows"]), "symbols": len(layout["symbols"]),
+                "revaluations": self.revaluations, "lastMs": round(self.last_seconds * 1000, 3),
+                "vectorized": np is not None}
+
+
+portfolio_engine = None
+_engine_lock = threading.Lock()
+
+def get_portfolio_engine():
+    """프로세스 공용 포트폴리오 엔진 (PORTFOLIO_FILE, 기본 data/portfolio.json)"""
+    global portfolio_engine
+    with _engine_lock:
+        if portfolio_engine is None:
+            portfolio_engine = PortfolioEngine(
+                os.getenv("PORTFOLIO_FILE", os.path.join("data", "portfolio.json")),
+                ExchangeRate(
+                    _fetch_usd_krw,
+                    ttl=float(os.getenv("PORTFOLIO_FX_TTL", "600")),
+                    default=float(os.getenv("PORTFOLIO_DEFAULT_USDKRW", "1400"))
+                )
+            )
+    return portfolio_engine
+
+def revalue_portfolios(market, quotes):
+    """시세 갱신 반영 - 보유 종목 시세가 바뀌었으면 전 사용자 재평가 (보유 종목이 없으면 바로 반환)"""
+    engine = portfolio_engine or get_portfolio_engine()
+    if not engine.holdings:
+        return
+    if engine.update_prices(market, quotes):
+        engine.revalue()
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """진행 중인 업스트림 호출 - 같은 키의 동시 요청이 결과를 공유"""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    """(market, symbol) 키 기반 프로세스 공용 시세 캐시 (TTL + LRU + single-flight)
+
+    캐시된 값은 여러 요청이 공유하므로 호출자는 반환된 dict를 수정하지 않아야 합니다.
+    shared(공유 상태 백엔드)를 주면 로컬 미스 시 다른 프로세스가 받아 둔 값을 먼저 확인하고,
+    직접 받은 값은 공유 상태에도 올려 프로세스 수만큼 업스트림 호출이 늘지 않게 합니다.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=2048, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()  # (market, symbol) -> (만료시각, 값)
+        self._inflight = {}
+        self._async_inflight = {}  # asyncio 호출자용 (이벤트 루프 하나 기준)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    def get(self, market, symbol):
+        """유효한 캐시 값 조회 (없거나 만료되면 None)"""
+        key = (market, symbol)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def set(self, market, symbol, value):
+        """캐시 값 저장 - 최대 개수 초과 시 가장 오래 사용되지 않은 항목 제거"""
+        with self._lock:
+            self._store((market, symbol), value)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _shared_key(self, key):
+        return f"quote:{key[0]}:{key[1]}"
+
+    def _load_shared(self, key):
+        """공유 상태에서 값 조회 (없거나 실패하면 None)"""
+        if self.shared is None:
+            return None
+        try:
+            data = self.shared.get(self._shared_key(key))
+        except Exception as e:
+            logger.error(f"공유 시세 조회 실패 ({key[1]}): {e}")
+            return None
+        if data is None:
+            return None
+        self.shared_hits += 1
+        return json.loads(data)
+
+    def _publish_shared(self, key, value):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(self._shared_key(key), json.dumps(value, ensure_ascii=False).encode("utf-8"), self.ttl)
+        except Exception as e:
+            logger.error(f"공유 시세 저장 실패 ({key[1]}): {e}")
+
+    def invalidate(self, market=None, symbol=None):
+        """특정 키 또는 전체 캐시 무효화"""
+        with self._lock:
+            if market is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((market, symbol), None)
+
+    def get_or_load(self, market, symbol, loader):
+        """캐시 조회 후 미스면 loader() 호출 - 동시 미스는 하나의 업스트림 호출로 합침
+
+        loader가 None을 반환하면(조회 실패) 캐시에 저장하지 않습니다.
+        """
+        key = (market, symbol)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                is_leader = False
+            else:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self.misses += 1
+                is_leader = True
+
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._load_shared(key)
+            if flight.value is None:
+                flight.value = loader()
+                if flight.value is not None:
+                    self._publish_shared(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and flight.value is not None:
+                    self._store(key, flight.value)
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+        return flight.value
+
+    async def get_or_load_async(self, market, symbol, loader):
+        """get_or_load의 asyncio 버전 - loader는 코루틴 함수, 동시 미스는 하나의 Task를 공유"""
+        key = (market, symbol)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            task = self._async_inflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(self._load_async(key, loader))
+                self._async_inflight[key] = task
+                self.misses += 1
+
+        # 한 호출자가 취소되어도 공유 Task는 계속 진행
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, loader):
+        value = None
+        try:
+            value = self._load_shared(key)
+            if value is None:
+                value = await loader()
+                if value is not None:
+                    self._publish_shared(key, value)
+            return value
+        finally:
+            with self._lock:
+                if value is not None:
+                    self._store(key, value)
+                self._async_inflight.pop(key, None)
+
+    def get_or_load_many(self, market, symbols, loader):
+        """여러 종목 캐시 조회 - 미스 종목만 모아 loader(미스 목록)를 한 번 호출, {종목: 값} 반환
+
+        loader는 {종목: 값}을 반환하며 빠진 종목은 결과에도 없습니다(호출 측이 개별 조회로 보완).
+        다른 호출이 이미 조회 중인 종목은 그 결과를 기다립니다.
+        """
+        values, waits, owned = {}, {}, {}
+        with self._lock:
+            now = time.monotonic()
+            for symbol in dict.fromkeys(symbols):
+                key = (market, symbol)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values[symbol] = entry[1]
+                    continue
+                flight = self._inflight.get(key)
+                if flight is not None:
+                    self.coalesced += 1
+                    waits[symbol] = flight
+                else:
+                    flight = self._inflight[key] = _InFlight()
+                    self.misses += 1
+                    owned[symbol] = flight
+
+        if owned:
+            loaded, error = {}, None
+            try:
+                loaded, missing = self._load_shared_many(market, owned)
+                if missing:
+                    for symbol, value in (loader(missing) or {}).items():
+                        if symbol in owned and value is not None:
+                            loaded[symbol] = value
+                            self._publish_shared((market, symbol), value)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                with self._lock:
+                    for symbol, flight in owned.items():
+                        flight.value, flight.error = loaded.get(symbol), error
+                        if flight.value is not None:
+                            self._store((market, symbol), flight.value)
+                        self._inflight.pop((market, symbol), None)
+                for flight in owned.values():
+                    flight.event.set()
+            values.update(loaded)
+
+        for symbol, flight in waits.items():
+            flight.event.wait()
+            if flight.error is None and flight.value is not None:
+                values[symbol] = flight.value
+        return values
+
+    async def get_or_load_many_async(self, market, symbols, loader):
+        """get_or_load_many의 asyncio 버전 - loader는 코루틴 함수, 종목별 Future로 동시 호출자와 공유"""
+        loop = asyncio.get_running_loop()
+        values, waits, owned = {}, {}, {}
+        with self._lock:
+            now = time.monotonic()
+            for symbol in dict.fromkeys(symbols):
+                key = (market, symbol)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values[symbol] = entry[1]
+                    continue
+                pending = self._async_inflight.get(key)
+                if pending is not None:
+                    self.coalesced += 1
+                    waits[symbol] = pending
+                else:
+                    self._async_inflight[key] = owned[symbol] = loop.create_future()
+                    self.misses += 1
+
+        if owned:
+            loaded = {}
+            try:
+                loaded, missing = self._load_shared_many(market, owned)
+                if missing:
+                    for symbol, value in (await loader(missing) or {}).items():
+                        if symbol in owned and value is not None:
+                            loaded[symbol] = value
+                            self._publish_shared((market, symbol), value)
+            finally:
+                # 실패/취소여도 기다리는 호출자는 None(조회 실패)을 받음
+                with self._lock:
+                    for symbol, future in owned.items():
+                        if loaded.get(symbol) is not None:
+                            self._store((market, symbol), loaded[symbol])
+                        self._async_inflight.pop((market, symbol), None)
+                        if not future.done():
+                            future.set_result(loaded.get(symbol))
+            values.update(loaded)
+
+        for symbol, pending in waits.items():
+            try:
+                value = await asyncio.shield(pending)
+            except Exception:
+                continue
+            if value is not None:
+                values[symbol] = value
+        return values
+
+    def _load_shared_many(self, market, symbols):
+        """공유 상태에 있는 종목은 값으로, 없는 종목은 미스 목록으로"""
+        loaded, missing = {}, []
+        for symbol in symbols:
+            value = self._load_shared((market, symbol))
+            if value is None:
+                missing.append(symbol)
+            else:
+                loaded[symbol] = value
+        return loaded, missing
+
+    def stats(self):
+        """적중/미스/합류 카운터"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "sharedHits": self.shared_hits,
+                "hitRatio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight) + len(self._async_inflight),
+                "ttl": self.ttl,
+                "maxEntries": self.max_entries
+            }
@@ -0,0 +1,211 @@
+import json
+import struct
+import threading
+import time
+from array import array
+
+# 숫자 컬럼 - volume만 정수, 나머지는 실수 배열
+NUMERIC_FIELDS = ("price", "change", "changePercent", "volume", "high", "low", "open")
+_TYPECODES = {field: ("q" if field == "volume" else "d") for field in NUMERIC_FIELDS}
+
+_BINARY_MAGIC = b"QST1"
+_BINARY_HEADER = struct.Struct("<4sBIIQd")  # magic, 정수가격 여부, 행 수, 문자열 블록 길이, 버전, 갱신시각
+
+
+class QuoteStore:
+    """미리 할당한 배열 컬럼에 시세를 보관하는 컬럼형 저장소 (종목 → 행 번호 인덱스)
+
+    갱신은 해당 행의 배열 원소만 바꾸는 O(1) 작업이고, 응답은 행별 dict를 만들지 않고
+    컬럼에서 바로 JSON/바이너리로 직렬화합니다. 국내 시세는 integer_prices=True로
+    가격 컬럼을 정수로 내보냅니다.
+    """
+
+    def __init__(self, capacity=64, integer_prices=False):
+        self.integer_prices = integer_prices
+        self.capacity = capacity
+        self.columns = {field: array(_TYPECODES[field], [0]) * capacity for field in NUMERIC_FIELDS}
+        self.updated_at = array("d", [0.0]) * capacity
+        self.tickers = []
+        self.names = []
+        self.market_caps = []
+        self._row_prefix = []   # 행별 고정 JSON 조각 ('{"ticker":..,"name":..,"marketCap":..')
+        self._index = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._index
+
+    def _grow(self):
+        for field, column in self.columns.items():
+            column.extend(array(column.typecode, [0]) * self.capacity)
+        self.updated_at.extend(array("d", [0.0]) * self.capacity)
+        self.capacity *= 2
+
+    def _set_labels(self, row, name, market_cap):
+        self.names[row] = name
+        self.market_caps[row] = market_cap
+        self._row_prefix[row] = (
+            f'{{"ticker":{json.dumps(self.tickers[row], ensure_ascii=False)},'
+            f'"name":{json.dumps(name, ensure_ascii=False)},'
+            f'"marketCap":{json.dumps(market_cap, ensure_ascii=False)}'
+        )
+
+    def upsert(self, quote):
+        """시세 dict(get_stock_price 형태) 반영 - 새 종목이면 행 추가, 행 번호 반환"""
+        ticker = quote["ticker"]
+        with self._lock:
+            row = self._index.get(ticker)
+            if row is None:
+                row = len(self.tickers)
+                if row >= self.capacity:
+                    self._grow()
+                self._index[ticker] = row
+                self.tickers.append(ticker)
+                self.names.append(None)
+                self.market_caps.append(None)
+                self._row_prefix.append(None)
+
+            name = quote.get("name", ticker)
+            market_cap = quote.get("marketCap", "-")
+            if name != self.names[row] or market_cap != self.market_caps[row]:
+                self._set_labels(row, name, market_cap)
+
+            for field in NUMERIC_FIELDS:
+                value = quote.get(field)
+                if value is not None:
+                    self.columns[field][row] = value
+            self.updated_at[row] = time.time()
+            self.version += 1
+            return row
+
+    def update(self, ticker, fields):
+        """기존 종목의 숫자 필드만 제자리 갱신 - 없는 종목이면 False"""
+        with self._lock:
+            row = self._index.get(ticker)
+            if row is None:
+                return False
+            for field, value in fields.items():
+                column = self.columns.get(field)
+                if column is not None:
+                    column[row] = value
+            self.updated_at[row] = time.time()
+            self.version += 1
+            return True
+
+    def get(self, ticker):
+        """한 종목을 dict로 조회 (없으면 None)"""
+        row = self._index.get(ticker)
+        if row is None:
+            return None
+        quote = {"ticker": ticker, "name": self.names[row], "marketCap": self.market_caps[row]}
+        for field in NUMERIC_FIELDS:
+            quote[field] = self._value(field, self.columns[field][row])
+        return quote
+
+    def _value(self, field, value):
+        if field == "volume" or (self.integer_prices and field != "changePercent"):
+            return int(value)
+        return value
+
+    def snapshot(self, fields=NUMERIC_FIELDS):
+        """컬럼 복사본 (행 수만큼 잘라낸 array) - 일관된 시점의 벡터 연산용"""
+        with self._lock:
+            count = len(self.tickers)
+            return {
+                "tickers": list(self.tickers),
+                **{field: self.columns[field][:count] for field in fields},
+                "version": self.version
+            }
+
+    def to_json(self, extra=None, suffixes=None):
+        """{"stocks": [...], **extra} JSON 바이트 - 행별 dict 없이 컬럼에서 바로 생성
+
+        suffixes는 {종목: JSON 조각(',"키":값')} - 해당 종목 행 끝에 그대로 덧붙임 (지표 등)
+        """
+        if self.integer_prices:
+            row_format = ',"price":%d,"change":%d,"changePercent":%.2f,"volume":%d,"high":%d,"low":%d,"open":%d'
+        else:
+            row_format = ',"price":%.2f,"change":%.2f,"changePercent":%.2f,"volume":%d,"high":%.2f,"low":%.2f,"open":%.2f'
+
+        c = self.columns
+        suffix = suffixes.get if suffixes else (lambda ticker, default: default)
+        with self._lock:
+            rows = [
+                prefix + row_format % (
+                    c["price"][i], c["change"][i], c["changePercent"][i], c["volume"][i],
+                    c["high"][i], c["low"][i], c["open"][i]
+                ) + suffix(self.tickers[i], "") + "}"
+                for i, prefix in enumerate(self._row_prefix)
+            ]
+
+        head = ""
+        if extra:
+            head = json.dumps(extra, ensure_ascii=False, separators=(",", ":"))[1:-1]
+            head = head + "," if head else ""
+        return ("{" + head + '"stocks":[' + ",".join(rows) + "]}").encode("utf-8")
+
+    def to_binary(self):
+        """바이너리 직렬화 - 헤더 + 숫자 컬럼 원시 바이트 + 문자열 블록(NUL 구분)"""
+        with self._lock:
+            count = len(self.tickers)
+            strings = "\0".join(
+                f"{t}\0{n}\0{m}" for t, n, m in zip(self.tickers, self.names, self.market_caps)
+            ).encode("utf-8")
+            parts = [_BINARY_HEADER.pack(_BINARY_MAGIC, self.integer_prices, count, len(strings),
+                                         self.version, time.time())]
+            for field in NUMERIC_FIELDS:
+                parts.append(self.columns[field][:count].tobytes())
+            parts.append(self.updated_at[:count].tobytes())
+            parts.append(strings)
+        return b"".join(parts)
+
+    @classmethod
+    def from_binary(cls, data):
+        """to_binary 결과로 저장소 복원"""
+        magic, integer_prices, count, strings_len, version, _ = _BINARY_HEADER.unpack_from(data, 0)
+        if magic != _BINARY_MAGIC:
+            raise ValueError("시세 저장소 형식이 아닙니다")
+
+        store = cls(capacity=max(count, 1), integer_prices=bool(integer_prices))
+        offset = _BINARY_HEADER.size
+        for field in NUMERIC_FIELDS:
+            column = array(_TYPECODES[field])
+            size = column.itemsize * count
+            column.frombytes(data[offset:offset + size])
+            store.columns[field][:count] = column
+            offset += size
+        updated = array("d")
+        updated.frombytes(data[offset:offset + 8 * count])
+        store.updated_at[:count] = updated
+        offset += 8 * count
+
+        strings = data[offset:offset + strings_len].decode("utf-8").split("\0") if count else []
+        for row in range(count):
+            ticker, name, market_cap = strings[row * 3:row * 3 + 3]
+            store._index[ticker] = row
+            store.tickers.append(ticker)
+            store.names.append(None)
+            store.market_caps.append(None)
+            store._row_prefix.append(None)
+            store._set_labels(row, name, market_cap)
+        store.version = version
+        return store
+
+
+# 시장별 프로세스 공용 저장소 (국내는 원 단위 정수 가격)
+quote_stores = {
+    "domestic": QuoteStore(integer_prices=True),
+    "us": QuoteStore()
+}
+
+def store_for_market(market):
+    """시장 키 → 저장소 (해외 거래소 코드 NAS/NYS/AMS는 미국 저장소)"""
+    if market == "domestic":
+        return quote_stores["domestic"]
+    if market in ("us", "NAS", "NYS", "AMS"):
+        return quote_stores["us"]
+    return None
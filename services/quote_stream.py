@@ -0,0 +1,135 @@
+import json
+import queue
+import threading
+import time
+
+from services.market_poller import add_snapshot_listener, get_market_snapshot
+
+# 변경 여부를 비교하고 델타로 내보낼 필드
+QUOTE_FIELDS = ("price", "change", "changePercent", "volume")
+INDEX_FIELDS = ("value", "change", "changePercent", "asOf", "stale")
+STREAM_MARKETS = ("domestic", "us")
+
+
+def compact_quotes(result):
+    """종목 스냅샷 → {ticker: {price, change, changePercent, volume}}"""
+    return {
+        stock["ticker"]: {field: stock.get(field) for field in QUOTE_FIELDS}
+        for stock in (result or {}).get("stocks", [])
+    }
+
+
+def compact_indices(result):
+    """지수 스냅샷 → {지수키: {value, change, changePercent, asOf, stale}}"""
+    return {
+        key: {field: data.get(field) for field in INDEX_FIELDS}
+        for key, data in (result or {}).get("indices", {}).items()
+    }
+
+
+def diff_compact(previous, current):
+    """바뀐 항목만 추림 - 새로 생긴 항목은 전체 필드 포함"""
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+class QuoteBroadcaster:
+    """스냅샷 갱신을 델타 이벤트로 바꿔 스트림 구독자에게 전달
+
+    구독자마다 크기 제한 큐를 두고, 따라오지 못하는 구독자는 끊어서
+    재접속 시 전체 스냅샷을 다시 받게 합니다.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.version = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, payload):
+        """이벤트를 버전과 함께 모든 구독자 큐에 넣음"""
+        with self._lock:
+            self.version += 1
+            message = format_sse(event, dict(payload, v=self.version))
+            for q in list(self._subscribers):
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    # 느린 구독자 - 종료 신호를 남기고 구독 해제
+                    self._subscribers.discard(q)
+                    with q.mutex:
+                        q.queue.clear()
+                    q.put_nowait(None)
+
+    def on_snapshot(self, name, previous, current):
+        """갱신기 리스너 - 바뀐 시세/지수만 델타로 발행"""
+        if name == "indices":
+            changed = diff_compact(compact_indices(previous), compact_indices(current))
+            if changed:
+                self.publish("indices", {"indices": changed, "asOf": current.get("asOf")})
+        elif name in STREAM_MARKETS:
+            changed = diff_compact(compact_quotes(previous), compact_quotes(current))
+            if changed:
+                self.publish("quotes", {"market": name, "quotes": changed, "asOf": current.get("asOf")})
+
+
+def format_sse(event, payload):
+    """Server-Sent Events 메시지 직렬화"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+def initial_snapshot_message():
+    """접속 직후 보낼 전체 스냅샷 (종목명 등 렌더링에 필요한 필드 포함)"""
+    payload = {"v": quote_broadcaster.version, "indices": {}, "markets": {}}
+
+    indices = get_market_snapshot("indices")
+    if indices:
+        payload["indices"] = indices.get("indices", {})
+    for market in STREAM_MARKETS:
+        result = get_market_snapshot(market)
+        if result:
+            payload["markets"][market] = result.get("stocks", [])
+
+    return format_sse("snapshot", payload)
+
+
+def stream_events(heartbeat=15.0, keepalive=None):
+    """SSE 응답 본문 제너레이터 - 전체 스냅샷 후 델타, 주기적으로 keep-alive 주석 전송
+
+    keepalive는 keep-alive마다 호출됩니다 (접속 중인 세션의 구독 임대 연장).
+    """
+    q = quote_broadcaster.subscribe()
+    last_keepalive = time.monotonic()
+    try:
+        yield initial_snapshot_message()
+        while True:
+            if keepalive is not None and time.monotonic() - last_keepalive >= heartbeat:
+                keepalive()
+                last_keepalive = time.monotonic()
+            try:
+                message = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        quote_broadcaster.unsubscribe(q)
+
+
+quote_broadcaster = QuoteBroadcaster()
+add_snapshot_listener(quote_broadcaster.on_snapshot)
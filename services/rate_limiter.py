@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """스레드 안전 토큰 버킷 - 초당 rate개 보충, 최대 capacity개까지 버스트 허용
+
+    토큰은 예약 방식으로 차감되어(음수 허용) 대기 중인 호출자들이 도착 순서대로
+    균등한 간격으로 통과합니다.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate는 0보다 커야 합니다")
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+        self.waits = 0
+
+    def reserve(self, tokens=1):
+        """토큰을 예약하고 호출 전에 기다려야 할 시간(초)을 반환"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / self.rate
+            self.total_wait += wait
+            self.waits += 1
+            return wait
+
+    def acquire(self, tokens=1):
+        """토큰을 얻을 때까지 대기 - 실제 대기 시간(초) 반환"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def stats(self):
+        """누적 대기 통계"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "waits": self.waits,
+                "totalWaitSeconds": round(self.total_wait, 3)
+            }
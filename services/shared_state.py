@@ -0,0 +1,335 @@
+"""프로세스/노드 간 공유 상태 백엔드와 리더 선출
+
+SHARED_STATE_URL로 백엔드를 고릅니다.
+    (없음)                 프로세스 내 dict - 단일 프로세스 개발 서버
+    file:///var/run/stock  단일 호스트 여러 워커 - 키별 파일 + fcntl 잠금
+    redis://host:6379/0    여러 노드 - Redis 호환 서버 (redis 패키지 필요)
+
+리더 한 곳만 토큰 발급과 업스트림 폴링을 하고, 나머지는 공유 상태를 읽습니다.
+"""
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 - 파일 백엔드 사용 불가
+    fcntl = None
+
+try:
+    import redis
+except ImportError:  # redis 백엔드를 쓸 때만 필요
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """프로세스 내 공유 상태 (TTL 지원 dict)"""
+
+    def __init__(self):
+        self._data = {}   # key -> (만료 epoch 또는 None, bytes)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= now:
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time())
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+
+    def set_if_absent(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+            return True
+
+    def renew_if_owner(self, key, value, ttl):
+        with self._lock:
+            if self._live(key, time.time()) != value:
+                return False
+            self._data[key] = (time.time() + ttl, value)
+            return True
+
+    def delete_if_owner(self, key, value):
+        with self._lock:
+            if self._live(key, time.time()) == value:
+                del self._data[key]
+
+    def keys(self, prefix):
+        now = time.time()
+        with self._lock:
+            return [key for key in list(self._data) if key.startswith(prefix) and self._live(key, now) is not None]
+
+
+class FileBackend:
+    """단일 호스트 공유 상태 - 키별 파일(만료시각 8바이트 + 값), 조건부 갱신은 fcntl 잠금으로 직렬화"""
+
+    _EXPIRY = struct.Struct("<d")
+
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError("파일 공유 상태는 fcntl을 지원하는 OS에서만 사용할 수 있습니다")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, ".lock")
+        self._thread_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.replace("/", "_").replace(":", "__"))
+
+    def _key(self, filename):
+        return filename.replace("__", ":")
+
+    def _locked(self):
+        """프로세스 간 배타 잠금 (컨텍스트 매니저)"""
+        backend = self
+
+        class _Lock:
+            def __enter__(self):
+                backend._thread_lock.acquire()
+                self.f = open(backend._lock_path, "a")
+                fcntl.flock(self.f, fcntl.LOCK_EX)
+
+            def __exit__(self, *exc):
+                fcntl.flock(self.f, fcntl.LOCK_UN)
+                self.f.close()
+                backend._thread_lock.release()
+
+        return _Lock()
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < self._EXPIRY.size:
+            return None
+        expires = self._EXPIRY.unpack_from(data)[0]
+        if expires and expires <= time.time():
+            return None
+        return data[self._EXPIRY.size:]
+
+    def _write(self, key, value, ttl):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self._EXPIRY.pack(time.time() + ttl if ttl else 0.0) + value)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        return self._read(key)
+
+    def set(self, key, value, ttl=None):
+        # 파일 교체는 원자적이므로 단순 쓰기는 잠금 없이 처리
+        self._write(key, value, ttl)
+
+    def set_if_absent(self, key, value, ttl=None):
+        with self._locked():
+            if self._read(key) is not None:
+                return False
+            self._write(key, value, ttl)
+            return True
+
+    def renew_if_owner(self, key, value, ttl):
+        with self._locked():
+            if self._read(key) != value:
+                return False
+            self._write(key, value, ttl)
+            return True
+
+    def delete_if_owner(self, key, value):
+        with self._locked():
+            if self._read(key) == value:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+    def keys(self, prefix):
+        found = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(".") or filename.endswith(".tmp"):
+                continue
+            key = self._key(filename)
+            if key.startswith(prefix) and self._read(key) is not None:
+                found.append(key)
+        return found
+
+
+class RedisBackend:
+    """Redis 호환 서버 공유 상태 - 조건부 갱신/삭제는 Lua 스크립트로 원자 처리"""
+
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    _DELETE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("redis 패키지가 설치되어 있지 않습니다")
+        self.client = redis.Redis.from_url(url)
+        self._renew = self.client.register_script(self._RENEW)
+        self._delete = self.client.register_script(self._DELETE)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def set_if_absent(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def renew_if_owner(self, key, value, ttl):
+        return bool(self._renew(keys=[key], args=[value, int(ttl * 1000)]))
+
+    def delete_if_owner(self, key, value):
+        self._delete(keys=[key], args=[value])
+
+    def keys(self, prefix):
+        return [key.decode() for key in self.client.scan_iter(match=f"{prefix}*")]
+
+
+def create_backend(url=None):
+    """SHARED_STATE_URL → 백엔드 인스턴스"""
+    url = url if url is not None else os.getenv("SHARED_STATE_URL", "")
+    if not url:
+        return LocalBackend()
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return FileBackend(parsed.path)
+    if parsed.scheme in ("redis", "rediss", "unix"):
+        return RedisBackend(url)
+    raise ValueError(f"지원하지 않는 공유 상태 URL입니다: {url}")
+
+
+def get_json(backend, key):
+    data = backend.get(key)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+def set_json(backend, key, value, ttl=None):
+    backend.set(key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), ttl)
+
+
+class LeaderElection:
+    """임대(lease) 키 기반 리더 선출 - 키를 먼저 잡은 노드가 리더, ttl/3마다 갱신
+
+    리더가 죽으면 임대가 만료된 뒤 다른 노드가 이어받습니다.
+    """
+
+    def __init__(self, backend, name="kis:leader", ttl=15.0, node_id=None):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._token = self.node_id.encode()
+        self._leader = False
+        self._lease_until = 0.0   # 마지막으로 임대를 확인한 시점 + ttl (갱신이 밀리면 스스로 리더 자격 상실)
+        self._stop = threading.Event()
+        self._thread = None
+        self.listeners = []   # listener(is_leader) - 리더 여부가 바뀔 때 호출
+
+    def is_leader(self):
+        return self._leader and time.monotonic() < self._lease_until
+
+    def leader_id(self):
+        value = self.backend.get(self.name)
+        return value.decode() if value else None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.campaign()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._leader:
+            self.backend.delete_if_owner(self.name, self._token)
+            self._set_leader(False)
+
+    def campaign(self):
+        """임대 갱신 또는 획득 시도 - 리더 여부 반환"""
+        started = time.monotonic()
+        try:
+            if self._leader:
+                leader = self.backend.renew_if_owner(self.name, self._token, self.ttl)
+            else:
+                leader = self.backend.set_if_absent(self.name, self._token, self.ttl)
+        except Exception as e:
+            logger.error(f"리더 임대 갱신 실패: {e}")
+            leader = False
+        if leader:
+            self._lease_until = started + self.ttl
+        self._set_leader(leader)
+        return leader
+
+    def _set_leader(self, leader):
+        if leader == self._leader:
+            return
+        self._leader = leader
+        logger.info(f"{'리더로 선출' if leader else '리더 해제'}: {self.node_id}")
+        for listener in self.listeners:
+            try:
+                listener(leader)
+            except Exception as e:
+                logger.error(f"리더 변경 리스너 오류: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.campaign()
+
+
+shared_state = None
+leader_election = None
+_state_lock = threading.Lock()
+
+def get_shared_state():
+    """프로세스 공용 공유 상태 백엔드"""
+    global shared_state
+    with _state_lock:
+        if shared_state is None:
+            shared_state = create_backend()
+    return shared_state
+
+def get_cluster_state():
+    """여러 프로세스가 함께 쓰는 백엔드가 설정된 경우에만 반환 (프로세스 내 백엔드면 None)"""
+    backend = get_shared_state()
+    return None if isinstance(backend, LocalBackend) else backend
+
+def get_leader_election():
+    """프로세스 공용 리더 선출기 (KIS_LEADER_TTL 초, 기본 15) - 첫 호출 시 시작"""
+    global leader_election
+    backend = get_shared_state()
+    with _state_lock:
+        if leader_election is None:
+            leader_election = LeaderElection(backend, ttl=float(os.getenv("KIS_LEADER_TTL", "15")))
+            leader_election.start()
+    return leader_election
+
+def node_id():
+    return get_leader_election().node_id
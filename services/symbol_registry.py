@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from services.instrument_master import get_instrument_index
+from services.kis_api_service import US_MAJOR_STOCKS
+
+logger = logging.getLogger(__name__)
+
+US_EXCHANGES = ("NAS", "NYS", "AMS")
+
+
+class SymbolRegistry:
+    """세션별 임대(lease)로 종목 구독을 참조 계수하는 레지스트리
+
+    보유자(holder)는 (세션 ID, 그룹) 형태이고 그룹은 'board:domestic', 'board:us', 'watch' 등
+    화면 단위입니다. 임대는 TTL 동안 유지되며 요청/스트림 keep-alive마다 touch로 연장되고,
+    만료되거나 해제되면 참조가 줄어 마지막 보유자가 떠난 종목은 추적 대상에서 빠집니다.
+    """
+
+    def __init__(self, lease_ttl=60.0):
+        self.lease_ttl = lease_ttl
+        self._leases = {}    # holder -> {"expires": t, "symbols": set((market, symbol))}
+        self._refs = {}      # (market, symbol) -> 보유자 수 (삽입 순서 = 최초 구독 순서)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self.listeners = []  # listener(event, market, symbol) - event: "add" | "evict"
+
+    def lease(self, holder, symbols):
+        """holder의 구독 종목을 symbols로 교체하고 만료 시각 연장 - symbols는 (market, symbol) 목록"""
+        symbols = set(symbols)
+        with self._lock:
+            entry = self._leases.get(holder)
+            previous = entry["symbols"] if entry else set()
+            self._leases[holder] = {"expires": time.monotonic() + self.lease_ttl, "symbols": symbols}
+            added = self._inc(symbols - previous)
+            evicted = self._dec(previous - symbols)
+        self._notify(added, evicted)
+
+    def touch(self, session_id):
+        """세션의 모든 임대 연장"""
+        expires = time.monotonic() + self.lease_ttl
+        with self._lock:
+            for holder, entry in self._leases.items():
+                if holder[0] == session_id:
+                    entry["expires"] = expires
+
+    def release(self, holder):
+        with self._lock:
+            entry = self._leases.pop(holder, None)
+            evicted = self._dec(entry["symbols"]) if entry else []
+        self._notify([], evicted)
+
+    def release_session(self, session_id):
+        with self._lock:
+            holders = [holder for holder in self._leases if holder[0] == session_id]
+            evicted = []
+            for holder in holders:
+                evicted += self._dec(self._leases.pop(holder)["symbols"])
+        self._notify([], evicted)
+
+    def sweep(self):
+        """만료된 임대 정리 - 정리된 보유자 수 반환"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [holder for holder, entry in self._leases.items() if entry["expires"] <= now]
+            evicted = []
+            for holder in expired:
+                evicted += self._dec(self._leases.pop(holder)["symbols"])
+        self._notify([], evicted)
+        return len(expired)
+
+    def _inc(self, symbols):
+        added = []
+        for key in symbols:
+            count = self._refs.get(key, 0)
+            self._refs[key] = count + 1
+            if count == 0:
+                added.append(key)
+        return added
+
+    def _dec(self, symbols):
+        evicted = []
+        for key in symbols:
+            count = self._refs.get(key, 0) - 1
+            if count <= 0:
+                self._refs.pop(key, None)
+                evicted.append(key)
+            else:
+                self._refs[key] = count
+        return evicted
+
+    def _notify(self, added, evicted):
+        for event, keys in (("add", added), ("evict", evicted)):
+            for market, symbol in keys:
+                for listener in self.listeners:
+                    try:
+                        listener(event, market, symbol)
+                    except Exception as e:
+                        logger.error(f"종목 구독 리스너 오류 ({event} {symbol}): {e}")
+
+    def _sweep_if_due(self):
+        """조회 시 최대 1초에 한 번 만료 임대 정리 (별도 스레드 없이 지연 정리)"""
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + 1.0
+            self.sweep()
+
+    def active(self, market):
+        """구독자가 있는 종목 (최초 구독 순)"""
+        self._sweep_if_due()
+        with self._lock:
+            return [symbol for (m, symbol) in self._refs if m == market]
+
+    def is_active(self, market, symbol):
+        with self._lock:
+            return (market, symbol) in self._refs
+
+    def has_group(self, group):
+        """그룹 임대를 가진 세션이 하나라도 있는지"""
+        self._sweep_if_due()
+        with self._lock:
+            return any(holder[1] == group for holder in self._leases)
+
+    def demand(self):
+        """현재 구독 수요 요약 - 다른 노드(리더)에 넘길 {"groups": [...], "symbols": {market: [...]}}"""
+        self._sweep_if_due()
+        with self._lock:
+            symbols = {}
+            for market, symbol in self._refs:
+                symbols.setdefault(market, []).append(symbol)
+            return {"groups": sorted({holder[1] for holder in self._leases}), "symbols": symbols}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leases": len(self._leases),
+                "symbols": len(self._refs),
+                "refs": {f"{market}:{symbol}": count for (market, symbol), count in self._refs.items()}
+            }
+
+
+class ExchangeResolver:
+    """미국 종목 거래소 코드(NAS/NYS/AMS) 판별 - 알려진 종목은 바로, 모르는 종목은 거래소별로 조회해 확인
+
+    판별 결과는 JSON 파일에 저장해 재시작 후 다시 조회하지 않습니다. 어느 거래소에서도 찾지 못한 종목은
+    miss_ttl초 동안 기억해 그 사이 갱신 주기마다 거래소 세 곳을 다시 조회하지 않습니다.
+    """
+
+    def __init__(self, path=None, known=None, miss_ttl=600.0):
+        self.path = path
+        self.miss_ttl = miss_ttl
+        self._exchanges = dict(known or {})
+        self._misses = {}  # symbol -> 다시 조회할 시각 (monotonic)
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._exchanges.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"거래소 코드 파일 로드 실패: {e}")
+
+    def known(self, symbol):
+        """이미 판별된 거래소 코드 - 판별 기록, 종목 마스터 순 (모르면 None - 업스트림 조회 없음)"""
+        exchange = self._exchanges.get(symbol)
+        if exchange is None:
+            index = get_instrument_index(block=False)
+            entry = index.get(symbol) if index is not None else None
+            if entry is not None and entry["market"] in US_EXCHANGES:
+                exchange = entry["market"]
+        return exchange
+
+    def resolve(self, symbol, api):
+        """거래소 코드 판별 - 마스터에 없으면 현재가가 나오는 첫 거래소, 어디에도 없으면 None
+
+        거래소 조회는 종목당 한 스레드만 합니다. 조회하는 동안 다른 호출은 못 찾은 종목처럼 바로 None을 받습니다.
+        """
+        exchange = self.known(symbol)
+        if exchange or api is None:
+            return exchange
+        with self._lock:
+            retry_at = self._misses.get(symbol)
+            if retry_at is not None and time.monotonic() < retry_at:
+                return None
+            self._misses[symbol] = time.monotonic() + self.miss_ttl
+
+        for candidate in US_EXCHANGES:
+            quote = api.get_overseas_stock_price(symbol, candidate)
+            if quote and quote.get("price"):
+                self.remember(symbol, candidate)
+                return candidate
+
+        with self._lock:
+            self._misses[symbol] = time.monotonic() + self.miss_ttl
+        logger.warning(f"거래소 코드를 찾을 수 없습니다: {symbol} ({self.miss_ttl:.0f}초 후 다시 확인)")
+        return None
+
+    def remember(self, symbol, exchange):
+        with self._lock:
+            self._exchanges[symbol] = exchange
+            self._misses.pop(symbol, None)
+            if not self.path:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._exchanges, f)
+            os.replace(tmp, self.path)
+
+
+symbol_registry = None
+exchange_resolver = None
+_registry_lock = threading.Lock()
+
+def get_symbol_registry():
+    """프로세스 공용 구독 레지스트리 (SYMBOL_LEASE_TTL 초, 기본 60)"""
+    global symbol_registry
+    with _registry_lock:
+        if symbol_registry is None:
+            symbol_registry = SymbolRegistry(lease_ttl=float(os.getenv("SYMBOL_LEASE_TTL", "60")))
+    return symbol_registry
+
+def get_exchange_resolver():
+    """프로세스 공용 거래소 판별기 - 주요 종목 거래소로 초기화 (EXCHANGE_CACHE_FILE, 기본 data/exchanges.json,
+    못 찾은 종목 재확인 간격 EXCHANGE_MISS_TTL초)"""
+    global exchange_resolver
+    with _registry_lock:
+        if exchange_resolver is None:
+            exchange_resolver = ExchangeResolver(
+                os.getenv("EXCHANGE_CACHE_FILE", os.path.join("data", "exchanges.json")),
+                known={stock_info["symbol"]: stock_info["exchange"] for stock_info in US_MAJOR_STOCKS},
+                miss_ttl=float(os.getenv("EXCHANGE_MISS_TTL", "600"))
+            )
+    return exchange_resolver
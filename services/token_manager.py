@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from services import metrics
+from services.shared_state import get_json, set_json
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 - 파일 잠금 없이 원자적 교체만 사용
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 공유 상태 키 - 발급된 토큰, 발급 잠금
+SHARED_TOKEN_KEY = "kis:token"
+TOKEN_ISSUER_KEY = "kis:token:issuer"
+
+# KIS 토큰 발급은 앱키당 1분에 1회 (EGW00133)
+TOKEN_MIN_INTERVAL = 61.0
+RATE_LIMITED = "EGW00133"
+
+
+class TokenCacheFile:
+    """토큰 캐시 JSON 파일 - fcntl 잠금 아래 임시 파일에 쓰고 교체 (프로세스 간 안전)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_path = f"{path}.lock"
+
+    def _locked(self, exclusive):
+        if fcntl is None:
+            return None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self._lock_path, "a")
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return f
+
+    def _unlock(self, f):
+        if f is not None:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def load(self):
+        """{"accessToken", "expiresAt", "requestedAt"} (없거나 깨졌으면 None)"""
+        if not os.path.exists(self.path):
+            return None
+        f = self._locked(exclusive=False)
+        try:
+            with open(self.path, encoding="utf-8") as cache:
+                return json.load(cache)
+        except (OSError, ValueError) as e:
+            logger.error(f"토큰 캐시 로드 실패: {e}")
+            return None
+        finally:
+            self._unlock(f)
+
+    def save(self, data):
+        f = self._locked(exclusive=True)
+        try:
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as cache:
+                json.dump(data, cache)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f"토큰 캐시 저장 실패: {e}")
+        finally:
+            self._unlock(f)
+
+
+class TokenManager:
+    """KIS 액세스 토큰 수명 관리 - 만료 전 백그라운드 갱신, 요청 경로에서는 대기(sleep)하지 않음
+
+    발급은 갱신 스레드 하나만 수행하므로 동시에 토큰이 필요한 요청은 한 번의 발급을 함께 기다립니다.
+    1분당 1회 제한은 다음 발급 가능 시각으로 관리해 갱신 스레드만 기다리고, 요청은 최대
+    wait_timeout초만 기다린 뒤 토큰 없이 실패합니다. 발급 결과는 캐시 파일과 공유 상태에 저장되어
+    다른 프로세스는 발급 없이 가져다 씁니다.
+
+    issue()는 (토큰, 유효 초, 오류 코드)를 반환하는 실제 발급 호출입니다.
+    """
+
+    def __init__(self, issue, shared, cache_path, refresh_margin=3600.0, wait_timeout=10.0, node_id=None):
+        self.issue = issue
+        self.shared = shared
+        self.cache = TokenCacheFile(cache_path)
+        self.refresh_margin = refresh_margin
+        self.wait_timeout = wait_timeout
+        self.node_id = node_id or str(os.getpid())
+        self.access_token = None
+        self.expires_at = 0.0       # epoch 초
+        self.not_before = 0.0       # 다음 발급 가능 시각 (epoch 초)
+        self.rejected = None        # 업스트림이 거부한 토큰 - 캐시/공유 상태에 남아 있어도 다시 쓰지 않음
+        self.invalidations = 0
+        self.issued = 0
+        self.failures = 0
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _set(self, token, expires_at):
+        with self._changed:
+            self.access_token = token
+            self.expires_at = expires_at
+            self._changed.notify_all()
+
+    def is_valid(self, margin=0.0):
+        return self.access_token is not None and time.time() + margin < self.expires_at
+
+    def adopt(self):
+        """공유 상태, 캐시 파일 순으로 다른 프로세스가 발급한 토큰 반영 - 현재보다 오래가면 True"""
+        for data in (get_json(self.shared, SHARED_TOKEN_KEY), self.cache.load()):
+            if not data:
+                continue
+            self.not_before = max(self.not_before, data.get("requestedAt", 0) + TOKEN_MIN_INTERVAL)
+            if data.get("accessToken") == self.rejected:
+                continue
+            if data.get("accessToken") and data.get("expiresAt", 0) > max(time.time(), self.expires_at):
+                self._set(data["accessToken"], data["expiresAt"])
+                metrics.token_refresh_events.inc("adopted")
+                return True
+        return False
+
+    def token(self, wait=True):
+        """유효한 토큰 - 없으면 갱신을 요청하고 wait_timeout초까지 기다림 (끝내 없으면 None)"""
+        if self.is_valid():
+            return self.access_token
+        if self.adopt() and self.is_valid():
+            return self.access_token
+
+        self.start()
+        self._wake.set()
+        if not wait or time.time() + self.wait_timeout < self.not_before:
+            return None  # 발급 제한이 풀리기 전에는 기다려도 받을 수 없음
+        deadline = time.monotonic() + self.wait_timeout
+        with self._changed:
+            while not self.is_valid():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("토큰 발급 대기 시간 초과")
+                    return None
+                self._changed.wait(remaining)
+            return self.access_token
+
+    def invalidate(self, token):
+        """업스트림이 token을 거부했을 때 재발급 요청 (발급 제한 시각이 지나면 갱신 스레드가 발급)
+
+        그 사이 이미 새 토큰으로 바뀌었으면 아무것도 하지 않습니다.
+        """
+        with self._changed:
+            if token is None or token != self.access_token:
+                return False
+            self.rejected = token
+            self.invalidations += 1
+            self.access_token = None
+            self.expires_at = 0.0
+        metrics.token_refresh_events.inc("rejected")
+        logger.warning("KIS가 액세스 토큰을 거부했습니다 - 재발급을 요청합니다")
+        self.start()
+        self._wake.set()
+        return True
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kis-token", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _next_check(self):
+        """다음 갱신 확인까지 남은 초 - 만료 refresh_margin초 전, 발급 제한 중이면 제한 해제 시각"""
+        now = time.time()
+        if not self.is_valid(self.refresh_margin):
+            return max(0.0, self.not_before - now)
+        return self.expires_at - self.refresh_margin - now
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, self._next_check()))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            if self.is_valid(self.refresh_margin) or (self.adopt() and self.is_valid(self.refresh_margin)):
+                continue
+            if time.time() < self.not_before:
+                continue
+            self.refresh()
+
+    def refresh(self):
+        """토큰 발급 한 번 시도 (갱신 스레드 전용) - 다른 프로세스가 발급 중이면 공유 토큰을 기다림"""
+        if not self.shared.set_if_absent(TOKEN_ISSUER_KEY, self.node_id.encode(), ttl=TOKEN_MIN_INTERVAL):
+            # 발급 잠금 보유 프로세스가 올릴 때까지 잠시 후 다시 확인
+            self.not_before = time.time() + 1.0
+            return False
+
+        requested_at = time.time()
+        self.not_before = requested_at + TOKEN_MIN_INTERVAL
+        try:
+            token, expires_in, error_code = self.issue()
+        except Exception as e:
+            token, expires_in, error_code = None, 0, str(e)
+
+        if not token:
+            self.failures += 1
+            metrics.token_refresh_events.inc("rate_limited" if error_code == RATE_LIMITED else "failure")
+            if error_code == RATE_LIMITED:
+                logger.warning("토큰 발급 제한 (1분당 1회) - 갱신 스레드에서 재시도합니다")
+            else:
+                logger.error(f"토큰 발급 실패: {error_code}")
+            return False
+
+        self.issued += 1
+        metrics.token_refresh_events.inc("success")
+        self._set(token, requested_at + expires_in)
+        data = {"accessToken": token, "expiresAt": self.expires_at, "requestedAt": requested_at,
+                "issuedBy": self.node_id}
+        self.cache.save(data)
+        set_json(self.shared, SHARED_TOKEN_KEY, data, ttl=max(1.0, self.expires_at - time.time()))
+        logger.info("✅ KIS API 토큰 발급 성공")
+        return True
+
+    def stats(self):
+        return {
+            "valid": self.is_valid(),
+            "expiresIn": round(max(0.0, self.expires_at - time.time())),
+            "issued": self.issued,
+            "failures": self.failures,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,191 @@
+"""시세 스냅샷 웜 스타트 - 마지막 스냅샷을 주기적으로 디스크에 저장하고 부팅 시 바로 읽어 stale로 제공
+
+재시작 직후 첫 대시보드가 업스트림 조회(토큰 발급 대기 포함)를 기다리지 않도록, 이전 프로세스가
+남긴 스냅샷을 몇 ms 안에 읽어 갱신기 스냅샷과 시세 저장소에 채워 둡니다. 새 조회가 성공하면
+그대로 교체됩니다.
+
+파일 형식 (리틀 엔디언):
+    헤더     magic "WSS1", 저장 시각(double), 구역 수(uint16)
+    구역     이름 길이(uint16), 데이터 길이(uint32), 이름(UTF-8), 데이터
+    구역 종류 store:<시장>  QuoteStore.to_binary() 컬럼 바이너리
+              snapshots     그 밖의 스냅샷(지수, 관심종목)과 시세판 asOf - JSON
+저장은 임시 파일에 쓴 뒤 os.replace로 교체하므로 읽는 쪽은 항상 완전한 파일만 봅니다.
+"""
+import atexit
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+from services import market_poller
+from services.quote_store import QuoteStore, quote_stores
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"WSS1"
+_HEADER = struct.Struct("<4sdH")
+_SECTION = struct.Struct("<HI")
+
+
+def encode_sections(sections, saved_at=None):
+    """{이름: 바이트} → 파일 바이트"""
+    parts = [_HEADER.pack(_MAGIC, saved_at or time.time(), len(sections))]
+    for name, data in sections.items():
+        encoded = name.encode("utf-8")
+        parts.append(_SECTION.pack(len(encoded), len(data)))
+        parts.append(encoded)
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_sections(data):
+    """파일 바이트 → (저장 시각, {이름: 바이트})"""
+    magic, saved_at, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError("웜 스타트 스냅샷 형식이 아닙니다")
+    offset = _HEADER.size
+    sections = {}
+    for _ in range(count):
+        name_len, data_len = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        name = bytes(data[offset:offset + name_len]).decode("utf-8")
+        offset += name_len
+        sections[name] = data[offset:offset + data_len]
+        offset += data_len
+    return saved_at, sections
+
+
+def _mark_stale(name, snapshot):
+    """복원한 스냅샷 - 전체와 (지수는) 항목별로 stale 표시"""
+    snapshot = dict(snapshot, stale=True)
+    if name == "indices":
+        snapshot["indices"] = {key: dict(data, stale=True) for key, data in snapshot.get("indices", {}).items()}
+    return snapshot
+
+
+class WarmStart:
+    """스냅샷 저장/복원 - 갱신기 리스너로 변경을 표시하고 interval초마다 바뀐 경우에만 저장"""
+
+    def __init__(self, path, interval=30.0):
+        self.path = path
+        self.interval = interval
+        self.loaded = False
+        self.snapshot_saved_at = None  # 복원한 파일이 저장된 시각
+        self.last_saved = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def on_snapshot(self, name, previous, current):
+        self._dirty = True
+
+    def load(self):
+        """파일에서 시세 저장소와 갱신기 스냅샷 복원 - 파일이 없거나 깨졌으면 False"""
+        started = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                saved_at, sections = decode_sections(memoryview(f.read()))
+            meta = json.loads(bytes(sections.get("snapshots", b"{}")))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"웜 스타트 스냅샷을 읽지 못했습니다 ({self.path}): {e}")
+            return False
+
+        snapshots = {name: _mark_stale(name, snapshot) for name, snapshot in meta.get("snapshots", {}).items()}
+        for market, as_of in meta.get("boards", {}).items():
+            data = sections.get(f"store:{market}")
+            if data is None or market not in quote_stores:
+                continue
+            store = QuoteStore.from_binary(bytes(data))
+            quote_stores[market] = store
+            snapshots[market] = {
+                "success": True, "stocks": [store.get(ticker) for ticker in store.tickers],
+                "asOf": as_of, "stale": True
+            }
+
+        market_poller.seed_snapshots(snapshots)
+        self.loaded = True
+        self.snapshot_saved_at = saved_at
+        logger.info("웜 스타트 스냅샷 복원: %s (%.1fms, %d초 전 저장)", ", ".join(snapshots) or "-",
+                    (time.perf_counter() - started) * 1000, int(time.time() - saved_at))
+        return True
+
+    def save(self):
+        """현재 스냅샷을 원자적으로 저장"""
+        current = market_poller.current_snapshots()
+        if not current:
+            return False
+
+        sections = {}
+        boards = {}
+        for market, store in quote_stores.items():
+            board = current.get(market)
+            if board is not None and len(store):
+                sections[f"store:{market}"] = store.to_binary()
+                boards[market] = board.get("asOf")
+        others = {name: snapshot for name, snapshot in current.items() if name not in quote_stores}
+        sections["snapshots"] = json.dumps(
+            {"boards": boards, "snapshots": others}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(tmp, "wb") as f:
+                f.write(encode_sections(sections))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._dirty = False
+            self.last_saved = time.time()
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="warm-start", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """바뀐 스냅샷이 있으면 저장 (종료 시에도 호출)"""
+        if not self._dirty:
+            return
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"웜 스타트 스냅샷 저장 실패: {e}")
+
+    def stats(self):
+        return {
+            "enabled": True,
+            "loaded": self.loaded,
+            "snapshotAge": round(time.time() - self.snapshot_saved_at, 1) if self.snapshot_saved_at else None,
+            "lastSaved": self.last_saved
+        }
+
+
+warm_start = None
+
+def start_warm_start():
+    """부팅 시 한 번 - 스냅샷 복원 후 주기 저장 시작 (WARM_START_FILE이 비어 있으면 사용 안 함)"""
+    global warm_start
+    path = os.getenv("WARM_START_FILE", ".market_snapshot.bin")
+    if warm_start is not None or not path:
+        return warm_start
+
+    warm_start = WarmStart(path, interval=float(os.getenv("WARM_START_INTERVAL", "30")))
+    warm_start.load()
+    market_poller.add_snapshot_listener(warm_start.on_snapshot)
+    warm_start.start()
+    atexit.register(warm_start.flush)
+    return warm_start
@@ -3,6 +3,11 @@ let interests = [];
 let alerts = [];
 let currentMarket = 'domestic';
 let marketData = {};
+let marketStream = null;
+let streamConnected = false;
+let lastFiredAt = Date.now() / 1000;
+let symbolSearchTimer = null;
+let symbolSuggestions = [];
 
 // 페이지 로드시 초기화
 document.addEventListener('DOMContentLoaded', function () {
@@ -12,6 +17,8 @@ document.addEventListener('DOMContentLoaded', function () {
     loadMarketData();
     renderMarketIndices(); 
     updateMarketStatus(); // 장중 상태 업데이트 추가
+    startMarketStream();  // 시세 푸시 스트림 구독
+    document.getElementById('stockTicker').addEventListener('input', onStockTickerInput);
     const userEmail = document.getElementById('userEmail').textContent;
     if (userEmail && userEmail !== 'user@example.com') {
         const userName = userEmail.split('@')[0];
@@ -152,59 +159,159 @@ async function renderMarketStocks() {
         const stocks = result.stocks;
         console.log(`[DEBUG] ${apiMarket} 종목 ${stocks.length}개 로드됨`);
 
-        const stocksHtml = stocks.map(stock => `
-            <div class="stock-card" data-ticker="${stock.ticker}">
-                <div class="stock-header">
-                    <div class="stock-info">
-                        <h4>${stock.name}</h4>
-                        <div class="stock-code">${stock.ticker}</div>
+        marketData[apiMarket] = stocks;
+        renderStockGrid(grid, stocks, currentMarket === 'domestic');
+
+    } catch (error) {
+        console.error('마켓 데이터 로딩 실패:', error);
+        grid.innerHTML = '<div class="error">데이터를 불러올 수 없습니다.</div>';
+    }
+}
+
+// 종목 카드 그리드 렌더링
+function renderStockGrid(grid, stocks, isDomestic) {
+    const stocksHtml = stocks.map(stock => `
+        <div class="stock-card" data-ticker="${stock.ticker}">
+            <div class="stock-header">
+                <div class="stock-info">
+                    <h4>${stock.name}</h4>
+                    <div class="stock-code">${stock.ticker}</div>
+                </div>
+                <div class="stock-price">
+                    <div class="current-price">${formatStockPrice(stock.price, isDomestic)}</div>
+                    <div class="price-change ${stock.change >= 0 ? 'positive' : 'negative'}">
+                        ${stock.change >= 0 ? '+' : ''}${formatChange(stock.change)} (${formatPercent(stock.changePercent)}%)
                     </div>
-                    <div class="stock-price">
-                        <div class="current-price">${formatStockPrice(stock.price, currentMarket === 'domestic')}</div>
-                        <div class="price-change ${stock.change >= 0 ? 'positive' : 'negative'}">
-                            ${stock.change >= 0 ? '+' : ''}${formatChange(stock.change)} (${formatPercent(stock.changePercent)}%)
+                    ${stock.timeDiffMinutes !== undefined ? `
+                        <div class="price-time" style="font-size: 12px; color: #777;">
+                            ${stock.timeDiffMinutes}분 전 기준
                         </div>
-                        ${stock.timeDiffMinutes !== undefined ? `
-                            <div class="price-time" style="font-size: 12px; color: #777;">
-                                ${stock.timeDiffMinutes}분 전 기준
-                            </div>
-                        ` : ''}
-                    </div>
+                    ` : ''}
                 </div>
-                <div class="stock-details">
-                    <div class="detail-item">
-                        <div class="detail-label">거래량</div>
-                        <div class="detail-value">${formatVolume(stock.volume)}</div>
-                    </div>
-                    <div class="detail-item">
-                        <div class="detail-label">시가총액</div>
-                        <div class="detail-value">${stock.marketCap}</div>
-                    </div>
+            </div>
+            <div class="stock-details">
+                <div class="detail-item">
+                    <div class="detail-label">거래량</div>
+                    <div class="detail-value" data-field="volume">${formatVolume(stock.volume)}</div>
                 </div>
-                <div class="stock-actions">
-                    <button class="btn-add-interest" onclick="addToInterest('${stock.ticker}', '${stock.name}')" 
-                        ${isInInterest(stock.ticker) ? 'disabled' : ''}>
-                        ${isInInterest(stock.ticker) ? '이미 추가됨' : '관심종목 추가'}
-                    </button>
+                <div class="detail-item">
+                    <div class="detail-label">시가총액</div>
+                    <div class="detail-value">${stock.marketCap}</div>
                 </div>
+                ${renderIndicatorItems(stock.indicators, isDomestic)}
+            </div>
+            <div class="stock-actions">
+                <button class="btn-add-interest" onclick="addToInterest('${stock.ticker}', '${stock.name}')" 
+                    ${isInInterest(stock.ticker) ? 'disabled' : ''}>
+                    ${isInInterest(stock.ticker) ? '이미 추가됨' : '관심종목 추가'}
+                </button>
             </div>
-        `).join('');
+        </div>
+    `).join('');
+
+    grid.innerHTML = stocksHtml;
+}
+
+// 기술적 지표 항목 (분봉 기준, 봉이 부족해 아직 계산되지 않은 값은 -)
+function renderIndicatorItems(indicators, isDomestic) {
+    if (!indicators) return '';
+    const price = value => value == null ? '-' : formatStockPrice(isDomestic ? Math.round(value) : value, isDomestic);
+    const band = indicators.bbLower == null ? '-' : `${price(indicators.bbLower)} ~ ${price(indicators.bbUpper)}`;
+    return [
+        ['SMA 20', price(indicators.sma20)],
+        ['VWAP', price(indicators.vwap)],
+        ['RSI 14', indicators.rsi14 == null ? '-' : indicators.rsi14.toFixed(1)],
+        ['볼린저 밴드', band]
+    ].map(([label, value]) => `
+                <div class="detail-item">
+                    <div class="detail-label">${label}</div>
+                    <div class="detail-value">${value}</div>
+                </div>`).join('');
+}
+
+// 스트림 델타를 기존 카드에 반영 (카드가 없는 새 종목이 있으면 전체 다시 조회)
+function applyQuoteDeltas(market, quotes) {
+    const isDomestic = market === 'domestic';
+    const grid = document.getElementById(isDomestic ? 'domesticStockGrid' : 'overseasStockGrid');
+    const stocks = marketData[market] || [];
+    let missing = false;
+
+    Object.entries(quotes).forEach(([ticker, quote]) => {
+        const stock = stocks.find(s => s.ticker === ticker);
+        if (stock) Object.assign(stock, quote);
+
+        const card = grid.querySelector(`.stock-card[data-ticker="${ticker}"]`);
+        if (!card) {
+            missing = true;
+            return;
+        }
+        card.querySelector('.current-price').textContent = formatStockPrice(quote.price, isDomestic);
+        const changeElem = card.querySelector('.price-change');
+        changeElem.textContent = `${quote.change >= 0 ? '+' : ''}${formatChange(quote.change)} (${formatPercent(quote.changePercent)}%)`;
+        changeElem.className = `price-change ${quote.change >= 0 ? 'positive' : 'negative'}`;
+        card.querySelector('[data-field="volume"]').textContent = formatVolume(quote.volume);
+    });
+
+    const activeMarket = currentMarket === 'domestic' ? 'domestic' : 'us';
+    if (missing && market === activeMarket) renderMarketStocks();
+}
 
-        grid.innerHTML = stocksHtml;
+// 시세 푸시 스트림 구독 - 연결되어 있는 동안은 주기적 폴링 생략
+function startMarketStream() {
+    if (!window.EventSource) return;
 
-    } catch (error) {
-        console.error('마켓 데이터 로딩 실패:', error);
-        grid.innerHTML = '<div class="error">데이터를 불러올 수 없습니다.</div>';
-    }
+    marketStream = new EventSource('/api/market/stream');
+    marketStream.onopen = () => {
+        streamConnected = true;
+        console.log('[DEBUG] 시세 스트림 연결됨');
+    };
+    marketStream.onerror = () => {
+        // EventSource가 자동 재연결하는 동안 폴링으로 대체
+        streamConnected = false;
+    };
+    marketStream.addEventListener('snapshot', event => {
+        const snapshot = JSON.parse(event.data);
+        Object.entries(snapshot.indices || {}).forEach(([key, data]) => renderIndexCard(key, data));
+        Object.entries(snapshot.markets || {}).forEach(([market, stocks]) => {
+            marketData[market] = stocks;
+            const isDomestic = market === 'domestic';
+            renderStockGrid(document.getElementById(isDomestic ? 'domesticStockGrid' : 'overseasStockGrid'), stocks, isDomestic);
+        });
+    });
+    marketStream.addEventListener('quotes', event => {
+        const delta = JSON.parse(event.data);
+        applyQuoteDeltas(delta.market, delta.quotes);
+    });
+    marketStream.addEventListener('indices', event => {
+        const delta = JSON.parse(event.data);
+        Object.entries(delta.indices).forEach(([key, data]) => renderIndexCard(key, data));
+    });
+}
+
+// 관심종목 서버 저장 (성공 시 목록 갱신)
+async function saveInterest(ticker, name) {
+    const response = await fetch('/api/interests', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ticker, name })
+    });
+    const result = await response.json();
+    if (!result.success) throw new Error(result.message);
+    interests = result.interests;
 }
 
 // 관심종목 추가
-function addToInterest(ticker, name) {
+async function addToInterest(ticker, name) {
     if (isInInterest(ticker)) {
         showNotification('이미 관심종목에 추가된 종목입니다.', 'error');
         return;
     }
-    interests.push({ ticker, name, price: 0, change: 0, changePercent: 0 });
+    try {
+        await saveInterest(ticker, name);
+    } catch (error) {
+        showNotification(error.message, 'error');
+        return;
+    }
     showNotification(`${name}(${ticker})이 관심종목에 추가되었습니다.`, 'success');
     updateInterestStats();
     renderStocks();
@@ -218,7 +325,14 @@ function isInInterest(ticker) {
 
 // 관심종목 로드
 async function loadInterests() {
-    interests = [];
+    try {
+        const response = await fetch('/api/interests');
+        const result = await response.json();
+        interests = result.success ? result.interests : [];
+    } catch (error) {
+        console.error('관심종목 로딩 실패:', error);
+        interests = [];
+    }
     updateInterestStats();
     renderStocks();
     document.getElementById('stockLoading').style.display = 'none';
@@ -226,12 +340,36 @@ async function loadInterests() {
 
 // 알림 로드
 async function loadAlerts() {
-    alerts = [];
+    try {
+        const response = await fetch('/api/alerts');
+        const result = await response.json();
+        alerts = result.success ? result.alerts : [];
+    } catch (error) {
+        console.error('알림 로딩 실패:', error);
+        alerts = [];
+    }
     updateAlertStats();
     renderAlerts();
     document.getElementById('alertLoading').style.display = 'none';
 }
 
+// 서버에서 발동한 알림 확인
+async function checkFiredAlerts() {
+    try {
+        const response = await fetch(`/api/alerts/fired?since=${lastFiredAt}`);
+        const result = await response.json();
+        if (!result.success || result.fired.length === 0) return;
+
+        result.fired.forEach(alert => {
+            lastFiredAt = Math.max(lastFiredAt, alert.firedAt);
+            showNotification(`${alert.stockName}(${alert.ticker}) ${getAlertConditionText(alert)} - 현재 ${alert.firedValue}`, 'success');
+        });
+        loadAlerts();
+    } catch (error) {
+        console.error('발동 알림 확인 실패:', error);
+    }
+}
+
 // 통계
 function updateInterestStats() {
     document.getElementById('interestCount').textContent = interests.length;
@@ -246,13 +384,37 @@ function renderStocks() {
     const stockList = document.getElementById('stockList');
     const emptyState = document.getElementById('stockEmptyState');
 
+    stockList.querySelectorAll('.stock-item').forEach(item => item.remove());
     if (interests.length === 0) {
         emptyState.style.display = 'block';
         return;
     }
 
     emptyState.style.display = 'none';
-    stockList.innerHTML = '';
+    const quotes = [...(marketData.domestic || []), ...(marketData.us || [])];
+    stockList.insertAdjacentHTML('beforeend', interests.map(stock => {
+        const quote = stock.quote || quotes.find(q => q.ticker === stock.ticker);
+        return `
+            <div class="stock-item" data-ticker="${stock.ticker}">
+                <div>
+                    <div class="stock-name">${stock.name}</div>
+                    <div class="stock-code">${stock.ticker}</div>
+                </div>
+                <div class="stock-actions">
+                    ${quote ? `
+                        <div class="stock-price">
+                            <div class="price">${formatStockPrice(quote.price, stock.market === 'domestic')}</div>
+                            <div class="change ${quote.change >= 0 ? 'positive' : 'negative'}">
+                                ${quote.change >= 0 ? '+' : ''}${formatChange(quote.change)} (${formatPercent(quote.changePercent)}%)
+                            </div>
+                        </div>
+                    ` : ''}
+                    <button class="btn btn-secondary btn-small" onclick="openAlertModal('${stock.ticker}')">알림</button>
+                    <button class="btn btn-danger btn-small" onclick="removeStock('${stock.ticker}')">삭제</button>
+                </div>
+            </div>
+        `;
+    }).join(''));
 }
 
 // 알림 렌더링
@@ -260,13 +422,23 @@ function renderAlerts() {
     const alertList = document.getElementById('alertList');
     const emptyState = document.getElementById('alertEmptyState');
 
+    alertList.querySelectorAll('.alert-item').forEach(item => item.remove());
     if (alerts.length === 0) {
         emptyState.style.display = 'block';
         return;
     }
 
     emptyState.style.display = 'none';
-    alertList.innerHTML = '';
+    alertList.insertAdjacentHTML('beforeend', alerts.map(alert => `
+        <div class="alert-item">
+            <div class="alert-info">
+                <h4>${alert.stockName} (${alert.ticker})</h4>
+                <p>${getAlertConditionText(alert)} · ${getNotificationMethodText(alert.method)}</p>
+            </div>
+            <span class="alert-status ${alert.active ? '' : 'inactive'}">${alert.active ? '활성' : `발동 ${alert.firedValue}`}</span>
+            <button class="btn btn-danger btn-small" onclick="removeAlert(${alert.id})">삭제</button>
+        </div>
+    `).join(''));
 }
 
 // 모달 열고 닫기
@@ -287,6 +459,32 @@ function closeAlertModal() {
     document.getElementById('alertForm').reset();
 }
 
+// 종목 코드 입력 - 마스터 검색 결과를 자동완성 목록으로 표시
+function onStockTickerInput(event) {
+    const query = event.target.value.trim();
+    const selected = symbolSuggestions.find(item => item.code === query);
+    if (selected) {
+        document.getElementById('stockName').value = selected.name;
+        return;
+    }
+
+    clearTimeout(symbolSearchTimer);
+    if (!query) return;
+    symbolSearchTimer = setTimeout(async () => {
+        try {
+            const response = await fetch(`/api/symbols/search?q=${encodeURIComponent(query)}`);
+            const result = await response.json();
+            if (!result.success) return;
+            symbolSuggestions = result.results;
+            document.getElementById('symbolSuggestions').innerHTML = symbolSuggestions
+                .map(item => `<option value="${item.code}">${item.name} (${item.market})</option>`)
+                .join('');
+        } catch (error) {
+            console.error('종목 검색 실패:', error);
+        }
+    }, 150);
+}
+
 // 종목 추가
 async function addStock(event) {
     event.preventDefault();
@@ -296,7 +494,12 @@ async function addStock(event) {
         showNotification('종목 코드를 입력해주세요.', 'error');
         return;
     }
-    interests.push({ ticker, name: name || ticker, price: 0, change: 0, changePercent: 0 });
+    try {
+        await saveInterest(ticker, name || ticker);
+    } catch (error) {
+        showNotification(error.message, 'error');
+        return;
+    }
     showNotification(`${ticker} 종목이 추가되었습니다.`, 'success');
     closeAddStockModal();
     updateInterestStats();
@@ -307,6 +510,12 @@ async function addStock(event) {
 // 종목 삭제
 async function removeStock(ticker) {
     if (!confirm(`${ticker} 종목을 삭제하시겠습니까?`)) return;
+    const response = await fetch(`/api/interests/${encodeURIComponent(ticker)}`, { method: 'DELETE' });
+    const result = await response.json();
+    if (!result.success) {
+        showNotification(result.message, 'error');
+        return;
+    }
     interests = interests.filter(stock => stock.ticker !== ticker);
     showNotification(`${ticker} 종목이 삭제되었습니다.`, 'success');
     updateInterestStats();
@@ -328,23 +537,44 @@ async function setAlert(event) {
         return;
     }
 
-    const newAlert = {
-        id: alerts.length + 1,
-        ticker,
-        stockName: interests.find(s => s.ticker === ticker)?.name || ticker,
-        type,
-        condition,
-        value: parseFloat(value),
-        method,
-        active: true
-    };
-    alerts.push(newAlert);
+    const response = await fetch('/api/alerts', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            ticker,
+            stockName: interests.find(s => s.ticker === ticker)?.name || ticker,
+            type,
+            condition,
+            value: parseFloat(value),
+            method
+        })
+    });
+    const result = await response.json();
+    if (!result.success) {
+        showNotification(result.message, 'error');
+        return;
+    }
+    alerts.push(result.alert);
     showNotification(`${ticker} 알림이 설정되었습니다.`, 'success');
     closeAlertModal();
     updateAlertStats();
     renderAlerts();
 }
 
+// 알림 삭제
+async function removeAlert(id) {
+    if (!confirm('알림을 삭제하시겠습니까?')) return;
+    const response = await fetch(`/api/alerts/${id}`, { method: 'DELETE' });
+    const result = await response.json();
+    if (!result.success) {
+        showNotification(result.message, 'error');
+        return;
+    }
+    alerts = alerts.filter(alert => alert.id !== id);
+    updateAlertStats();
+    renderAlerts();
+}
+
 // 로그아웃
 function logout() {
     if (confirm('로그아웃 하시겠습니까?')) {
@@ -381,38 +611,20 @@ async function renderMarketIndices() {
         const indices = result.indices;
         console.log('[DEBUG] 지수 데이터 수신:', Object.keys(indices));
 
-        // Helper function: 숫자 포맷
-        const formatNumber = (value) =>
-            typeof value === 'number' ? value.toLocaleString('ko-KR', { maximumFractionDigits: 2 }) : '-';
-
-        const renderIndex = (idPrefix, data) => {
-            const indexElem = document.getElementById(`${idPrefix}Index`);
-            const changeElem = document.getElementById(`${idPrefix}Change`);
-
-            if (!indexElem || !changeElem) {
-                console.warn(`[DEBUG] ${idPrefix} 엘리먼트를 찾을 수 없음`);
-                return;
-            }
-
-            indexElem.textContent = formatNumber(data.value);
-            changeElem.textContent = `${data.change >= 0 ? '+' : ''}${formatNumber(data.change)} (${formatNumber(data.changePercent)}%)`;
-            changeElem.className = `market-change ${data.change >= 0 ? 'positive' : 'negative'}`;
-        };
-
         // 국내 지수 렌더링
         if (indices.kospi) {
-            renderIndex('kospi', indices.kospi);
+            renderIndexCard('kospi', indices.kospi);
             console.log('[DEBUG] 코스피 업데이트:', indices.kospi.value);
         }
         
         if (indices.kosdaq) {
-            renderIndex('kosdaq', indices.kosdaq);
+            renderIndexCard('kosdaq', indices.kosdaq);
             console.log('[DEBUG] 코스닥 업데이트:', indices.kosdaq.value);
         }
         
         // 미국 지수 렌더링
         if (indices.nasdaq) {
-            renderIndex('nasdaq', indices.nasdaq);
+            renderIndexCard('nasdaq', indices.nasdaq);
             console.log('[DEBUG] 나스닥 업데이트:', indices.nasdaq.value);
         }
 
@@ -427,7 +639,29 @@ async function renderMarketIndices() {
     }
 }
 
+// 지수 카드 렌더링 (화면에 없는 지수는 건너뜀)
+function renderIndexCard(idPrefix, data) {
+    const indexElem = document.getElementById(`${idPrefix}Index`);
+    const changeElem = document.getElementById(`${idPrefix}Change`);
+
+    if (!indexElem || !changeElem) {
+        console.warn(`[DEBUG] ${idPrefix} 엘리먼트를 찾을 수 없음`);
+        return;
+    }
+
+    indexElem.textContent = formatNumber(data.value);
+    changeElem.textContent = `${data.change >= 0 ? '+' : ''}${formatNumber(data.change)} (${formatNumber(data.changePercent)}%)`;
+    changeElem.className = `market-change ${data.change >= 0 ? 'positive' : 'negative'}`;
+
+    // 마지막 조회에 실패해 이전 값을 보여주는 중이면 흐리게 표시하고 기준 시각을 툴팁으로
+    indexElem.classList.toggle('stale', Boolean(data.stale));
+    indexElem.title = data.asOf ? `${data.stale ? '지연된 값 · ' : ''}${data.asOf.replace('T', ' ')} 기준` : '';
+}
+
 // 유틸리티
+function formatNumber(value) {
+    return typeof value === 'number' ? value.toLocaleString('ko-KR', { maximumFractionDigits: 2 }) : '-';
+}
 function formatPrice(price) {
     return new Intl.NumberFormat('ko-KR').format(price);
 }
@@ -456,7 +690,7 @@ function getAlertConditionText(alert) {
     return `${getAlertTypeText(alert.type)} ${alert.value} ${conditions[alert.condition] || alert.condition}시`;
 }
 function getNotificationMethodText(method) {
-    const methods = { email: '이메일', slack: '슬랙', both: '이메일+슬랙' };
+    const methods = { app: '화면 알림', slack: '화면 알림+슬랙' };
     return methods[method] || method;
 }
 
@@ -466,20 +700,51 @@ window.onclick = function (event) {
     if (event.target === document.getElementById('alertModal')) closeAlertModal();
 };
 
-// 주기적 갱신 (10초마다)
+// 주기적 갱신 (10초마다) - 지수/시세판/관심종목은 통합 스냅샷 요청 한 번으로
 setInterval(() => {
-    updateMarketPrices();
-    updateStockPrices();
+    refreshDashboard();
+    checkFiredAlerts();   // 서버에서 발동한 가격 알림
     updateMarketStatus(); // 시장 상태도 주기적으로 업데이트
 }, 10000);
 
+// 통합 스냅샷 갱신 - 값이 그대로면 서버가 304로 응답하고 브라우저 캐시 본문을 재사용 (같은 ETag면 다시 그리지 않음)
+let lastSnapshotTag = null;
+async function refreshDashboard() {
+    const apiMarket = currentMarket === 'domestic' ? 'domestic' : 'us';
+    try {
+        const response = await fetch(`/api/dashboard/snapshot?market=${apiMarket}`, { cache: 'no-cache' });
+        const snapshot = await response.json();
+        if (!snapshot.success || !snapshot.ready) throw new Error(snapshot.message || '스냅샷 준비 중');
+
+        const tag = response.headers.get('ETag');
+        if (tag && tag === lastSnapshotTag) return;
+        lastSnapshotTag = tag;
+
+        Object.entries(snapshot.indices).forEach(([key, data]) => renderIndexCard(key, data));
+        marketData[apiMarket] = snapshot.stocks;
+        renderStockGrid(
+            document.getElementById(apiMarket === 'domestic' ? 'domesticStockGrid' : 'overseasStockGrid'),
+            snapshot.stocks, apiMarket === 'domestic'
+        );
+        interests = snapshot.interests;
+        updateInterestStats();
+        renderStocks();
+    } catch (error) {
+        // 스냅샷이 없으면(갱신기 비활성 등) 개별 API로 갱신
+        console.warn('[DEBUG] 통합 스냅샷 사용 불가, 개별 갱신:', error.message);
+        lastSnapshotTag = null;
+        if (!streamConnected) updateMarketPrices();
+        updateStockPrices();
+    }
+}
+
 async function updateMarketPrices() {
     await renderMarketIndices(); // 지수 갱신 함수
     renderMarketStocks();       // 종목 갱신
 }
 
 function updateStockPrices() {
-    renderStocks(); // 관심종목 가격 갱신
+    loadInterests(); // 관심종목 가격 갱신 (세션 구독 유지)
 }
 
 // 초기 마켓 설정
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from services.alert_engine import AlertEngine, ThresholdIndex
+
+
+def _fired(engine, ticker, **values):
+    return sorted(alert["id"] for alert in engine.evaluate(ticker, values))
+
+
+def test_above_fires_at_exact_threshold():
+    engine = AlertEngine(None)
+    alert = engine.add_alert("u", "005930", "price", "above", 70000, "app")
+
+    assert _fired(engine, "005930", price=69999.99) == []
+    assert _fired(engine, "005930", price=70000) == [alert["id"]]
+    # 1회성 - 다시 넘어도 발동하지 않음
+    assert _fired(engine, "005930", price=71000) == []
+    assert engine.alerts[alert["id"]]["active"] is False
+
+
+def test_below_fires_at_exact_threshold():
+    engine = AlertEngine(None)
+    alert = engine.add_alert("u", "005930", "price", "below", 70000, "app")
+
+    assert _fired(engine, "005930", price=70000.01) == []
+    assert _fired(engine, "005930", price=70000) == [alert["id"]]
+
+
+def test_equal_fires_when_crossed_or_hit():
+    engine = AlertEngine(None)
+    crossed = engine.add_alert("u", "AAPL", "price", "equal", 150.5, "app")
+    hit = engine.add_alert("u", "AAPL", "price", "equal", 152, "app")
+
+    assert _fired(engine, "AAPL", price=150) == []
+    assert _fired(engine, "AAPL", price=151) == [crossed["id"]]
+    assert _fired(engine, "AAPL", price=152) == [hit["id"]]
+
+
+def test_only_matching_levels_fire():
+    engine = AlertEngine(None)
+    ids = [engine.add_alert("u", "005930", "price", "above", value, "app")["id"] for value in (100, 200, 300)]
+
+    assert _fired(engine, "005930", price=200) == ids[:2]
+    assert _fired(engine, "005930", price=300) == ids[2:]
+
+
+def test_volume_alert_evaluated_from_quote():
+    engine = AlertEngine(None)
+    alert = engine.add_alert("u", "005930", "volume", "above", 1000, "app")
+
+    assert engine.evaluate_quote({"ticker": "005930", "price": 1, "volume": 999}) == []
+    assert [a["id"] for a in engine.evaluate_quote({"ticker": "005930", "price": 1, "volume": 1000})] == [alert["id"]]
+
+
+def test_unsupported_type_rejected():
+    engine = AlertEngine(None)
+    with pytest.raises(ValueError):
+        engine.add_alert("u", "005930", "psychology", "above", 70, "app")
+
+
+def test_removed_level_does_not_fire():
+    index = ThresholdIndex()
+    index.add("above", 10.0, 1)
+    index.add("above", 10.0, 2)
+    index.remove("above", 10.0, 1)
+
+    assert index.pop_fired(10.0) == [2]
+    assert not index
+
+
+def test_email_method_rejected_and_migrated_on_load(tmp_path):
+    engine = AlertEngine(None)
+    with pytest.raises(ValueError):
+        engine.add_alert("u", "005930", "price", "above", 70000, "email")
+
+    path = tmp_path / "alerts.json"
+    path.write_text(json.dumps({"alerts": {
+        "1": {"id": 1, "user": "u", "ticker": "005930", "type": "price", "condition": "above", "value": 1.0,
+              "method": "email", "active": True},
+        "2": {"id": 2, "user": "u", "ticker": "005930", "type": "price", "condition": "above", "value": 2.0,
+              "method": "both", "active": True},
+    }}), encoding="utf-8")
+    loaded = AlertEngine(str(path))
+    assert [alert["method"] for alert in loaded.list_alerts("u")] == ["app", "slack"]
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from services.history_store import (
+    BAR_RECORD, INDEX_STRIDE, HistoryStore, SegmentWriter, market_date, query_history, read_segment, record_quotes
+)
+
+DAY = 1_700_000_000 - 1_700_000_000 % 86400  # UTC 자정 - KST 09:00
+
+
+def _bars(count, start=DAY + 3600, step=60):
+    return [(start + i * step, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 10 * i) for i in range(count)]
+
+
+def test_segment_round_trip(tmp_path):
+    path = str(tmp_path / "seg.bin")
+    bars = _bars(INDEX_STRIDE * 3 + 5)
+    writer = SegmentWriter(path)
+    assert writer.append(bars[:100]) == 100
+    assert writer.append(bars[100:]) == len(bars) - 100
+
+    assert os.path.getsize(path) == len(bars) * BAR_RECORD.size
+    assert os.path.getsize(path + ".idx") == 4 * 8  # 0, 64, 128, 192번째 레코드 시각
+    assert read_segment(path, 0, 2 ** 62) == bars
+
+    # 인덱스 블록 경계를 걸치는 구간, 경계 시각 포함/제외
+    start, end = bars[INDEX_STRIDE - 2][0], bars[INDEX_STRIDE * 2 + 1][0]
+    assert read_segment(path, start, end) == bars[INDEX_STRIDE - 2:INDEX_STRIDE * 2 + 1]
+    assert read_segment(path, start + 1, end + 1) == bars[INDEX_STRIDE - 1:INDEX_STRIDE * 2 + 2]
+    assert read_segment(path, start, end, limit=3) == bars[INDEX_STRIDE - 2:INDEX_STRIDE + 1]
+    assert read_segment(path, bars[-1][0] + 1, 2 ** 62) == []
+
+
+def test_append_ignores_bars_at_or_before_last(tmp_path):
+    path = str(tmp_path / "seg.bin")
+    bars = _bars(10)
+    writer = SegmentWriter(path)
+    assert writer.append(bars[:5]) == 5
+    # 마지막 시각과 같은 봉, 이전 봉은 버리고 이후 봉만 추가
+    assert writer.append([bars[4], bars[2], bars[5]]) == 1
+    assert writer.append([bars[3]]) == 0
+    assert read_segment(path, 0, 2 ** 62) == bars[:6]
+
+    # 다시 연 writer도 파일의 마지막 시각을 이어받음
+    reopened = SegmentWriter(path)
+    assert reopened.count == 6 and reopened.last_ts == bars[5][0]
+    assert reopened.append(bars[5:8]) == 2
+
+
+def test_truncated_record_dropped_on_open(tmp_path):
+    path = str(tmp_path / "seg.bin")
+    bars = _bars(3)
+    SegmentWriter(path).append(bars)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (BAR_RECORD.size // 2))  # 쓰다 끊긴 레코드
+
+    writer = SegmentWriter(path)
+    assert writer.count == 3
+    assert os.path.getsize(path) == 3 * BAR_RECORD.size
+    assert read_segment(path, 0, 2 ** 62) == bars
+
+
+def test_store_splits_segments_by_market_date(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    bars = _bars(3, start=DAY + 3600) + _bars(3, start=DAY + 86400 + 3600)
+    assert store.append_bars("domestic", "005930", "1m", bars) == 6
+
+    names = sorted(os.listdir(tmp_path / "domestic" / "005930"))
+    days = [market_date("domestic", DAY + 3600), market_date("domestic", DAY + 86400 + 3600)]
+    assert names == [f"1m-{days[0]}.bin", f"1m-{days[0]}.bin.idx", f"1m-{days[1]}.bin", f"1m-{days[1]}.bin.idx"]
+    assert store.query("domestic", "005930", "1m", DAY, DAY + 2 * 86400) == bars
+    assert store.query("domestic", "005930", "1m", DAY + 86400, DAY + 2 * 86400) == bars[3:]
+
+
+def test_record_tick_builds_minute_bars(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    base = DAY + 3600
+    store.record_tick("domestic", "005930", 100, 1000, base + 1)
+    store.record_tick("domestic", "005930", 105, 1100, base + 20)
+    store.record_tick("domestic", "005930", 98, 1150, base + 40)
+    store.record_tick("domestic", "005930", 99, 1200, base + 61)  # 다음 분 - 직전 분봉 기록
+
+    bars = store.query("domestic", "005930", "1m", base, base + 120)
+    assert bars[0] == (base, 100.0, 105.0, 98.0, 98.0, 150)
+    assert bars[1][0] == base + 60  # 진행 중인 분봉
+
+
+def test_unchanged_or_stale_quote_is_not_a_new_tick(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path))
+    monkeypatch.setattr("services.history_store.get_history_store", lambda: store)
+    base = DAY + 3600
+    quote = {"ticker": "005930", "price": 100, "volume": 1000, "updatedAt": base + 1}
+    record_quotes("domestic", [quote])
+    # 업스트림 실패 중 같은 시세를 다시 받음 - 시각이 그대로이거나 stale 표시
+    record_quotes("domestic", [quote], base + 30)
+    record_quotes("domestic", [dict(quote, updatedAt=None, stale=True, price=120)], base + 40)
+    record_quotes("domestic", [dict(quote, updatedAt=base + 50, price=101, volume=1010)])
+
+    bars = store.query("domestic", "005930", "1m", base, base + 60)
+    assert bars == [(base, 100.0, 101.0, 100.0, 101.0, 10)]
+
+
+def test_day_rollover_closes_previous_writers(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    base = DAY + 3600
+    store.record_tick("domestic", "005930", 100, 1000, base)
+    store.record_tick("domestic", "005930", 101, 1100, base + 60)
+    store.record_tick("domestic", "000660", 200, 500, base + 60)
+    assert len(store._writers) == 1
+
+    store.record_tick("domestic", "005930", 102, 100, base + 86400)  # 다음 날 첫 틱
+    paths = [os.path.basename(path) for path in store._writers if "005930" in path]
+    assert all(market_date("domestic", base) not in name for name in paths)
+    assert store.query("domestic", "005930", "1d", DAY - 86400, DAY + 2 * 86400)[0][4] == 101.0
+
+
+def test_query_rejects_bad_ticker_and_clamps_limit(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append_bars("domestic", "005930", "1m", _bars(10))
+    with pytest.raises(ValueError):
+        store.query("domestic", "..", "1m", DAY, DAY + 86400)
+    assert query_history("../../etc", interval="1m")["success"] is False
+    assert len(store.query("domestic", "005930", "1m", DAY, DAY + 86400, limit=-5)) == 1
+    assert len(store.query("domestic", "005930", "1m", DAY, DAY + 86400, limit=10 ** 9)) == 10
@@ -0,0 +1,65 @@
+import random
+
+from services.alert_engine import AlertEngine
+from services.history_store import market_date
+from services.indicators import SymbolIndicators, seed_state
+
+BASE_TS = 1_700_000_000 - 1_700_000_000 % 86400 + 3600  # 시장 현지 날짜가 하루로 유지되는 구간
+
+
+def _ticks(count=300, seed=7):
+    """(ts, 가격, 누적거래량) 틱 - 분마다 여러 건"""
+    rng = random.Random(seed)
+    price, volume, ts = 100.0, 0, BASE_TS
+    for _ in range(count):
+        ts += rng.randint(5, 30)
+        price = round(price + rng.uniform(-1, 1), 2)
+        volume += rng.randint(0, 500)
+        yield ts, price, volume
+
+
+def _bars(ticks):
+    """틱 → 분봉 [(ts, o, h, l, c, v)] (HistoryStore.record_tick과 같은 방식)"""
+    bars, last_volume = [], None
+    for ts, price, volume in ticks:
+        minute = ts - ts % 60
+        traded = volume - last_volume if last_volume is not None else 0
+        last_volume = volume
+        if bars and bars[-1][0] == minute:
+            bar = bars[-1]
+            bars[-1] = (minute, bar[1], max(bar[2], price), min(bar[3], price), price, bar[5] + traded)
+        else:
+            bars.append((minute, price, price, price, price, traded))
+    return bars
+
+
+def test_seeded_state_matches_incremental_updates():
+    ticks = list(_ticks())
+    session = market_date("domestic", BASE_TS)
+    live = SymbolIndicators("domestic")
+    for ts, price, volume in ticks:
+        live.update(ts - ts % 60, price, volume, session)
+
+    # 마지막 분을 제외한 완성 봉으로 초기화한 뒤 마지막 분의 틱을 이어서 반영
+    last_minute = ticks[-1][0] - ticks[-1][0] % 60
+    done = [tick for tick in ticks if tick[0] < last_minute]
+    seeded = seed_state("domestic", _bars(done), session)
+    seeded.last_volume = done[-1][2]
+    for ts, price, volume in ticks[len(done):]:
+        seeded.update(ts - ts % 60, price, volume, session)
+
+    expected, actual = live.values(), seeded.values()
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        assert abs(value - actual[key]) < 1e-6, key
+
+
+def test_rsi_alert_fires_from_indicator_values():
+    engine = AlertEngine(None)
+    alert = engine.add_alert("u", "005930", "rsi", "above", 70, "app")
+    quote = {"ticker": "005930", "price": 100, "volume": 1}
+
+    assert engine.evaluate_quote(quote) == []
+    assert engine.evaluate_quote(quote, lambda ticker: {"rsi14": 69.9}) == []
+    assert engine.evaluate_quote(quote, lambda ticker: {"rsi14": None}) == []
+    assert [a["id"] for a in engine.evaluate_quote(quote, lambda ticker: {"rsi14": 70.0})] == [alert["id"]]
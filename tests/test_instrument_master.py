@@ -0,0 +1,70 @@
+import pytest
+
+from services import instrument_master
+from services.instrument_master import InstrumentIndex, build_index, load_masters
+
+ENTRIES = [
+    ("005930", "삼성전자", "", "KOSPI", 0),
+    ("005935", "삼성전자우", "", "KOSPI", 0),
+    ("069500", "KODEX 200", "", "KOSPI", 1),
+    ("AAPL", "애플", "Apple Inc", "NAS", 0),
+    ("BRK.B", "버크셔 해서웨이 B", "Berkshire Hathaway B", "NYS", 0),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "instruments.idx")
+    assert build_index(iter(ENTRIES), path) == len(ENTRIES)
+    index = InstrumentIndex(path)
+    yield index
+    index.close()
+
+
+def test_code_lookup(index):
+    assert index.get("AAPL") == {"code": "AAPL", "name": "애플", "nameEn": "Apple Inc", "market": "NAS", "kind": "stock"}
+    assert index.get("BRK.B")["market"] == "NYS"
+    assert index.get("069500")["kind"] == "etf"
+    assert index.get("000000") is None
+
+
+def test_search_order_exact_prefix_substring(index):
+    assert [r["code"] for r in index.search("005930")] == ["005930"]
+    assert [r["code"] for r in index.search("삼성")] == ["005930", "005935"]
+    # 공백/대소문자 무시, 접두사 다음 부분 문자열 일치
+    assert [r["code"] for r in index.search("berkshire")] == ["BRK.B"]
+    assert [r["code"] for r in index.search("전자")] == ["005930", "005935"]
+    assert [r["code"] for r in index.search("kodex200")] == ["069500"]
+    assert index.search("  ") == []
+    assert len(index.search("0", limit=2)) == 2
+
+
+def test_overseas_master_parsed(tmp_path):
+    line = "\t".join(["US", "21", "NAS", "나스닥", "AAPL", "NASAAPL", "애플", "Apple Inc", "2"])
+    (tmp_path / "nasmst.cod").write_bytes((line + "\r\n").encode("cp949"))
+    assert list(load_masters(str(tmp_path))) == [("AAPL", "애플", "Apple Inc", "NAS", 0)]
+
+
+def test_shared_index_built_once_and_missing_masters_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrument_master, "instrument_index", None)
+    monkeypatch.setattr(instrument_master, "_retry_at", 0.0)
+    monkeypatch.setenv("KIS_MASTER_DIR", str(tmp_path / "master"))
+    monkeypatch.setenv("INSTRUMENT_INDEX", str(tmp_path / "instruments.idx"))
+
+    # 마스터가 없으면 None, 재확인 시각 전에는 파일을 다시 보지 않음
+    assert instrument_master.get_instrument_index() is None
+    assert instrument_master._retry_at > 0
+    assert instrument_master.search_symbols("삼성")["success"] is False
+
+    (tmp_path / "master").mkdir()
+    line = "\t".join(["US", "21", "NAS", "나스닥", "AAPL", "NASAAPL", "애플", "Apple Inc", "2"])
+    (tmp_path / "master" / "nasmst.cod").write_bytes((line + "\n").encode("cp949"))
+    assert instrument_master.get_instrument_index() is None
+
+    monkeypatch.setattr(instrument_master, "_retry_at", 0.0)
+    index = instrument_master.get_instrument_index()
+    try:
+        assert index is not None and instrument_master.get_instrument_index() is index
+        assert instrument_master.lookup_symbol("AAPL")["name"] == "애플"
+    finally:
+        index.close()
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from services.history_store import HistoryStore
+from services.kis_backfill import BackfillCheckpoint, KISBackfill
+from services.kis_endpoints import DOMESTIC_DAILY_CHART, DOMESTIC_MINUTE_CHART
+from services.market_hours import KST
+
+
+class FakeAPI:
+    """차트 TR 응답을 만들어 주는 KISAPIService 대역 - 호출 (TR, 값)을 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    def call(self, endpoint, **values):
+        self.calls.append((endpoint.tr_id, values))
+        if endpoint is DOMESTIC_DAILY_CHART:
+            return {"rt_cd": "0", "output2": self._daily(values["start"], values["end"])}
+        if endpoint is DOMESTIC_MINUTE_CHART:
+            return {"rt_cd": "0", "output2": self._minute(values["hour"])}
+        return None
+
+    @staticmethod
+    def _daily(start, end):
+        day, last, rows = datetime.strptime(start, "%Y%m%d"), datetime.strptime(end, "%Y%m%d"), []
+        while day <= last:
+            if day.weekday() < 5:
+                rows.append({"stck_bsop_date": day.strftime("%Y%m%d"), "stck_oprc": "100", "stck_hgpr": "110",
+                             "stck_lwpr": "90", "stck_clpr": "105", "acml_vol": "1000"})
+            day += timedelta(days=1)
+        return rows[::-1]  # 최신순
+
+    @staticmethod
+    def _minute(hour):
+        # 09:00~15:30 분봉 중 hour 이전 30건
+        end = datetime.strptime("20230601" + hour, "%Y%m%d%H%M%S")
+        rows = []
+        for i in range(30):
+            at = end - timedelta(minutes=i)
+            if at.strftime("%H%M%S") < "090000":
+                break
+            rows.append({"stck_bsop_date": "20230601", "stck_cntg_hour": at.strftime("%H%M%S"), "stck_oprc": "100",
+                         "stck_hgpr": "101", "stck_lwpr": "99", "stck_prpr": "100", "cntg_vol": "10"})
+        return rows
+
+
+def _backfill(tmp_path, api):
+    checkpoint = BackfillCheckpoint(str(tmp_path / "checkpoint.json"))
+    return KISBackfill(api, store=HistoryStore(str(tmp_path / "history")), checkpoint=checkpoint, workers=1)
+
+
+def test_daily_resumes_after_last_completed_date(tmp_path):
+    api = FakeAPI()
+    _backfill(tmp_path, api).backfill_daily("domestic", "005930", "20230101", "20230601")
+    assert [(values["start"], values["end"]) for _, values in api.calls] == [
+        ("20230101", "20230520"), ("20230521", "20230601")
+    ]
+
+    # 종료일을 늘려 다시 실행하면 (체크포인트 파일에서 이어서) 새 구간만 조회
+    api.calls.clear()
+    backfill = _backfill(tmp_path, api)
+    backfill.backfill_daily("domestic", "005930", "20230101", "20231001")
+    assert [(values["start"], values["end"]) for _, values in api.calls] == [("20230602", "20231001")]
+
+    # 같은 범위로 다시 실행하면 호출 없음
+    api.calls.clear()
+    _backfill(tmp_path, api).backfill_daily("domestic", "005930", "20230101", "20231001")
+    assert api.calls == []
+
+    bars = backfill.store.query("domestic", "005930", "1d", 0, 2_000_000_000)
+    dates = [datetime.fromtimestamp(bar[0], KST).strftime("%Y%m%d") for bar in bars]
+    assert len(dates) == len(set(dates)) and dates == sorted(dates)
+    assert min(dates) >= "20230101" and max(dates) <= "20231001"
+
+
+def test_daily_earlier_start_refetches_from_start(tmp_path):
+    api = FakeAPI()
+    _backfill(tmp_path, api).backfill_daily("domestic", "005930", "20230301", "20230401")
+    api.calls.clear()
+    _backfill(tmp_path, api).backfill_daily("domestic", "005930", "20230101", "20230401")
+    assert [values["start"] for _, values in api.calls] == ["20230101"]
+
+
+def test_minute_stops_at_previous_run(tmp_path):
+    api = FakeAPI()
+    backfill = _backfill(tmp_path, api)
+    backfill.backfill_minute("domestic", "005930")
+    first_run = len(api.calls)
+    assert first_run > 1 and backfill.bars == 391  # 09:00~15:30
+
+    # 다시 실행하면 첫 페이지에서 이미 받은 봉에 닿아 멈춤
+    api.calls.clear()
+    backfill = _backfill(tmp_path, api)
+    backfill.backfill_minute("domestic", "005930")
+    assert len(api.calls) == 1 and backfill.bars == 0
+
+
+def test_rejected_call_raises_after_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.kis_backfill.time.sleep", lambda seconds: None)
+    api = FakeAPI()
+    backfill = _backfill(tmp_path, api)
+    backfill.run([("NAS", "AAPL")], start="20230101", end="20230201")
+    assert backfill.failures == 1 and len(api.calls) == 3
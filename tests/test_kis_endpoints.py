@@ -0,0 +1,61 @@
+import pytest
+
+from services.kis_endpoints import (
+    CONVERTERS, DOMESTIC_MULTI_PRICE, DOMESTIC_PRICE, EXCHANGE_RATE, Endpoint, compile_schema, to_float, to_int, to_str
+)
+
+SCHEMA = {
+    "name": ("hts_kor_isnm", "str"),
+    "price": ("stck_prpr", "int"),
+    "rate": ("prdy_ctrt", "float"),
+}
+
+
+def _reference(fields, output):
+    """필드별 안전 변환 결과 - 빠른 경로도 항상 이것과 같아야 함"""
+    return {key: CONVERTERS[convert](output.get(source)) for key, (source, convert) in fields.items()}
+
+
+@pytest.mark.parametrize("output", [
+    {"hts_kor_isnm": "삼성전자", "stck_prpr": "71500", "prdy_ctrt": "-1.25"},  # 정상 응답 (빠른 경로)
+    {"hts_kor_isnm": "삼성전자", "stck_prpr": "", "prdy_ctrt": ""},            # 빈 값
+    {"hts_kor_isnm": "삼성전자", "stck_prpr": "1.0", "prdy_ctrt": "1.0"},      # 정수 필드에 소수 표기
+    {"hts_kor_isnm": None, "stck_prpr": None},                                  # null/누락
+    {},
+    {"hts_kor_isnm": 5930, "stck_prpr": 71500, "prdy_ctrt": 0.5},               # 숫자로 온 값
+    {"hts_kor_isnm": 0, "stck_prpr": "abc", "prdy_ctrt": "x"},
+])
+def test_fast_path_matches_safe_conversion(output):
+    decode = compile_schema(SCHEMA)
+    result = decode(output)
+    assert result == _reference(SCHEMA, output)
+    assert type(result["name"]) is str and type(result["price"]) is int and type(result["rate"]) is float
+
+
+def test_converters():
+    assert to_int("71500") == 71500
+    assert to_int("1.0") == 1
+    assert to_int("-1.9") == -1
+    assert to_int("") == 0 and to_int(None) == 0
+    assert to_float("") == 0.0 and to_float("2.5") == 2.5
+    assert to_str(None) == "" and to_str(0) == "0"
+
+
+def test_endpoint_params_fill_slots():
+    assert DOMESTIC_PRICE.params(symbol="005930") == {"fid_cond_mrkt_div_code": "J", "fid_input_iscd": "005930"}
+    params = DOMESTIC_MULTI_PRICE.params(codes=["005930", "000660"])
+    assert params["FID_INPUT_ISCD_2"] == "000660" and len(params) == 4
+    with pytest.raises(KeyError):
+        DOMESTIC_PRICE.params()
+
+
+def test_endpoint_body_uses_declared_output_key():
+    assert EXCHANGE_RATE.decode(EXCHANGE_RATE.body({"output1": {"ovrs_nmix_prpr": "1380.5"}}))["rate"] == 1380.5
+    assert EXCHANGE_RATE.body({"output": {"ovrs_nmix_prpr": "1"}}) == {}
+    assert DOMESTIC_MULTI_PRICE.rows({"output": [{"inter_shrn_iscd": "005930"}]}) == [{"inter_shrn_iscd": "005930"}]
+    assert DOMESTIC_MULTI_PRICE.rows({}) == []
+
+
+def test_custom_converter():
+    endpoint = Endpoint("test", "/x", "TR", {}, {"flag": ("yn", lambda value: value == "Y")})
+    assert endpoint.decode({"yn": "Y"}) == {"flag": True}
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+
+import pytest
+
+from services import portfolio
+from services.portfolio import ExchangeRate, PortfolioEngine, _valuate_python
+
+
+class FixedRate(ExchangeRate):
+    def __init__(self, rate):
+        super().__init__(lambda: rate)
+
+
+def test_exchange_rate_stale_after_failed_refresh(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(portfolio.time, "monotonic", lambda: now[0])
+    responses = [1380.0]
+
+    def fetch():
+        if not responses:
+            raise RuntimeError("upstream down")
+        return responses.pop(0)
+
+    fx = ExchangeRate(fetch, ttl=60)
+    assert fx.get() == {"rate": 1380.0, "asOf": fx.as_of, "stale": False}
+
+    now[0] += 61  # 만료 - 갱신 실패
+    assert fx.get()["stale"] is True
+    now[0] += 1   # 재시도 전이어도 계속 stale
+    result = fx.get()
+    assert result["rate"] == 1380.0 and result["stale"] is True
+
+    responses.append(1390.0)
+    now[0] += 60
+    assert fx.get() == {"rate": 1390.0, "asOf": fx.as_of, "stale": False}
+
+
+def test_exchange_rate_refresh_is_single_flight():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            started.set()
+            release.wait(5)
+        return 1380.0 + len(calls)
+
+    fx = ExchangeRate(fetch, ttl=0.05)
+    assert fx.get()["rate"] == 1381.0
+    time.sleep(0.06)
+
+    refresher = threading.Thread(target=fx.get)
+    refresher.start()
+    assert started.wait(5)
+    # 다른 스레드가 조회 중이면 기다리지 않고 이전 값을 stale로 받음
+    assert fx.get() == {"rate": 1381.0, "asOf": fx.as_of, "stale": True}
+    release.set()
+    refresher.join()
+    assert len(calls) == 2 and fx.rate == 1382.0
+
+
+def test_exchange_rate_default_when_never_fetched():
+    fx = ExchangeRate(lambda: None, default=1400.0)
+    assert fx.get() == {"rate": 1400.0, "asOf": None, "stale": True}
+
+
+def test_realized_krw_fixed_at_trade_time():
+    engine = PortfolioEngine(None, FixedRate(1300.0))
+    engine.record_trade("u", "AAPL", "buy", 10, 100, market="us")
+    engine.record_trade("u", "AAPL", "sell", 4, 110, fx_rate=1300.0)
+    engine.record_trade("u", "005930", "buy", 2, 70000)
+    engine.record_trade("u", "005930", "sell", 1, 71000)
+
+    engine.exchange_rate = FixedRate(1500.0)
+    summary = engine.summary("u")
+    positions = {p["ticker"]: p for p in summary["positions"]}
+    assert positions["AAPL"]["realized"] == 40 * 1300.0
+    assert positions["AAPL"]["realizedLocal"] == 40
+    assert positions["005930"]["realized"] == 1000
+    assert summary["realized"] == 40 * 1300.0 + 1000
+    # 평가금액/원가는 현재 환율
+    assert positions["AAPL"]["marketValue"] == 6 * 100 * 1500.0
+
+
+def test_oversell_rejected():
+    engine = PortfolioEngine(None, FixedRate(1300.0))
+    engine.record_trade("u", "005930", "buy", 3, 70000)
+    with pytest.raises(ValueError):
+        engine.record_trade("u", "005930", "sell", 4, 70000)
+    with pytest.raises(ValueError):
+        engine.record_trade("u", "000660", "sell", 1, 100000)
+    assert engine.symbols() == {("domestic", "005930")}
+
+
+def _random_engine(seed=3, users=40, symbols=25):
+    rng = random.Random(seed)
+    engine = PortfolioEngine(None, FixedRate(1350.0))
+    tickers = [(f"{i:06d}", "domestic") if i % 2 else (f"SYM{i}", "us") for i in range(symbols)]
+    for user in range(users):
+        for ticker, market in rng.sample(tickers, rng.randint(0, 8)):
+            engine.record_trade(f"u{user}", ticker, "buy", rng.randint(1, 50), rng.uniform(10, 500), market=market)
+            if rng.random() < 0.3:
+                engine.record_trade(f"u{user}", ticker, "sell", 1, rng.uniform(10, 500), fx_rate=1300.0)
+    quotes = {}
+    for ticker, market in tickers[:-3]:  # 일부 종목은 시세 없음 (평균단가로 평가)
+        quotes.setdefault(market, []).append({"ticker": ticker, "price": rng.uniform(10, 500),
+                                              "change": rng.uniform(-5, 5)})
+    for market, rows in quotes.items():
+        engine.update_prices(market, rows)
+    return engine
+
+
+def test_numpy_and_python_valuation_match():
+    np = pytest.importorskip("numpy")
+    engine = _random_engine()
+    layout = engine._layout_for_update()
+    nan = float("nan")
+    prices = [engine._prices.get(key, (nan, 0.0))[0] for key in layout["symbols"]]
+    changes = [engine._prices.get(key, (nan, 0.0))[1] for key in layout["symbols"]]
+
+    rows_np, totals_np = portfolio._valuate_numpy(layout, prices, changes, 1350.0)
+    rows_py, totals_py = _valuate_python(layout, prices, changes, 1350.0)
+    for key, values in rows_py.items():
+        np.testing.assert_allclose(np.asarray(rows_np[key], dtype=float), np.asarray(values, dtype=float), rtol=1e-12)
+    for key, values in totals_py.items():
+        np.testing.assert_allclose(totals_np[key], values, rtol=1e-12)
+
+
+def test_python_valuation_totals(monkeypatch):
+    monkeypatch.setattr(portfolio, "np", None)
+    engine = _random_engine()
+    for user in engine.holdings:
+        summary = engine.summary(user)
+        assert summary["totalValue"] == pytest.approx(sum(p["marketValue"] for p in summary["positions"]), abs=0.05)
+        assert sum(p["allocation"] for p in summary["positions"]) == pytest.approx(100.0 if summary["positions"] else 0.0,
+                                                                                abs=0.1)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from services import symbol_registry
+from services.symbol_registry import ExchangeResolver
+
+
+class SlowAPI:
+    """해외 현재가 조회 대역 - NYS에서만 시세가 나오고 호출마다 잠시 걸림"""
+
+    def __init__(self, listed="NYS"):
+        self.listed = listed
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_overseas_stock_price(self, symbol, exchange):
+        with self._lock:
+            self.calls.append((symbol, exchange))
+        time.sleep(0.02)
+        return {"price": 10.0} if exchange == self.listed else None
+
+
+def test_concurrent_resolve_probes_once(monkeypatch):
+    monkeypatch.setattr(symbol_registry, "get_instrument_index", lambda block=True: None)
+    resolver = ExchangeResolver(miss_ttl=600)
+    api = SlowAPI(listed=None)
+
+    threads = [threading.Thread(target=resolver.resolve, args=("ZZZZ", api)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert api.calls == [("ZZZZ", "NAS"), ("ZZZZ", "NYS"), ("ZZZZ", "AMS")]
+
+    # 못 찾은 종목은 miss_ttl 동안 다시 조회하지 않음
+    assert resolver.resolve("ZZZZ", api) is None and len(api.calls) == 3
+
+
+def test_resolve_remembers_exchange(monkeypatch, tmp_path):
+    monkeypatch.setattr(symbol_registry, "get_instrument_index", lambda block=True: None)
+    path = str(tmp_path / "exchanges.json")
+    api = SlowAPI()
+    assert ExchangeResolver(path).resolve("KO", api) == "NYS"
+    assert ExchangeResolver(path).resolve("KO", api) == "NYS"  # 파일에서 복원
+    assert len(api.calls) == 2